@@ -1,32 +1,208 @@
 import os
 import json
 import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from utils.timezone_utils import now_central, to_central
-from typing import Dict, Any, List
-from groq import Groq
+from typing import Dict, Any, List, Optional, Tuple
 
 # Load environment variables
 load_dotenv()
 from app.database.crud import (ConversationCRUD, MedicationCRUD,
                                MedicationLogCRUD, CaregiverAlertCRUD, UserCRUD,
-                               PersonalEventCRUD)
+                               PersonalEventCRUD, GreetingCRUD)
 from utils.sentiment_analysis import analyze_sentiment
 from utils.emergency_detection import detect_emergency
-from app.memory.memory_manager import MemoryManager
+from app.memory.memory_manager import MemoryManager, CONTEXT_HEADERS, get_context_pool
+from app.memory.context_packer import ContextPacker, PromptSection, estimate_tokens
+from app.agents.intent_router import KEYWORD_TABLES, RouteMatch, get_intent_router
+from app.agents.intent_classifier import get_intent_classifier
+from app.agents.medication_index import get_medication_index
 from utils.pii_redaction import PIIRedactor, sanitize_before_storage, generate_safe_response_prompt
+from utils.llm_gateway import LLMDegradedError, get_llm_gateway, is_rate_limit_error
+from utils.metrics import metrics
+from utils.tracing import tracer
+from app.agents.response_stream import ResponseStream
+from app.agents.response_cache import get_response_cache
+from app.agents.daily_content import get_daily_content_store
+from app.agents.model_router import MODEL_TIERS, estimate_cost_usd, get_model_router
+from app.scheduling.post_processing_queue import get_post_processing_queue
+from app.scheduling.greeting_precomputer import get_greeting_precomputer
+
+
+# Persona for the elderly care companion. Kept byte-for-byte stable (time,
+# profile and memory go after it) so every request shares this prefix and
+# provider / local prompt caches can reuse it
+PERSONA_PROMPT = """You are Carely, a warm, empathetic AI companion for elderly care.
+
+ADAPTIVE RESPONSE STYLE:
+- Default to concise responses (~4 short sentences) for casual conversation and simple questions.
+- If the user asks for something complex, story-like, explanations, or multi-step instructions, provide a fuller, structured answer.
+- If unsure about the detail level needed, ask for clarification.
+
+CRITICAL RULES:
+1. NO repetition, filler, or rambling. Every word must add value.
+2. If uncertain or missing information, ask EXACTLY 1 clarifying question.
+3. For time questions: use the current time given in CURRENT TIME CONTEXT. NEVER guess or make up times.
+4. For medications, schedules, and appointments: call tools or check database and quote results EXACTLY as provided.
+5. Warm, caring tone. Think of a caring friend who adapts to your needs.
+6. DO NOT repeat greetings like "Good morning/afternoon/evening" in every message.
+7. DO NOT say "It's lovely to chat with you at [time]" repeatedly.
+8. Continue conversations naturally without re-introducing yourself or stating the time.
+9. Only greet the user at the very start of a new conversation, not in follow-up messages.
+
+YOUR ROLE:
+- Medication reminders and tracking
+- Daily wellness check-ins  
+- Emotional support and companionship
+- Alert caregivers when needed
+- Remember personal details
+
+Be gentle, patient, and use simple everyday language. Never use medical jargon.
+Focus on continuing the conversation naturally, as if you're already in the middle of a friendly chat.
+"""
+
+EMERGENCY_REASSURANCE = "I'm here with you. I'm notifying your caregiver now so help can reach you quickly. Try to sit comfortably and focus on slow breaths. You're not alone.\n\n"
+
+# Users x call types whose last prompt is kept for the prefix metrics
+PREFIX_TRACKED_PROMPTS = 1024
 
 
 class CompanionAgent:
 
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.model = "llama-3.3-70b-versatile"  # Using Groq model
+        self.client = get_llm_gateway()  # Shared pooled, rate-limited client
+        self.model = MODEL_TIERS["large"]  # Default model; calls are routed per type
+        self.model_router = get_model_router()  # Call type / verbosity -> model tier
+        # Persona first, volatile context after it (prefix caching); 0 = legacy layout
+        self.static_prompt_prefix = os.getenv(
+            "CARELY_STATIC_PROMPT_PREFIX", "true").lower() in ("1", "true", "yes")
+        # (user id, call type) -> last prompt, for the prefix metrics
+        self._last_prompts: "OrderedDict[Tuple[Optional[int], str], str]" = OrderedDict()
+        self._last_prompts_lock = threading.Lock()
         self.memory_manager = MemoryManager()  # Initialize memory system
-
-    def _get_system_prompt(self) -> str:
-        """Generate system prompt with current time context"""
+        self.intent_router = get_intent_router()  # Compiled keyword tables
+        self.intent_classifier = get_intent_classifier()  # Local intent stage
+        self.intent_classifier.train_in_background()  # Fit on history off the chat path
+        self.medication_index = get_medication_index()  # Local medication-name matching
+        # Start context retrieval / PII detection while intent detection runs
+        self.speculative_context = os.getenv(
+            "CARELY_SPECULATIVE_CONTEXT", "true").lower() in ("1", "true", "yes")
+        self.context_packer = ContextPacker()  # Prompt token budget
+        # One JSON call for intent + medication match on medication turns
+        self.structured_medication_turns = os.getenv(
+            "CARELY_STRUCTURED_MEDICATION_TURNS", "true").lower() in ("1", "true", "yes")
+        # Cache for repeated low-variance LLM answers (see _complete)
+        self.response_cache = get_response_cache()
+        # Affirmation / joke / puzzle / memory cue of the day, shared across sessions
+        self.daily_content = get_daily_content_store()
+        if (self.response_cache.embedding_function is None and os.getenv(
+                "CARELY_RESPONSE_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")):
+            # Resolved per call so the shared model keeps loading in the background
+            self.response_cache.embedding_function = (
+                lambda texts: self.memory_manager.long_term.embed_texts(texts))
+        # Persistence, vector indexing and alert creation run after the reply
+        self.write_behind = os.getenv(
+            "CARELY_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+        self.post_processing = get_post_processing_queue()
+        self.post_processing.register("save_conversation", self._save_conversation_job)
+        self.post_processing.register("index_conversation", self._index_conversation_job)
+        self.post_processing.register("caregiver_alert", self._caregiver_alert_job)
+        # Chat-page greetings are generated ahead of time (scheduler / after a turn)
+        # on a low-priority worker of their own
+        self.precomputed_greetings = os.getenv(
+            "CARELY_PRECOMPUTED_GREETINGS", "true").lower() in ("1", "true", "yes")
+        self.greeting_ttl_hours = float(os.getenv("CARELY_GREETING_TTL_HOURS", "6"))
+        # The chat page greets after this much silence; greetings are made for then
+        self.greeting_silence_hours = float(os.getenv("CARELY_GREETING_SILENCE_HOURS", "4"))
+        self.greeting_lead_minutes = float(os.getenv("CARELY_GREETING_LEAD_MINUTES", "15"))
+        self.greeting_precomputer = get_greeting_precomputer()
+        if self.write_behind:
+            self.post_processing.start()
+
+    def _complete(self, call_type: str, messages: List[Dict[str, str]],
+                  cache_message: str = None, cache_context: Any = None,
+                  user_id: int = None, semantic: bool = False, **params) -> str:
+        """
+        Single entry point for chat completions, with the response cache in front
+        
+        Args:
+            call_type: Name of the call site (cache bucket and metrics label)
+            messages: Chat messages
+            cache_message: User message the reply answers (None disables caching)
+            cache_context: Data injected into the prompt, hashed into the cache key
+            user_id: Scope for per-user entries (invalidated on medication changes)
+                and for the prompt prefix metrics
+            semantic: Accept nearest-neighbour matches on the message embedding
+            **params: Passed on to chat.completions.create; model, max_tokens
+                and temperature default to the call type's route (see model_router)
+        
+        Returns:
+            Reply text
+        """
+        for name, value in self.model_router.route(call_type).params().items():
+            params.setdefault(name, value)
+        self._observe_prompt_tokens(call_type, messages, user_id)
+        context_hash = None
+        if cache_message is not None:
+            system_prompts = [m["content"] for m in messages if m["role"] == "system"]
+            context_hash = self.response_cache.context_hash(params, system_prompts, cache_context)
+            cached = self.response_cache.get(call_type, cache_message, context_hash,
+                                             user_id=user_id, semantic=semantic)
+            if cached is not None:
+                return cached
+        
+        with tracer.span(f"llm.{call_type}", model=params["model"]):
+            response = self.client.chat.completions.create(messages=messages, call_type=call_type,
+                                                           **params)
+        self._record_usage(call_type, params["model"], getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        if context_hash is not None:
+            self.response_cache.put(call_type, cache_message, context_hash, content,
+                                    user_id=user_id, semantic=semantic)
+        return content
+
+    def _record_usage(self, call_type: str, model: str, usage: Any):
+        """Count one completion per model and add its cost (when token usage is known)"""
+        if usage is not None and getattr(usage, "prompt_tokens", None):
+            metrics.observe(f"prompt_tokens_actual.{call_type}", usage.prompt_tokens)
+            cost = estimate_cost_usd(model, usage.prompt_tokens,
+                                     getattr(usage, "completion_tokens", 0) or 0)
+            if cost is not None:
+                metrics.increment("llm.cost_usd", cost)
+        metrics.increment(f"llm.calls.{model}")
+
+    def _llm_degraded(self, call_type: str) -> bool:
+        """True while the gateway has switched a call type to its local fallback"""
+        is_degraded = getattr(self.client, "is_degraded", None)
+        return bool(is_degraded and is_degraded(call_type))
+
+    def _observe_prompt_tokens(self, call_type: str, messages: List[Dict[str, str]],
+                               user_id: int = None):
+        """
+        Record the estimated prompt size of an LLM call, per branch, plus the
+        bytes sent and how many leading bytes match the previous prompt of the
+        same user and call type (what a prefix cache could reuse)
+        """
+        metrics.observe(f"prompt_tokens.{call_type}",
+                        sum(estimate_tokens(m["content"]) for m in messages))
+        prompt = "".join(f"{m['role']}\n{m['content']}\n" for m in messages)
+        key = (user_id, call_type)
+        with self._last_prompts_lock:
+            previous = self._last_prompts.pop(key, None)
+            self._last_prompts[key] = prompt
+            if len(self._last_prompts) > PREFIX_TRACKED_PROMPTS:
+                self._last_prompts.popitem(last=False)
+        metrics.observe(f"prompt_bytes.{call_type}", len(prompt.encode("utf-8")))
+        if previous is not None:
+            shared = os.path.commonprefix([previous, prompt])
+            metrics.observe(f"prompt_prefix_bytes.{call_type}", len(shared.encode("utf-8")))
+
+    def _time_context(self) -> str:
+        """Short volatile block with the current time (kept out of the persona prefix)"""
         # Get current time in Central Time
         current_time = now_central()
         hour = current_time.hour
@@ -44,41 +220,19 @@ class CompanionAgent:
         # Format current time
         time_str = current_time.strftime("%I:%M %p %Z")
         
-        # System prompt for elderly care companion with time context
-        return f"""You are Carely, a warm, empathetic AI companion for elderly care.
-
-CURRENT TIME CONTEXT:
+        return f"""CURRENT TIME CONTEXT:
 - Current time: {time_str}
 - Time of day: {time_of_day}
 - User location: Chicago, IL (Central Time)
-
-ADAPTIVE RESPONSE STYLE:
-- Default to concise responses (~4 short sentences) for casual conversation and simple questions.
-- If the user asks for something complex, story-like, explanations, or multi-step instructions, provide a fuller, structured answer.
-- If unsure about the detail level needed, ask for clarification.
-
-CRITICAL RULES:
-1. NO repetition, filler, or rambling. Every word must add value.
-2. If uncertain or missing information, ask EXACTLY 1 clarifying question.
-3. For time questions: use the current time provided above ({time_str}). NEVER guess or make up times.
-4. For medications, schedules, and appointments: call tools or check database and quote results EXACTLY as provided.
-5. Warm, caring tone. Think of a caring friend who adapts to your needs.
-6. DO NOT repeat greetings like "Good morning/afternoon/evening" in every message.
-7. DO NOT say "It's lovely to chat with you at [time]" repeatedly.
-8. Continue conversations naturally without re-introducing yourself or stating the time.
-9. Only greet the user at the very start of a new conversation, not in follow-up messages.
-
-YOUR ROLE:
-- Medication reminders and tracking
-- Daily wellness check-ins  
-- Emotional support and companionship
-- Alert caregivers when needed
-- Remember personal details
-
-Be gentle, patient, and use simple everyday language. Never use medical jargon.
-Focus on continuing the conversation naturally, as if you're already in the middle of a friendly chat.
 """
 
+    def _get_system_prompt(self) -> str:
+        """System prompt: the static persona prefix, then the current time"""
+        if self.static_prompt_prefix:
+            return PERSONA_PROMPT + "\n" + self._time_context()
+        # Legacy layout: volatile block first, so no two minutes share a prefix
+        return self._time_context() + "\n" + PERSONA_PROMPT
+
     def _limit_to_sentences(self, text: str, max_sentences: int = 4) -> str:
         """
         Limit text to at most max_sentences. If exceeds, reduce to fit max_sentences.
@@ -98,7 +252,7 @@ Focus on continuing the conversation naturally, as if you're already in the midd
         # If exceeds max_sentences, return first max_sentences
         return ' '.join(sentences[:max_sentences])
     
-    def _decide_verbosity(self, user_text: str) -> str:
+    def _decide_verbosity(self, user_text: str, route: RouteMatch = None) -> str:
         """
         Decide response verbosity level based on user intent and complexity.
         Returns: "SHORT", "MEDIUM", or "LONG"
@@ -119,8 +273,8 @@ Respond ONLY with valid JSON in this exact format:
 or {{"verbosity":"MEDIUM"}}
 or {{"verbosity":"LONG"}}"""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
+            result_text = self._complete(
+                "verbosity",
                 messages=[{
                     "role": "system",
                     "content": "You are a verbosity classifier. Return only JSON."
@@ -128,10 +282,7 @@ or {{"verbosity":"LONG"}}"""
                     "role": "user",
                     "content": classification_prompt
                 }],
-                temperature=0.1,
-                max_tokens=50)
-            
-            result_text = response.choices[0].message.content.strip()
+                cache_message=user_text).strip()
             
             # Parse JSON response
             result_json = json.loads(result_text)
@@ -145,23 +296,14 @@ or {{"verbosity":"LONG"}}"""
                 
         except Exception as e:
             # Fallback heuristic if LLM classification fails
-            text_lower = user_text.lower()
-            
-            # LONG indicators
-            long_indicators = ["step by step", "step-by-step", "explain", "tell me about", 
-                             "how do i", "how can i", "story", "describe", "what happened",
-                             "walk me through", "detail", "instruction"]
-            
-            # MEDIUM indicators  
-            medium_indicators = ["why", "how", "what is", "what are", "summary", 
-                               "summarize", "compare", "difference"]
-            
+            route = route or self.intent_router.match(user_text)
+
             # Check for multiple questions (indicates complexity)
             question_marks = user_text.count("?")
-            
-            if any(indicator in text_lower for indicator in long_indicators) or question_marks >= 2:
+
+            if route.has("verbosity_long") or question_marks >= 2:
                 return "LONG"
-            elif any(indicator in text_lower for indicator in medium_indicators):
+            elif route.has("verbosity_medium"):
                 return "MEDIUM"
             else:
                 return "SHORT"
@@ -269,21 +411,122 @@ or {{"verbosity":"LONG"}}"""
                              severity: str = "medium") -> str:
         """Tool to alert caregivers about concerning patterns"""
         try:
-            user = UserCRUD.get_user(user_id)
-            title = f"Alert for {user.name if user else 'Patient'}"
-
-            CaregiverAlertCRUD.create_alert(user_id=user_id,
-                                            alert_type=alert_type,
-                                            title=title,
-                                            description=description,
-                                            severity=severity)
-
+            self._create_caregiver_alert(user_id, alert_type, description, severity)
             return "I've notified your caregiver about this. They'll be in touch soon to check on you."
 
         except Exception as e:
             return "I had trouble sending the alert. Please contact your caregiver directly if this is urgent."
 
-    def _detect_user_intent(self, user_input: str) -> Dict[str, Any]:
+    def _create_caregiver_alert(self, user_id: int, alert_type: str,
+                                description: str, severity: str = "medium"):
+        """Create a caregiver alert (raises on failure)"""
+        user = UserCRUD.get_user(user_id)
+        title = f"Alert for {user.name if user else 'Patient'}"
+
+        CaregiverAlertCRUD.create_alert(user_id=user_id,
+                                        alert_type=alert_type,
+                                        title=title,
+                                        description=description,
+                                        severity=severity)
+
+    def _submit_post_processing(self, job_type: str, user_id: int, payload: Dict[str, Any]):
+        """Queue a post-response job, or run it inline when write-behind is off"""
+        if self.write_behind:
+            self.post_processing.enqueue(job_type, user_id, payload)
+            return None
+        return self.post_processing.handlers[job_type](user_id, payload)
+
+    def _save_conversation_job(self, user_id: int, payload: Dict[str, Any]) -> int:
+        """Save a (redacted) exchange, then index it in the vector store"""
+        with tracer.span("db.save_conversation"):
+            conversation = ConversationCRUD.save_conversation(
+                user_id=user_id,
+                message=payload["message"],
+                response=payload["response"],
+                sentiment_score=payload.get("sentiment_score"),
+                sentiment_label=payload.get("sentiment_label"),
+                conversation_type=payload.get("conversation_type", "general"))
+        
+        # Indexing is its own job so a vector store failure never re-saves the row
+        self._submit_post_processing("index_conversation", user_id, {
+            "conversation_id": conversation.id,
+            "user_message": payload["message"],
+            "assistant_response": payload["response"],
+            "timestamp": conversation.timestamp.isoformat(),
+        })
+        return conversation.id
+
+    def _index_conversation_job(self, user_id: int, payload: Dict[str, Any]):
+        """Add a saved exchange to long-term memory (embedding + periodic cleanup)"""
+        with tracer.span("vector.upsert"):
+            self.memory_manager.add_conversation(
+                user_id=user_id,
+                conversation_id=payload["conversation_id"],
+                user_message=payload["user_message"],
+                assistant_response=payload["assistant_response"],
+                timestamp=datetime.fromisoformat(payload["timestamp"])
+            )
+
+    def _caregiver_alert_job(self, user_id: int, payload: Dict[str, Any]):
+        with tracer.span("db.caregiver_alert"):
+            self._create_caregiver_alert(user_id, **payload)
+
+    def _start_speculation(self, user_id: int, user_message: str) -> Dict[str, Any]:
+        """Kick off memory retrieval and PII detection for the general LLM path"""
+        return {
+            "context": self.memory_manager.start_context(user_id, user_message),
+            "pii": get_context_pool().submit(PIIRedactor.detect_pii, user_message),
+        }
+
+    def _discard_speculation(self, speculation: Dict[str, Any]):
+        """
+        Throw away speculative work when a deterministic branch answers the
+        turn or the turn fails (once; no-op after the general path used it)
+        """
+        if speculation is None or speculation.get("settled"):
+            return
+        speculation["settled"] = True
+        self.memory_manager.cancel_context(speculation["context"])
+        speculation["pii"].cancel()
+        metrics.increment("speculation.discarded")
+
+    def _detect_user_intent(self, user_input: str, route: RouteMatch = None,
+                            user_id: int = None) -> Dict[str, Any]:
+        """
+        Detect what user wants to do (local classifier first, AI for ambiguous messages)
+        
+        Ambiguous medication messages go to the structured medication call, so
+        the returned intent may already carry "medication" (the matched
+        medication for log_medication) and "reply" (the answer for ask_medication)
+        """
+        
+        # Clear, common cases are answered by the local classifier
+        start = time.perf_counter()
+        local_intent = self.intent_classifier.predict(
+            user_input, route, names_medication=self.medication_index.mentions(user_id, user_input))
+        metrics.observe("intent.local_latency_ms", (time.perf_counter() - start) * 1000.0)
+        if not self.intent_classifier.should_escalate(local_intent):
+            metrics.increment("intent.local_hits")
+            return local_intent
+        
+        if self._llm_degraded("intent"):
+            # The LLM is too slow right now: the local guess beats waiting
+            metrics.increment("intent.degraded")
+            return local_intent
+        
+        metrics.increment("intent.llm_escalations")
+        start = time.perf_counter()
+        try:
+            if (user_id is not None and self.structured_medication_turns
+                    and self._is_medication_turn(user_id, user_input, route, local_intent)):
+                intent = self._analyze_medication_turn(user_id, user_input, local_intent)
+                if intent is not None:
+                    return intent
+            return self._detect_user_intent_llm(user_input)
+        finally:
+            metrics.observe("intent.llm_latency_ms", (time.perf_counter() - start) * 1000.0)
+
+    def _detect_user_intent_llm(self, user_input: str) -> Dict[str, Any]:
         """Use AI to detect what user wants to do"""
         
         prompt = f"""Analyze this user message and determine their intent with high accuracy:
@@ -308,26 +551,63 @@ Return JSON only:
 }}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            content = self._complete(
+                "intent",
                 messages=[
                     {"role": "system", "content": "You are an expert intent classifier. You must distinguish between statements (user took medication) and questions (user asking about medication). Respond only with valid JSON."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=150
-            )
-            
-            content = response.choices[0].message.content.strip()
-            return json.loads(content)
+                cache_message=user_input
+            ).strip()
+            intent = json.loads(content)
+            intent["source"] = "llm"
+            return intent
             
         except Exception as e:
             # If AI fails, default to general chat - don't auto-log anything
             return {"type": "general_chat", "confidence": 0.5, "reasoning": "AI classification failed, defaulting to safe option"}
 
+    def _local_medication_details(self, user_id: int, user_input: str,
+                                  fallback: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Medication details from the local name index only
+        
+        Args:
+            user_id: User ID
+            user_input: User message
+            fallback: Also accept the best weaker match (the LLM is unavailable)
+        
+        Returns:
+            Details dict, or None without a usable match
+        """
+        # A clear name / alias / misspelling match needs no LLM call
+        match = self.medication_index.resolve(user_id, user_input)
+        if match:
+            return {
+                "medication_id": match["medication_id"],
+                "medication_name": match["medication_name"],
+                "notes": self.medication_index.extract_notes(user_input, match["matched"]),
+                "confidence": match["score"],
+                "source": "local",
+            }
+        if fallback:
+            candidates = self.medication_index.candidates(user_id, user_input)
+            if candidates and candidates[0]["score"] >= 0.7:
+                return {
+                    "medication_id": candidates[0]["medication_id"],
+                    "medication_name": candidates[0]["medication_name"],
+                    "notes": "",
+                    "confidence": 0.7
+                }
+        return None
+
     def _extract_medication_details(self, user_id: int, user_input: str) -> Dict[str, Any]:
         """Extract which medication and any notes from natural language"""
         
+        details = self._local_medication_details(user_id, user_input)
+        if details:
+            return details
+        
         # Get user's medications
         medications = MedicationCRUD.get_user_medications(user_id, active_only=True)
         if not medications:
@@ -353,32 +633,161 @@ Return JSON only:
 }}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            content = self._complete(
+                "medication_extraction",
                 messages=[
                     {"role": "system", "content": "You are a medical information extractor. Respond only with valid JSON."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=150
-            )
-            
-            content = response.choices[0].message.content.strip()
+                cache_message=user_input,
+                cache_context=med_list,
+                user_id=user_id
+            ).strip()
             return json.loads(content)
             
         except Exception as e:
-            # Fallback: try to match medication name in user input
-            user_lower = user_input.lower()
-            for med in medications:
-                if med.name.lower() in user_lower:
-                    return {
-                        "medication_id": med.id,
-                        "medication_name": med.name,
-                        "notes": "",
-                        "confidence": 0.7
-                    }
-            
-            return {"medication_id": None, "medication_name": None, "notes": "", "confidence": 0.0}
+            # Fallback: best local match, even if it was too weak to skip the LLM
+            return (self._local_medication_details(user_id, user_input, fallback=True)
+                    or {"medication_id": None, "medication_name": None, "notes": "", "confidence": 0.0})
+
+    def _is_medication_turn(self, user_id: int, user_input: str, route: Optional[RouteMatch],
+                            local_intent: Dict[str, Any]) -> bool:
+        """True if a message is probably about the user's medications"""
+        if local_intent["type"] in ("log_medication", "ask_medication"):
+            return True
+        if route is not None and route.has("quick_medication"):
+            return True
+        # Names one of the user's medications ("is the metformin for sugar")
+        return self.medication_index.mentions(user_id, user_input)
+
+    def _todays_medication_logs(self, user_id: int) -> List[Dict[str, Any]]:
+        """Medication logs taken since midnight (Central Time)"""
+        all_logs = MedicationLogCRUD.get_user_logs(user_id, limit=20)
+        
+        # Filter today's logs (handle timezone-aware/naive comparison)
+        today_start = now_central().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_logs = []
+        for log in all_logs:
+            if log['taken_at']:
+                # Convert to timezone-aware if needed
+                taken_at = to_central(log['taken_at']) if log['taken_at'].tzinfo is None else log['taken_at']
+                if taken_at >= today_start:
+                    today_logs.append(log)
+        return today_logs
+
+    @staticmethod
+    def _format_medication_logs(today_logs: List[Dict[str, Any]]) -> str:
+        """Today's logs as prompt text"""
+        if not today_logs:
+            return "No medications logged today yet."
+        log_list = "\n".join([
+            f"- {log['medication_name']} at {to_central(log['taken_at']).strftime('%I:%M %p')}" 
+            for log in today_logs
+        ])
+        return f"Medications taken today:\n{log_list}"
+
+    def _analyze_medication_turn(self, user_id: int, user_input: str,
+                                 local_intent: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Classify a medication message, match the medication and (for questions)
+        answer it, in a single JSON-mode LLM call
+        
+        Args:
+            user_id: User ID
+            user_input: User message
+            local_intent: Local classifier result, used if the call fails
+        
+        Returns:
+            Intent dict ("type", "confidence", "reasoning") plus "medication"
+            for log_medication and "reply" for ask_medication, or None when the
+            user has no active medications
+        """
+        medications = MedicationCRUD.get_user_medications(user_id, active_only=True)
+        if not medications:
+            return None
+        
+        med_list = "\n".join([f"- {med.name} (ID: {med.id}, Schedule: {med.schedule_times})"
+                              for med in medications])
+        log_context = self._format_medication_logs(self._todays_medication_logs(user_id))
+        
+        prompt = f"""Analyze this user message and determine their intent with high accuracy:
+Message: "{user_input}"
+
+User's active medications:
+{med_list}
+
+{log_context}
+
+Possible intents:
+- log_medication: User is CONFIRMING they took/have taken their medication (e.g., "I took my pill", "Just had my medication", "I already logged it")
+- ask_medication: User is ASKING about medication, not confirming they took it (e.g., "Did I take my pill?", "What's my medication?", "Should I take it?")
+- ask_schedule: User asking about their schedule or appointments
+- emergency: User needs urgent help or expressing pain/distress
+- mood_check: User expressing emotions or feelings
+- general_chat: Normal conversation
+
+IMPORTANT: Only classify as "log_medication" if the user is CLEARLY STATING they took the medication, not asking questions about it.
+Questions like "Did I take..." or "Should I take..." are "ask_medication", NOT "log_medication".
+
+If log_medication: match the medication they took to the list above (closest match if not exact) and extract any notes (side effects, timing, feelings, etc.).
+If ask_medication: answer in "reply" from the data above - warm, accurate, 2-3 sentences max. If they ask whether they took something, check today's logs; if they ask how many medications, count the list.
+
+Return JSON only:
+{{
+    "type": "intent_type",
+    "confidence": 0.95,
+    "reasoning": "brief explanation",
+    "medication_id": null,
+    "medication_name": null,
+    "notes": "",
+    "medication_confidence": 0.0,
+    "reply": ""
+}}"""
+        
+        try:
+            content = self._complete(
+                "medication_turn",
+                messages=[
+                    {"role": "system", "content": "You are an expert intent classifier and medical information extractor for an elderly care companion. You must distinguish between statements (user took medication) and questions (user asking about medication). Respond only with valid JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                cache_message=user_input,
+                cache_context=[med_list, log_context],
+                user_id=user_id,
+                response_format={"type": "json_object"}
+            )
+            result = json.loads(content)
+        except Exception as e:
+            # Slow, degraded or failed: keep the local reading of the turn rather
+            # than dropping it to small talk (logging still needs its thresholds)
+            metrics.increment("intent.medication_turn_fallbacks")
+            if local_intent is None:
+                return {"type": "general_chat", "confidence": 0.5, "reasoning": "AI classification failed, defaulting to safe option"}
+            intent = dict(local_intent, source="local_fallback")
+            if intent["type"] == "log_medication":
+                intent["medication"] = (
+                    self._local_medication_details(user_id, user_input, fallback=True)
+                    or {"medication_id": None, "medication_name": None, "notes": "", "confidence": 0.0})
+            return intent
+        
+        intent = {
+            "type": result.get("type", "general_chat"),
+            "confidence": float(result.get("confidence") or 0.0),
+            "reasoning": result.get("reasoning", ""),
+            "source": "llm_structured",
+        }
+        if intent["type"] == "log_medication":
+            # Only accept ids from the list we sent
+            matched = next((med for med in medications if med.id == result.get("medication_id")), None)
+            intent["medication"] = {
+                "medication_id": matched.id if matched else None,
+                "medication_name": matched.name if matched else result.get("medication_name"),
+                "notes": result.get("notes") or "",
+                "confidence": float(result.get("medication_confidence") or 0.0) if matched else 0.0,
+            }
+        elif intent["type"] == "ask_medication" and (result.get("reply") or "").strip():
+            intent["reply"] = result["reply"].strip()
+        return intent
 
     def _get_pending_medications(self, user_id: int) -> List[Dict[str, Any]]:
         """Get medications not yet taken today"""
@@ -413,24 +822,35 @@ Return JSON only:
         
         return pending
 
-    def generate_proactive_greeting(self, user_id: int) -> str:
-        """Generate a contextual proactive greeting when user opens chat"""
-        current_time = now_central()
+    @staticmethod
+    def _greeting_slot(current_time: datetime) -> Dict[str, Any]:
+        """Time-of-day bucket for a greeting and when it stops applying"""
         hour = current_time.hour
+        day_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # Determine time of day
         if 5 <= hour < 12:
-            time_of_day = "morning"
-            greeting = "Good morning"
+            return {"time_of_day": "morning", "greeting": "Good morning",
+                    "ends": day_start + timedelta(hours=12)}
         elif 12 <= hour < 17:
-            time_of_day = "afternoon"
-            greeting = "Good afternoon"
+            return {"time_of_day": "afternoon", "greeting": "Good afternoon",
+                    "ends": day_start + timedelta(hours=17)}
         elif 17 <= hour < 21:
-            time_of_day = "evening"
-            greeting = "Good evening"
-        else:
-            time_of_day = "night"
-            greeting = "Good evening"
+            return {"time_of_day": "evening", "greeting": "Good evening",
+                    "ends": day_start + timedelta(hours=21)}
+        # Night runs until 5 AM (tomorrow's, unless it is already past midnight)
+        return {"time_of_day": "night", "greeting": "Good evening",
+                "ends": day_start + timedelta(hours=5 if hour < 5 else 29)}
+
+    def _greeting_context(self, user_id: int, at: datetime = None) -> Dict[str, Any]:
+        """
+        Everything a proactive greeting is based on (local reads only)
+        
+        Args:
+            user_id: User to greet
+            at: When the greeting will be shown (default: now)
+        """
+        current_time = at or now_central()
+        slot = self._greeting_slot(current_time)
         
         # Get user context
         user = UserCRUD.get_user(user_id)
@@ -471,16 +891,39 @@ Return JSON only:
             else:
                 recent_mood = "neutral"
         
-        context = f"""Generate a brief, warm, proactive greeting (2-3 sentences) for {user.name}.
+        return {
+            "current_time": current_time,
+            "user": user,
+            "recent_mood": recent_mood,
+            "pending_meds": pending_meds,
+            "upcoming_events": upcoming_events,
+            **slot,
+        }
+
+    @staticmethod
+    def _template_greeting(ctx: Dict[str, Any]) -> str:
+        """Greeting without the LLM"""
+        greeting, name = ctx["greeting"], ctx["user"].name
+        pending_meds, upcoming_events = ctx["pending_meds"], ctx["upcoming_events"]
+        if pending_meds:
+            return f"{greeting}, {name}! I see you have {len(pending_meds)} medication{'s' if len(pending_meds) > 1 else ''} due today. How are you feeling?"
+        elif upcoming_events:
+            return f"{greeting}, {name}! You have {len(upcoming_events)} event{'s' if len(upcoming_events) > 1 else ''} scheduled today. Need anything?"
+        else:
+            return f"{greeting}, {name}! How are you doing today? I'm here to help with anything you need. 😊"
+
+    def _llm_greeting(self, user_id: int, ctx: Dict[str, Any]) -> str:
+        """Greeting from the LLM (raises if the call fails)"""
+        context = f"""Generate a brief, warm, proactive greeting (2-3 sentences) for {ctx['user'].name}.
 
 Current context:
-- Time: {current_time.strftime('%I:%M %p')} {time_of_day}
-- Recent mood: {recent_mood}
-- Pending medications today: {len(pending_meds)}
-- Upcoming events today: {len(upcoming_events)}
+- Time: {ctx['current_time'].strftime('%I:%M %p')} {ctx['time_of_day']}
+- Recent mood: {ctx['recent_mood']}
+- Pending medications today: {len(ctx['pending_meds'])}
+- Upcoming events today: {len(ctx['upcoming_events'])}
 
 Guidelines:
-1. Start with appropriate time-based greeting ({greeting})
+1. Start with appropriate time-based greeting ({ctx['greeting']})
 2. If there are pending medications or upcoming events, mention ONE of them briefly
 3. Ask how they're doing or offer help
 4. Keep it warm, natural, and conversational
@@ -493,46 +936,122 @@ Example good greetings:
 
 Generate greeting:"""
         
+        # Not cached: greetings are meant to vary
+        return self._complete(
+            "greeting",
+            messages=[
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": context}
+            ],
+            user_id=user_id
+        ).strip()
+
+    def generate_proactive_greeting(self, user_id: int, ctx: Dict[str, Any] = None) -> str:
+        """Generate a contextual proactive greeting when user opens chat"""
+        ctx = ctx or self._greeting_context(user_id)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": context}
-                ],
-                temperature=0.7,
-                max_tokens=150
-            )
-            
-            return response.choices[0].message.content.strip()
-            
+            return self._llm_greeting(user_id, ctx)
         except Exception as e:
             # Fallback greeting
-            if pending_meds:
-                return f"{greeting}, {user.name}! I see you have {len(pending_meds)} medication{'s' if len(pending_meds) > 1 else ''} due today. How are you feeling?"
-            elif upcoming_events:
-                return f"{greeting}, {user.name}! You have {len(upcoming_events)} event{'s' if len(upcoming_events) > 1 else ''} scheduled today. Need anything?"
-            else:
-                return f"{greeting}, {user.name}! How are you doing today? I'm here to help with anything you need. 😊"
+            return self._template_greeting(ctx)
 
-    def determine_quick_actions(self, user_message: str, user_id: int) -> List[str]:
+    def precompute_greeting(self, user_id: int, at: datetime = None) -> Optional[str]:
+        """
+        Generate a greeting off the request path and store it for the
+        time-of-day slot it will be shown in, until that slot ends (or
+        CARELY_GREETING_TTL_HOURS after `at` passes)
+        
+        Args:
+            user_id: User to greet
+            at: When the chat page can next greet the user (default: now)
+        
+        Returns:
+            The stored greeting, or None if the user does not exist or already
+            has one for that slot
+        
+        Raises:
+            Whatever the LLM call raised; nothing is stored, so the greeting
+            worker can try again (the chat page falls back to the template)
+        """
+        ctx = self._greeting_context(user_id, at)
+        if ctx["user"] is None:
+            return None
+        stored = GreetingCRUD.get_fresh_greeting(user_id)
+        if stored is not None and stored.time_of_day == ctx["time_of_day"]:
+            return None  # Still good: medication, log and event changes delete it
+        try:
+            message = self._llm_greeting(user_id, ctx)
+        except Exception:
+            metrics.increment("greeting.precompute_failed")
+            raise
+        valid_until = min(ctx["ends"], ctx["current_time"] + timedelta(hours=self.greeting_ttl_hours))
+        GreetingCRUD.save_greeting(user_id, message, ctx["time_of_day"], valid_until)
+        metrics.increment("greeting.precomputed")
+        return message
+
+    def queue_greeting_precompute(self, user_id: int, at: datetime = None):
+        """
+        Have the greeting worker generate a user's greeting shortly before `at`
+        (replaces any greeting job already queued for the user)
+        
+        Args:
+            user_id: User to greet
+            at: When the chat page can next greet the user (default: now)
+        """
+        if not self.precomputed_greetings:
+            return
+        due = (at - timedelta(minutes=self.greeting_lead_minutes)).timestamp() if at else None
+        self.greeting_precomputer.submit(
+            user_id, lambda: self.precompute_greeting(user_id, at), due)
+
+    def get_proactive_greeting(self, user_id: int) -> str:
+        """
+        Greeting for the chat page: the precomputed one if still fresh,
+        otherwise a template (never waits on the LLM unless
+        CARELY_PRECOMPUTED_GREETINGS is off)
+        
+        Args:
+            user_id: User to greet
+        
+        Returns:
+            Greeting text
+        """
+        if not self.precomputed_greetings:
+            return self.generate_proactive_greeting(user_id)
+        stored = GreetingCRUD.get_fresh_greeting(user_id)
+        if stored is not None and stored.time_of_day == self._greeting_slot(now_central())["time_of_day"]:
+            # Served once; the next chat opening gets a new one
+            GreetingCRUD.delete_greeting(user_id)
+            metrics.increment("greeting.hit")
+            return stored.message
+        metrics.increment("greeting.miss")
+        return self._template_greeting(self._greeting_context(user_id))
+
+    def _schedule_greeting_precompute(self, user_id: int):
+        """
+        After a turn, prepare the greeting for the next time the chat page can
+        greet (after CARELY_GREETING_SILENCE_HOURS of silence). Every turn
+        pushes the job back, so one LLM call covers a whole conversation
+        """
+        self.queue_greeting_precompute(
+            user_id, now_central() + timedelta(hours=self.greeting_silence_hours))
+
+    def determine_quick_actions(self, user_message: str, user_id: int,
+                                route: RouteMatch = None) -> List[str]:
         """Determine 2-3 relevant quick action buttons based on context"""
-        message_lower = user_message.lower()
+        route = route or self.intent_router.match(user_message)
         actions = []
-        
+
         # Medication-related keywords
-        med_keywords = ["medication", "med", "pill", "medicine", "take", "took", "dose"]
-        if any(keyword in message_lower for keyword in med_keywords):
+        if route.has("quick_medication"):
             actions.append("log_medication")
-        
+
         # Boredom or entertainment keywords
-        bored_keywords = ["bored", "lonely", "nothing to do", "entertain", "fun"]
-        if any(keyword in message_lower for keyword in bored_keywords):
+        if route.has("quick_bored"):
             actions.extend(["play_music", "fun_corner"])
-        
+
         # Music keywords
-        music_keywords = ["music", "song", "relax", "calming", "peaceful"]
-        if any(keyword in message_lower for keyword in music_keywords):
+        if route.has("quick_music"):
             if "play_music" not in actions:
                 actions.append("play_music")
         
@@ -575,7 +1094,13 @@ Generate greeting:"""
         }
     
     def handle_fun_corner(self, corner_type: str = "joke") -> str:
-        """Return either a joke or puzzle"""
+        """Return today's joke or puzzle"""
+        corner_type = "joke" if corner_type == "joke" else "puzzle"
+        return self.daily_content.get_or_create(
+            corner_type, lambda: self._pick_fun_corner(corner_type))
+
+    @staticmethod
+    def _pick_fun_corner(corner_type: str) -> str:
         import random
         
         if corner_type == "joke":
@@ -596,7 +1121,12 @@ Generate greeting:"""
             return random.choice(puzzles)
     
     def generate_memory_cue(self, user_id: int) -> str:
-        """Generate a gentle memory recall question from personal data"""
+        """Today's gentle memory recall question for a user"""
+        return self.daily_content.get_or_create(
+            "memory_cue", lambda: self._pick_memory_cue(user_id), user_id=user_id)
+
+    def _pick_memory_cue(self, user_id: int) -> str:
+        """Pick a memory recall question from personal data"""
         user = UserCRUD.get_user(user_id)
         personal_events = PersonalEventCRUD.get_user_events(user_id, limit=10)
         medications = MedicationCRUD.get_user_medications(user_id)
@@ -629,25 +1159,15 @@ Generate greeting:"""
         import random
         return random.choice(questions) if questions else "What's your favorite memory from this week?"
 
-    def _local_sentiment_analysis(self, text: str) -> Dict[str, Any]:
+    def _local_sentiment_analysis(self, text: str, route: RouteMatch = None) -> Dict[str, Any]:
         """Local keyword-based sentiment analysis (no API call)"""
-        text_lower = text.lower()
-        
-        positive_words = ["good", "great", "happy", "wonderful", "excellent", "love", "enjoy",
-                         "better", "fine", "well", "nice", "pleasant", "comfortable", "peaceful"]
-        
-        negative_words = ["bad", "terrible", "awful", "hate", "horrible", "pain", "hurt", "sad",
-                         "worried", "anxious", "confused", "lost", "dizzy", "sick", "tired",
-                         "lonely", "scared", "frightened", "depressed", "upset"]
-        
-        concern_words = ["pain", "hurt", "dizzy", "fall", "emergency", "help", "confused",
-                        "memory", "forgot", "lost", "scared", "can't", "unable", "difficult"]
-        
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        concern_count = sum(1 for word in concern_words if word in text_lower)
-        
-        total_words = len(text_lower.split())
+        route = route or self.intent_router.match(text)
+
+        positive_count = route.count("sentiment_positive")
+        negative_count = route.count("sentiment_negative")
+        concern_count = route.count("sentiment_concern")
+
+        total_words = len(route.text.split())
         if total_words == 0:
             return {"score": 0, "label": "neutral", "confidence": 0.6, "emotions": []}
         
@@ -664,16 +1184,17 @@ Generate greeting:"""
         emotions = []
         if concern_count > 0:
             emotions.append("concern")
-        if any(word in text_lower for word in ["pain", "hurt", "sick"]):
+        if route.has("emotion_discomfort"):
             emotions.append("discomfort")
-        if any(word in text_lower for word in ["lonely", "alone", "miss"]):
+        if route.has("emotion_loneliness"):
             emotions.append("loneliness")
-        if any(word in text_lower for word in ["happy", "good", "great"]):
+        if route.has("emotion_contentment"):
             emotions.append("contentment")
-        
+
         return {"score": score, "label": label, "confidence": 0.6, "emotions": emotions}
-    
-    def _local_emergency_detection(self, message: str, user_id: int) -> Dict[str, Any]:
+
+    def _local_emergency_detection(self, message: str, user_id: int,
+                                   route: RouteMatch = None) -> Dict[str, Any]:
         """
         Local keyword-based emergency detection (no external API).
         
@@ -687,108 +1208,18 @@ Generate greeting:"""
             "user_id": int,
         }
         """
-        message_lower = message.lower()
-        
-        # --- 1) Phrases that clearly are NOT medical emergencies -----------------
-        non_emergency_help_phrases = [
-            "help me with",
-            "help me go through",
-            "help me understand",
-            "help me write",
-            "help me study",
-            "help me cook",
-            "help me code",
-            "help me solve",
-        ]
-        
-        # --- 2) Generic "ask for help" phrases -----------------------------------
-        help_phrases = [
-            "help me",
-            "need help",
-            "please help",
-            "i need your help",
-        ]
-        
-        # --- 3) Symptom / emergency keywords ------------------------------------
-        # Critical emergency – life-threatening red flags
-        critical_keywords = [
-            "chest pain",
-            "crushing chest",
-            "can't breathe",
-            "cannot breathe",
-            "short of breath and chest pain",
-            "heart attack",
-            "stroke",
-            "slurred speech",
-            "face drooping",
-            "unconscious",
-            "not waking up",
-            "fainted and not waking",
-        ]
-        
-        # High severity – serious but not automatically life-threatening
-        high_symptom_keywords = [
-            "severe pain",
-            "severe headache",
-            "worst headache",
-            "hurts a lot",
-            "terrible pain",
-            "can't move",
-            "cannot move",
-            "lost feeling",
-            "numbness",
-            "difficulty breathing",
-            "short of breath",
-            "breathing is hard",
-            "bleeding a lot",
-            "blood everywhere",
-            "fell and hit my head",
-            "broken bone",
-            "fractured bone",
-        ]
-        
-        # Medium severity – concerning but often manageable
-        medium_symptom_keywords = [
-            "dizzy",
-            "lightheaded",
-            "light-headed",
-            "confused",
-            "nausea",
-            "nauseous",
-            "vomiting",
-            "throwing up",
-            "headache",
-            "migraine",
-            "weak",
-            "very tired",
-            "exhausted",
-            "shaky",
-            "worried",
-            "scared",
-            "anxious",
-            "anxiety attack",
-            "panic attack",
-        ]
-        
-        # Words that explicitly indicate emergency context
-        emergency_context_keywords = [
-            "call 911",
-            "call the ambulance",
-            "go to the er",
-            "going to the er",
-            "go to the emergency room",
-            "medical emergency",
-            "this is an emergency",
-        ]
+        # Keyword tables (non-emergency help phrases, help requests, critical,
+        # high and medium symptoms, emergency context) live in intent_router
+        route = route or self.intent_router.match(message)
         
         # ---- 4) Compute flags ---------------------------------------------------
-        has_non_emergency_help = any(p in message_lower for p in non_emergency_help_phrases)
-        has_help = any(p in message_lower for p in help_phrases) and not has_non_emergency_help
+        has_non_emergency_help = route.has("non_emergency_help")
+        has_help = route.has("help_request") and not has_non_emergency_help
         
-        has_critical_symptom = any(k in message_lower for k in critical_keywords)
-        has_high_symptom = any(k in message_lower for k in high_symptom_keywords)
-        has_medium_symptom = any(k in message_lower for k in medium_symptom_keywords)
-        has_emergency_context = any(k in message_lower for k in emergency_context_keywords)
+        has_critical_symptom = route.has("critical_symptom")
+        has_high_symptom = route.has("high_symptom")
+        has_medium_symptom = route.has("medium_symptom")
+        has_emergency_context = route.has("emergency_context")
         
         # If nothing looks like a symptom, bail out
         if not (has_critical_symptom or has_high_symptom or has_medium_symptom or has_emergency_context):
@@ -826,20 +1257,15 @@ Generate greeting:"""
         }
 
     def should_alert_caregiver(self, user_id: int, sentiment_score: float,
-                               message: str) -> bool:
+                               message: str, route: RouteMatch = None) -> bool:
         """Determine if caregiver should be alerted based on conversation"""
         # Alert for very negative sentiment
         if sentiment_score < -0.7:
             return True
 
         # Check for concerning keywords
-        concerning_keywords = [
-            "pain", "hurt", "dizzy", "fall", "fell", "emergency", "help",
-            "can't breathe", "chest pain", "confused", "lost", "scared"
-        ]
-
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in concerning_keywords)
+        route = route or self.intent_router.match(message)
+        return route.has("caregiver_concern")
 
     def _get_next_medication_time(self, user_id: int) -> str:
         """Get the next scheduled medication time for a user"""
@@ -884,15 +1310,70 @@ Generate greeting:"""
             user_message: str,
             conversation_type: str = "general") -> Dict[str, Any]:
         """Generate AI response with context and tools using memory system"""
+        with tracer.trace("chat_turn", user_id=user_id, conversation_type=conversation_type,
+                          streamed=False):
+            turn = self._prepare_response(user_id, user_message, conversation_type)
+            if "request" not in turn:
+                # Answered by a deterministic branch (or preparation failed)
+                if "error" not in turn:
+                    tracer.annotate(branch="fast_path")
+                return turn
+            tracer.annotate(branch="llm")
+            
+            try:
+                # Generate response with dynamic max_tokens
+                # Not cached: the prompt carries the live conversation history
+                ai_response = self._complete("chat", user_id=turn["user_id"], **turn["request"])
+                
+                # Apply dynamic sentence limiting (only for SHORT and MEDIUM)
+                if turn["sentence_limit"]:
+                    ai_response = self._limit_to_sentences(ai_response, max_sentences=turn["sentence_limit"])
+                
+                # If emergency, prepend reassurance message
+                if turn["is_emergency"]:
+                    ai_response = EMERGENCY_REASSURANCE + ai_response
+                
+                return self._finalize_response(turn, ai_response)
+            except Exception as e:
+                return self._error_response(user_id, user_message, conversation_type, e)
+
+    def generate_response_stream(
+            self,
+            user_id: int,
+            user_message: str,
+            conversation_type: str = "general") -> ResponseStream:
+        """
+        Streaming variant of generate_response
+        
+        Returns:
+            ResponseStream yielding response text as the model produces it;
+            its `result` holds the same dict generate_response returns once
+            the stream is exhausted
+        """
+        return ResponseStream(self, user_id, user_message, conversation_type)
+
+    def _prepare_response(
+            self,
+            user_id: int,
+            user_message: str,
+            conversation_type: str = "general") -> Dict[str, Any]:
+        """
+        Run every step of a turn up to the main LLM call
+        
+        Returns:
+            Either a finished response dict (deterministic branches, errors) or
+            a turn dict whose "request" holds the chat completion arguments
+        """
+        speculation = None
         try:
-            message_lower = user_message.lower()
+            # Match every keyword table once; all fast paths and local
+            # detectors below dispatch from this single routing pass
+            with tracer.span("fast_path.route"):
+                route = self.intent_router.match(user_message)
+            message_lower = route.text
             
             # FIRST: Check if this is a medication timing query (handle without LLM)
-            medication_timing_keywords = ['when should i take', 'next medication', 'next dose', 
-                                         'meds due', 'medication due', 'what time are my meds',
-                                         'when is my medication', 'medication schedule',
-                                         'next pill', 'when do i take']
-            is_med_timing_query = any(keyword in message_lower for keyword in medication_timing_keywords)
+            is_med_timing_query = route.has("medication_timing")
             
             if is_med_timing_query:
                 med_response = self._get_next_medication_time(user_id)
@@ -916,25 +1397,14 @@ Generate greeting:"""
             
             # SECOND: Check if this is a current time/date query (handle without LLM)
             # Exclude medication-related queries by checking they're not about meds/pills/dose
-            time_query_keywords = ['time now', 'current time', 'what\'s the time', 
-                                   'tell me the time', 'time is it', 'what is the time',
-                                   'what time is', 'what\'s time']
-            date_query_keywords = ['what is the date', 'what\'s the date', 'what date',
-                                   'what day is it', 'what\'s the day', 'what is the day',
-                                   'date today', 'day today', 'today\'s date']
-            datetime_query_keywords = ['day, time and date', 'date and time', 'time and date',
-                                       'day and time', 'time, date', 'date, time']
-            
-            # Check if asking about date and/or time (not medication-related)
-            is_datetime_query = any(keyword in message_lower for keyword in datetime_query_keywords)
-            is_time_query = (any(keyword in message_lower for keyword in time_query_keywords) and
-                           not any(med_word in message_lower for med_word in ['med', 'pill', 'dose', 'medication']))
-            is_date_query = any(keyword in message_lower for keyword in date_query_keywords)
+            is_datetime_query = route.has("datetime_query")
+            is_time_query = route.has("time_query") and not route.has("medication_word")
+            is_date_query = route.has("date_query")
             
             # Also handle "what time" if it's clearly about current time, not meds
-            if 'what time' in message_lower and not is_med_timing_query:
+            if route.has("what_time") and not is_med_timing_query:
                 # If "what time" is followed by "is it" or similar, it's asking current time
-                if any(phrase in message_lower for phrase in ['what time is it', 'what time it is']):
+                if route.has("what_time_is_it"):
                     is_time_query = True
             
             # Handle date/time queries deterministically
@@ -976,40 +1446,34 @@ Generate greeting:"""
                     "is_emergency": False
                 }
             
+            # Most turns end on the general LLM path, so start its context
+            # retrieval and PII detection while the intent call is in flight
+            speculation = (self._start_speculation(user_id, user_message)
+                           if self.speculative_context else None)
+            
             # AI-Driven Intent Detection (do once for all medication handling)
-            intent = self._detect_user_intent(user_message)
+            with tracer.span("intent"):
+                intent = self._detect_user_intent(user_message, route, user_id)
+            tracer.annotate(intent=intent.get("type"))
             
             # THIRD: AI-Driven Medication Information Queries
             # Handle questions about medications (not logging) with AI + log data
             if intent["type"] == "ask_medication" and intent["confidence"] > 0.6:
-                # Get user's medications and today's logs
-                medications = MedicationCRUD.get_user_medications(user_id, active_only=True)
-                all_logs = MedicationLogCRUD.get_user_logs(user_id, limit=20)
+                self._discard_speculation(speculation)
                 
-                # Filter today's logs (handle timezone-aware/naive comparison)
-                today_start = now_central().replace(hour=0, minute=0, second=0, microsecond=0)
-                today_logs = []
-                for log in all_logs:
-                    if log['taken_at']:
-                        # Convert to timezone-aware if needed
-                        taken_at = to_central(log['taken_at']) if log['taken_at'].tzinfo is None else log['taken_at']
-                        if taken_at >= today_start:
-                            today_logs.append(log)
-                
-                # Build context for AI
-                med_list = "\n".join([f"- {med.name} (Schedule: {med.schedule_times})" for med in medications]) if medications else "No medications prescribed"
-                
-                if today_logs:
-                    log_list = "\n".join([
-                        f"- {log['medication_name']} at {to_central(log['taken_at']).strftime('%I:%M %p')}" 
-                        for log in today_logs
-                    ])
-                    log_context = f"Medications taken today:\n{log_list}"
+                if intent.get("reply"):
+                    # Already answered by the structured medication call
+                    response_text = intent["reply"]
                 else:
-                    log_context = "No medications logged today yet."
+                    # Get user's medications and today's logs
+                    medications = MedicationCRUD.get_user_medications(user_id, active_only=True)
                 
-                # Let AI generate personalized response with context
-                ai_prompt = f"""The user asked: "{user_message}"
+                    # Build context for AI
+                    med_list = "\n".join([f"- {med.name} (Schedule: {med.schedule_times})" for med in medications]) if medications else "No medications prescribed"
+                    log_context = self._format_medication_logs(self._todays_medication_logs(user_id))
+                
+                    # Let AI generate personalized response with context
+                    ai_prompt = f"""The user asked: "{user_message}"
 
 User's prescribed medications:
 {med_list}
@@ -1023,24 +1487,27 @@ Provide a helpful, conversational response that:
 4. If they're asking if they took something, check the logs and tell them
 5. If they're asking how many medications, count from the prescribed list"""
 
-                try:
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": "You are a helpful medical companion. Answer questions about medications based on the provided data."},
-                            {"role": "user", "content": ai_prompt}
-                        ],
-                        temperature=0.3,
-                        max_tokens=200
-                    )
-                    response_text = response.choices[0].message.content.strip()
-                except Exception as e:
-                    # Fallback response
-                    med_count = len(medications)
-                    if med_count > 0:
-                        response_text = f"You have {med_count} medications prescribed: {', '.join([m.name for m in medications])}."
-                    else:
-                        response_text = "You don't have any medications prescribed in the system yet."
+                    try:
+                        # Residents repeat these questions; the answer only changes
+                        # with the medication list and today's logs
+                        response_text = self._complete(
+                            "ask_medication",
+                            messages=[
+                                {"role": "system", "content": "You are a helpful medical companion. Answer questions about medications based on the provided data."},
+                                {"role": "user", "content": ai_prompt}
+                            ],
+                            cache_message=user_message,
+                            cache_context=[med_list, log_context],
+                            user_id=user_id,
+                            semantic=True
+                        ).strip()
+                    except Exception as e:
+                        # Fallback response
+                        med_count = len(medications)
+                        if med_count > 0:
+                            response_text = f"You have {med_count} medications prescribed: {', '.join([m.name for m in medications])}."
+                        else:
+                            response_text = "You don't have any medications prescribed in the system yet."
                 
                 # Save conversation
                 ConversationCRUD.save_conversation(
@@ -1064,8 +1531,14 @@ Provide a helpful, conversational response that:
             
             # Only proceed if AI is confident this is medication logging (not asking)
             if intent["type"] == "log_medication" and intent["confidence"] > 0.75:
-                # Extract medication details using AI
-                med_details = self._extract_medication_details(user_id, user_message)
+                self._discard_speculation(speculation)
+                
+                # Extract medication details using AI (unless the structured
+                # medication call already matched it)
+                med_details = intent.get("medication")
+                if med_details is None:
+                    with tracer.span("medication_extraction"):
+                        med_details = self._extract_medication_details(user_id, user_message)
                 
                 # Require high confidence to auto-log
                 if med_details["medication_id"] and med_details["confidence"] > 0.7:
@@ -1129,17 +1602,16 @@ Provide a helpful, conversational response that:
             
             # FOURTH: Deterministic "yesterday/day before" summary handling
             # Broaden detection to cover common phrasings
-            yesterday_keywords = ['yesterday', 'day before yesterday', 'two days ago']
-            is_yesterday_query = any(keyword in message_lower for keyword in yesterday_keywords)
+            is_yesterday_query = route.has("yesterday")
             
             # Expanded talk/summary indicators
-            talk_indicators = ['talk', 'discuss', 'chat', 'conversation', 'tell me about', 
-                             'what did', 'what happened', 'summary', 'recap']
-            is_talk_query = any(indicator in message_lower for indicator in talk_indicators)
+            is_talk_query = route.has("talk")
             
             if is_yesterday_query and is_talk_query:
+                self._discard_speculation(speculation)
+                
                 # Determine offset
-                offset_days = 1 if 'yesterday' in message_lower and 'day before' not in message_lower else 2
+                offset_days = 1 if 'yesterday' in route.keywords and not route.has("day_before") else 2
                 
                 # Fetch summary using Central Time boundaries
                 summary_data = self.memory_manager.fetch_summary_for_relative_day(user_id, offset_days)
@@ -1171,9 +1643,10 @@ Provide a helpful, conversational response that:
             
             # FIFTH: Partial entity resolution (e.g., "meeting with Mary")
             # Check if message mentions partial event names
-            event_mention_keywords = ['meeting', 'appointment', 'doctor', 'event', 'visit']
-            has_event_mention = any(keyword in message_lower for keyword in event_mention_keywords)
-            is_question = any(q in message_lower for q in ['when', 'what time', 'where', 'remind'])
+            event_mention_keywords = [k for k in KEYWORD_TABLES["event_mention"]
+                                      if k in route.keywords]
+            has_event_mention = bool(event_mention_keywords)
+            is_question = route.has("event_question")
             
             if has_event_mention and is_question:
                 # Extract and sanitize potential event names
@@ -1182,24 +1655,23 @@ Provide a helpful, conversational response that:
                 potential_names = []
                 
                 for keyword in event_mention_keywords:
-                    if keyword in message_lower:
-                        try:
-                            idx = [w.lower() for w in words].index(keyword)
-                            # Get next 2-4 words after keyword
-                            phrase = " ".join(words[idx:min(idx+4, len(words))])
-                            
-                            # Strip punctuation from the phrase
-                            phrase = phrase.translate(str.maketrans('', '', string.punctuation))
-                            
-                            # Remove common stopwords
-                            stopwords = ['with', 'the', 'a', 'an', 'at', 'on', 'in', 'for']
-                            cleaned_words = [w for w in phrase.split() if w.lower() not in stopwords or w.lower() == keyword]
-                            phrase = " ".join(cleaned_words)
-                            
-                            if phrase:
-                                potential_names.append(phrase)
-                        except ValueError:
-                            pass
+                    try:
+                        idx = [w.lower() for w in words].index(keyword)
+                        # Get next 2-4 words after keyword
+                        phrase = " ".join(words[idx:min(idx+4, len(words))])
+                        
+                        # Strip punctuation from the phrase
+                        phrase = phrase.translate(str.maketrans('', '', string.punctuation))
+                        
+                        # Remove common stopwords
+                        stopwords = ['with', 'the', 'a', 'an', 'at', 'on', 'in', 'for']
+                        cleaned_words = [w for w in phrase.split() if w.lower() not in stopwords or w.lower() == keyword]
+                        phrase = " ".join(cleaned_words)
+                        
+                        if phrase:
+                            potential_names.append(phrase)
+                    except ValueError:
+                        pass
                 
                 # Try to find matching events
                 if potential_names:
@@ -1207,6 +1679,8 @@ Provide a helpful, conversational response that:
                         matches = PersonalEventCRUD.find_event_by_name(user_id, potential_name, window_days=7)
                         
                         if matches:
+                            self._discard_speculation(speculation)
+                            
                             if len(matches) == 1:
                                 # Single match - answer with date/time
                                 event = matches[0]
@@ -1257,31 +1731,22 @@ Provide a helpful, conversational response that:
                                 }
             
             # Check if this is a memory-specific query
-            memory_query_keywords = ['remember', 'talked about', 'medication schedule', 
-                                   'breakfast', 'lunch', 'dinner', 'meal', 
-                                   'yesterday', 'summary', 'discussed']
-            is_memory_query = any(keyword in user_message.lower() for keyword in memory_query_keywords)
+            is_memory_query = route.has("memory_query")
             
             # Use memory manager for memory-specific queries
             if is_memory_query:
                 memory_response = self.memory_manager.recall_information(user_id, user_message)
                 if memory_response and len(memory_response) > 20:
-                    # Save to database first
-                    conversation = ConversationCRUD.save_conversation(
-                        user_id=user_id,
-                        message=user_message,
-                        response=memory_response,
-                        conversation_type="memory_query"
-                    )
+                    self._discard_speculation(speculation)
                     
-                    # Add to vector store incrementally
-                    self.memory_manager.add_conversation(
-                        user_id=user_id,
-                        conversation_id=conversation.id,
-                        user_message=user_message,
-                        assistant_response=memory_response,
-                        timestamp=conversation.timestamp
-                    )
+                    # Save and index it after the reply, like the LLM path
+                    user_msg_redacted, memory_response_redacted, _, _ = sanitize_before_storage(
+                        user_message, memory_response)
+                    self._submit_post_processing("save_conversation", user_id, {
+                        "message": user_msg_redacted,
+                        "response": memory_response_redacted,
+                        "conversation_type": "memory_query",
+                    })
                     
                     return {
                         "response": memory_response,
@@ -1292,20 +1757,27 @@ Provide a helpful, conversational response that:
                         "is_emergency": False
                     }
             
-            # Get full context from all memory layers
-            memory_context = self.memory_manager.get_full_context(user_id, user_message)
+            # Get full context from all memory layers (fetched concurrently, each
+            # layer under its own time budget)
+            with tracer.span("memory.context", speculative=speculation is not None):
+                if speculation is not None:
+                    speculation["settled"] = True
+                    context_result = self.memory_manager.collect_context(speculation["context"])
+                    metrics.increment("speculation.used")
+                else:
+                    context_result = self.memory_manager.build_context(user_id, user_message)
 
             # Get user info
             user = UserCRUD.get_user(user_id)
             user_name = user.name if user else "there"
 
             # Use local fallback sentiment analysis (no API call)
-            sentiment_result = self._local_sentiment_analysis(user_message)
+            sentiment_result = self._local_sentiment_analysis(user_message, route)
             sentiment_score = sentiment_result.get("score", 0)
             sentiment_label = sentiment_result.get("label", "neutral")
             
             # Use local keyword-based emergency detection (no API call)
-            emergency_result = self._local_emergency_detection(user_message, user_id)
+            emergency_result = self._local_emergency_detection(user_message, user_id, route)
             is_emergency = emergency_result.get("is_emergency", False)
             emergency_severity = emergency_result.get("severity", "manageable")
             emergency_concerns = emergency_result.get("concerns", [])
@@ -1317,27 +1789,34 @@ Provide a helpful, conversational response that:
                 emergency_context = "\nIMPORTANT: The user is experiencing emergency symptoms. Provide immediate reassurance and comfort."
 
             # Decide verbosity level based on user intent
-            verbosity_level = self._decide_verbosity(user_message)
+            verbosity_level = self._decide_verbosity(user_message, route)
             
-            # Set parameters based on verbosity
+            # Model, max_tokens and temperature come from the routing table
+            model_route = self.model_router.route("chat", verbosity_level, emergency=is_emergency)
             if verbosity_level == "SHORT":
-                max_tokens = 220
                 sentence_limit = 4
             elif verbosity_level == "MEDIUM":
-                max_tokens = 600
                 sentence_limit = 8
             else:  # LONG
-                max_tokens = 1200
                 sentence_limit = None  # No sentence limit for detailed responses
             
             # Check for PII in user message BEFORE sending to AI
-            detected_pii = PIIRedactor.detect_pii(user_message)
+            with tracer.span("pii_detection"):
+                if speculation is not None:
+                    detected_pii = speculation["pii"].result()
+                else:
+                    detected_pii = PIIRedactor.detect_pii(user_message)
             pii_privacy_notice = generate_safe_response_prompt(detected_pii) if detected_pii else ""
             
-            # Build the prompt with comprehensive memory context
-            prompt = f"""{memory_context}
-
-User's name: {user_name}
+            # Build the prompt with comprehensive memory context. The system
+            # message is the static persona; the time goes in the trailing block
+            if self.static_prompt_prefix:
+                system_prompt = PERSONA_PROMPT
+                time_context = self._time_context() + "\n"
+            else:
+                system_prompt = self._get_system_prompt()
+                time_context = ""
+            prompt_tail = f"""{time_context}User's name: {user_name}
 Conversation type: {conversation_type}
 Current message: {user_message}{emergency_context}
 {pii_privacy_notice}
@@ -1354,115 +1833,188 @@ Please respond as Carely, keeping in mind:
 
 Respond naturally and warmly based on ALL the context provided."""
 
-            # Generate response with dynamic max_tokens
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{
-                    "role": "system",
-                    "content": self._get_system_prompt()
-                }, {
-                    "role": "user",
-                    "content": prompt
-                }],
-                temperature=0.3,
-                max_tokens=max_tokens,
-                stop=["\n\n", "\n\n\n"])
-
-            ai_response = response.choices[0].message.content
-            
-            # Apply dynamic sentence limiting (only for SHORT and MEDIUM)
-            if sentence_limit:
-                ai_response = self._limit_to_sentences(ai_response, max_sentences=sentence_limit)
-            
-            # If emergency, prepend reassurance message
-            if is_emergency:
-                reassurance = "I'm here with you. I'm notifying your caregiver now so help can reach you quickly. Try to sit comfortably and focus on slow breaths. You're not alone.\n\n"
-                ai_response = reassurance + ai_response
-
-            # PII/PHI Detection and Redaction before storage
-            user_msg_redacted, ai_response_redacted, contains_pii, pii_warning = sanitize_before_storage(
-                user_message, ai_response
-            )
-            
-            # If PII was detected, append warning to response (for user to see)
-            ai_response_display = ai_response
-            if contains_pii:
-                ai_response_display = ai_response + "\n\n" + pii_warning
+            with tracer.span("prompt_packing"):
+                packed = self._pack_prompt(system_prompt, prompt_tail, context_result["sections"])
+            memory_context = "\n".join(packed["texts"][name] for name in CONTEXT_HEADERS
+                                       if name in packed["texts"])
+            prompt = f"""{memory_context}
 
-            # Save conversation to database with REDACTED versions
-            conversation = ConversationCRUD.save_conversation(
-                user_id=user_id,
-                message=user_msg_redacted,  # Store redacted version
-                response=ai_response_redacted,  # Store redacted version
-                sentiment_score=sentiment_score,
-                sentiment_label=sentiment_label,
-                conversation_type=conversation_type)
-            
-            # Add conversation to vector store incrementally
-            self.memory_manager.add_conversation(
-                user_id=user_id,
-                conversation_id=conversation.id,
-                user_message=user_message,
-                assistant_response=ai_response,
-                timestamp=conversation.timestamp
-            )
+{prompt_tail}"""
 
-            # Check if caregiver alert is needed
-            alert_sent = False
-            if self.should_alert_caregiver(user_id, sentiment_score,
-                                           user_message):
-                self.alert_caregiver_tool(
-                    user_id=user_id,
-                    alert_type="mood_concern",
-                    description=
-                    f"User expressed concerning sentiment: '{user_message}' (sentiment: {sentiment_label})",
-                    severity="medium" if sentiment_score > -0.8 else "high")
-                alert_sent = True
-
-            # Determine quick action buttons (2-3 relevant buttons)
-            quick_actions = self.determine_quick_actions(user_message, user_id)
-            
             return {
-                "response": ai_response_display,  # Return display version with PII warning
+                "user_id": user_id,
+                "user_message": user_message,
+                "conversation_type": conversation_type,
+                "route": route,
+                "request": {
+                    "model": model_route.model,
+                    "messages": [{
+                        "role": "system",
+                        "content": system_prompt
+                    }, {
+                        "role": "user",
+                        "content": prompt
+                    }],
+                    "temperature": model_route.temperature,
+                    "max_tokens": model_route.max_tokens,
+                    "stop": ["\n\n", "\n\n\n"],
+                },
+                "sentence_limit": sentence_limit,
                 "sentiment_score": sentiment_score,
                 "sentiment_label": sentiment_label,
-                "alert_sent": alert_sent,
-                "conversation_id": conversation.id,
                 "is_emergency": is_emergency,
                 "emergency_severity": emergency_severity,
                 "emergency_concerns": emergency_concerns,
                 "should_alert": should_alert,
-                "quick_actions": quick_actions,
-                "contains_pii": contains_pii,  # Flag for UI to show warning
-                "emergency_result": emergency_result  # Full emergency detection result for Telegram
+                "emergency_result": emergency_result,
+                "context_result": context_result,
+                "prompt_packing": packed,
             }
 
         except Exception as e:
-            # Check if it's a rate limit error
-            error_str = str(e)
-            print(f"ERROR in generate_response: {error_str}")  # Debug logging
-            import traceback
-            traceback.print_exc()  # Print full traceback
-            
-            if "429" in error_str or "rate" in error_str.lower():
-                error_response = "I'm getting a lot of requests right now and need a moment to catch my breath! Please wait just a minute and try again. I'm still here for you!"
-            else:
-                error_response = f"I'm sorry, I'm having a bit of trouble right now. But I'm here for you! Is there anything specific you'd like to talk about or any way I can help you today?"
+            return self._error_response(user_id, user_message, conversation_type, e)
+        finally:
+            # Frees the context workers if the turn ended before collecting
+            self._discard_speculation(speculation)
 
-            # Still save the conversation attempt
-            ConversationCRUD.save_conversation(
-                user_id=user_id,
-                message=user_message,
-                response=error_response,
-                conversation_type=conversation_type)
+    def _pack_prompt(self, system_prompt: str, prompt_tail: str,
+                     memory_sections: Dict[str, str]) -> Dict:
+        """
+        Fit the memory layers into the prompt token budget. The system prompt,
+        the current question (with any emergency flags) and the profile always
+        go in, since the instructions tell the model to use the user's
+        medications; then recent turns and relevant memory.
+        
+        Args:
+            system_prompt: System message
+            prompt_tail: Current message and instructions
+            memory_sections: Memory layer texts by CONTEXT_HEADERS name
+        
+        Returns:
+            ContextPacker.pack result
+        """
+        return self.context_packer.pack([
+            PromptSection("system", system_prompt, priority=0, required=True),
+            PromptSection("question", prompt_tail, priority=0, required=True),
+            PromptSection("profile", memory_sections.get("profile"), priority=1,
+                          header=CONTEXT_HEADERS["profile"], required=True),
+            PromptSection("recent", memory_sections.get("recent"), priority=2,
+                          header=CONTEXT_HEADERS["recent"], truncate="tail",
+                          unit_prefix="User: "),
+            PromptSection("similar", memory_sections.get("similar"), priority=3,
+                          header=CONTEXT_HEADERS["similar"], truncate="head"),
+        ])
 
-            return {
-                "response": error_response,
-                "sentiment_score": 0,
-                "sentiment_label": "neutral",
-                "alert_sent": False,
-                "error": str(e)
-            }
+    def _finalize_response(self, turn: Dict[str, Any], ai_response: str) -> Dict[str, Any]:
+        """
+        Hand a generated reply to post-processing and assemble the response dict
+        
+        Args:
+            turn: Turn dict from _prepare_response
+            ai_response: Final reply text (sentence limit and reassurance applied)
+        
+        Returns:
+            Response dict for the UI / API
+        """
+        user_id = turn["user_id"]
+        user_message = turn["user_message"]
+        route = turn["route"]
+        sentiment_score = turn["sentiment_score"]
+        sentiment_label = turn["sentiment_label"]
+        emergency_result = turn["emergency_result"]
+        context_result = turn["context_result"]
+        
+        # PII/PHI Detection and Redaction before storage
+        with tracer.span("pii_redaction"):
+            user_msg_redacted, ai_response_redacted, contains_pii, pii_warning = sanitize_before_storage(
+                user_message, ai_response
+            )
+        
+        # If PII was detected, append warning to response (for user to see)
+        ai_response_display = ai_response
+        if contains_pii:
+            ai_response_display = ai_response + "\n\n" + pii_warning
+
+        # Save conversation (REDACTED versions only) and index it in the
+        # vector store after the reply; nothing here is shown to the user
+        conversation_id = self._submit_post_processing("save_conversation", user_id, {
+            "message": user_msg_redacted,
+            "response": ai_response_redacted,
+            "sentiment_score": sentiment_score,
+            "sentiment_label": sentiment_label,
+            "conversation_type": turn["conversation_type"],
+        })
+
+        # Check if caregiver alert is needed (the alert itself is written later)
+        alert_sent = False
+        with tracer.span("alert_check"):
+            needs_alert = self.should_alert_caregiver(user_id, sentiment_score,
+                                                      user_message, route)
+        if needs_alert:
+            self._submit_post_processing("caregiver_alert", user_id, {
+                "alert_type": "mood_concern",
+                "description":
+                f"User expressed concerning sentiment: '{user_msg_redacted}' (sentiment: {sentiment_label})",
+                "severity": "medium" if sentiment_score > -0.8 else "high",
+            })
+            alert_sent = True
+
+        # Have a greeting ready for the next time the chat page opens
+        self._schedule_greeting_precompute(user_id)
+
+        # Determine quick action buttons (2-3 relevant buttons)
+        quick_actions = self.determine_quick_actions(user_message, user_id, route)
+        
+        return {
+            "response": ai_response_display,  # Return display version with PII warning
+            "sentiment_score": sentiment_score,
+            "sentiment_label": sentiment_label,
+            "alert_sent": alert_sent,
+            "conversation_id": conversation_id,  # None until the write-behind job runs
+            "is_emergency": turn["is_emergency"],
+            "emergency_severity": turn["emergency_severity"],
+            "emergency_concerns": turn["emergency_concerns"],
+            "should_alert": turn["should_alert"],
+            "quick_actions": quick_actions,
+            "contains_pii": contains_pii,  # Flag for UI to show warning
+            "emergency_result": emergency_result,  # Full emergency detection result for Telegram
+            "context_timings": context_result["timings"],  # Per-layer retrieval time (ms)
+            "context_dropped": context_result["dropped"],
+            "prompt_tokens": turn["prompt_packing"]["total_tokens"]  # Estimated
+        }
+
+    def _error_response(self, user_id: int, user_message: str,
+                        conversation_type: str, e: Exception) -> Dict[str, Any]:
+        """Friendly fallback reply for a failed turn (still saved to history)"""
+        # Check if it's a rate limit error
+        error_str = str(e)
+        print(f"ERROR in generate_response: {error_str}")  # Debug logging
+        import traceback
+        traceback.print_exc()  # Print full traceback
+        metrics.increment("chat.errors")
+        tracer.annotate(branch="error", error=type(e).__name__)
+        
+        if is_rate_limit_error(e):
+            error_response = "I'm getting a lot of requests right now and need a moment to catch my breath! Please wait just a minute and try again. I'm still here for you!"
+        elif isinstance(e, LLMDegradedError):
+            error_response = "I'm a little slow to think right now, but I'm right here with you. Could you tell me a bit more, or ask me again in a moment?"
+        else:
+            error_response = f"I'm sorry, I'm having a bit of trouble right now. But I'm here for you! Is there anything specific you'd like to talk about or any way I can help you today?"
+
+        # Still save the conversation attempt
+        ConversationCRUD.save_conversation(
+            user_id=user_id,
+            message=user_message,
+            response=error_response,
+            conversation_type=conversation_type)
+
+        return {
+            "response": error_response,
+            "sentiment_score": 0,
+            "sentiment_label": "neutral",
+            "alert_sent": False,
+            "error": str(e)
+        }
 
     def conduct_daily_checkin(self,
                               user_id: int,
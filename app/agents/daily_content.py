@@ -0,0 +1,128 @@
+"""
+Process-wide store for content generated once per day
+Affirmations, jokes, puzzles and memory cues are keyed by date, content type
+and (optionally) user, kept in memory and in the DailyContent table, and
+generated with single flight: concurrent sessions asking for the same missing
+item wait for one generator call instead of each making their own
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from app.database.crud import DailyContentCRUD
+from utils.metrics import metrics
+from utils.timezone_utils import now_central
+
+logger = logging.getLogger(__name__)
+
+# Days of rows kept in the DailyContent table
+KEEP_DAYS = 7
+
+# (date, content type, user id; 0 = shared)
+Key = Tuple[str, str, int]
+
+
+class _Flight:
+    """One in-progress generation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class DailyContentStore:
+    """In-memory daily content backed by SQLite, with single-flight generation"""
+
+    def __init__(self):
+        self._day: Optional[str] = None
+        self._entries: Dict[Key, str] = {}
+        self._flights: Dict[Key, _Flight] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def today() -> str:
+        return now_central().strftime('%Y-%m-%d')
+
+    def get_or_create(self, content_type: str, generate: Callable[[], str],
+                      user_id: Optional[int] = None) -> str:
+        """
+        Today's content of a type, generating and storing it on first request
+
+        Args:
+            content_type: e.g. "affirmation", "joke", "puzzle", "memory_cue"
+            generate: Produces the content; raise to leave nothing stored (the
+                next request tries again)
+            user_id: Scope the content to one user (None = shared)
+
+        Returns:
+            The content
+        """
+        day = self.today()
+        key = (day, content_type, user_id or 0)
+        with self._lock:
+            if day != self._day:
+                self._roll_over(day)
+            if key in self._entries:
+                metrics.increment("daily_content.hits")
+                return self._entries[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            metrics.increment("daily_content.coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = DailyContentCRUD.get_content(*key)
+            if value is None:
+                metrics.increment("daily_content.generated")
+                value = DailyContentCRUD.save_content(day, content_type, generate(), user_id or 0)
+            flight.value = value
+            with self._lock:
+                if day == self._day:
+                    self._entries[key] = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _roll_over(self, day: str):
+        """New day: forget yesterday's entries and prune old rows (lock held)"""
+        self._day = day
+        self._entries.clear()
+        cutoff = (now_central() - timedelta(days=KEEP_DAYS)).strftime('%Y-%m-%d')
+        try:
+            DailyContentCRUD.delete_before(cutoff)
+        except Exception as e:
+            logger.warning(f"Could not prune daily content: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Global instance for easy access
+_store: Optional[DailyContentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_daily_content_store() -> DailyContentStore:
+    """Get singleton daily content store (thread-safe)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DailyContentStore()
+    return _store
@@ -0,0 +1,302 @@
+"""
+Local cascading intent classifier
+Weighted rules combined in a softmax (multinomial logistic) model. The rule
+weights start from hand-tuned priors and are re-fitted on the stored
+Conversation.conversation_type history, so the confidence score is a
+calibrated probability. Only messages below the escalation threshold are
+sent on to the LLM classifier in CompanionAgent._detect_user_intent.
+"""
+
+import math
+import os
+import re
+import threading
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.agents.intent_router import RouteMatch, get_intent_router
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ["log_medication", "ask_medication", "ask_schedule",
+           "emergency", "mood_check", "general_chat"]
+
+# Stored conversation types that map cleanly onto an intent label
+CONVERSATION_TYPE_LABELS = {
+    "medication_logging": "log_medication",
+    "medication_inquiry": "ask_medication",
+    "medication_schedule_query": "ask_schedule",
+    "event_lookup": "ask_schedule",
+    "event_clarification": "ask_schedule",
+    "general": "general_chat",
+}
+
+# Messages at or above this confidence are answered locally
+DEFAULT_ESCALATION_THRESHOLD = float(os.getenv("CARELY_INTENT_ESCALATION_THRESHOLD", "0.85"))
+
+_MED_WORDS = r"(pills?|meds?|medications?|medicines?|tablets?|doses?|capsules?|vitamins?|insulin|inhaler|prescriptions?)"
+_MED = re.compile(r"\b" + _MED_WORDS + r"\b")
+_TOOK = re.compile(r"\b(i|i've|i have|i just|i already)\s+(just\s+|already\s+|now\s+)?(took|taken|had|swallowed|finished)\b")
+# Took / swallowed + my / the ("took the little white one"): never small talk locally
+_TOOK_MY = re.compile(r"\b(took|taken|swallowed|finished)\s+(my|the|both|all)\b")
+_DID_NOT_TAKE = re.compile(r"\b(forgot to take|didn't take|did not take|haven't taken|have not taken|not taken|skipped|missed)\b")
+_QUESTION_START = re.compile(r"^\s*(did|have|should|do|does|can|could|what|which|how|when|is|are|am|was)\b")
+_DID_I_TAKE = re.compile(r"\b(did|have) i\b.*\b(take|taken|had)\b")
+_SCHEDULE = re.compile(r"\b(schedule|appointments?|calendar|agenda|plans?|coming up|upcoming|what's on|what is on)\b")
+_FEELING = re.compile(r"\b(i feel|i'm feeling|i am feeling|i felt|feeling (so|very|a bit|really)|i'm so|i am so)\b")
+_GREETING = re.compile(r"^\s*(hi|hello|hey|good (morning|afternoon|evening)|howdy)\b")
+_THANKS = re.compile(r"\b(thanks|thank you|bye|goodbye|see you)\b")
+
+# (rule name, intent, prior weight, predicate). Predicates get the lowered
+# message, its keyword route and whether it names one of the user's
+# medications (name, brand alias or misspelling from the medication index)
+Rule = Tuple[str, str, float, Callable[[str, RouteMatch, bool], bool]]
+
+RULES: List[Rule] = [
+    ("took_medication", "log_medication", 3.0,
+     lambda t, r, m: bool(_TOOK.search(t)) and (m or bool(_MED.search(t)))),
+    ("took_my", "log_medication", 1.5, lambda t, r, m: bool(_TOOK_MY.search(t))),
+    ("did_not_take", "log_medication", -3.5, lambda t, r, m: bool(_DID_NOT_TAKE.search(t))),
+    ("log_question_penalty", "log_medication", -3.0,
+     lambda t, r, m: "?" in t or bool(_QUESTION_START.search(t))),
+
+    ("medication_question", "ask_medication", 2.5,
+     lambda t, r, m: (m or bool(_MED.search(t))) and ("?" in t or bool(_QUESTION_START.search(t)))),
+    ("did_i_take", "ask_medication", 2.5, lambda t, r, m: bool(_DID_I_TAKE.search(t))),
+    ("missed_medication", "ask_medication", 1.5,
+     lambda t, r, m: bool(_DID_NOT_TAKE.search(t)) and (m or bool(_MED.search(t)))),
+
+    ("schedule_words", "ask_schedule", 2.0, lambda t, r, m: bool(_SCHEDULE.search(t))),
+    ("schedule_question", "ask_schedule", 1.0,
+     lambda t, r, m: bool(_SCHEDULE.search(t)) and ("?" in t or bool(_QUESTION_START.search(t)))),
+    ("event_question", "ask_schedule", 1.0,
+     lambda t, r, m: r.has("event_mention") and r.has("event_question")),
+
+    ("critical_symptom", "emergency", 4.5, lambda t, r, m: r.has("critical_symptom")),
+    ("high_symptom", "emergency", 3.0, lambda t, r, m: r.has("high_symptom")),
+    ("emergency_context", "emergency", 3.5, lambda t, r, m: r.has("emergency_context")),
+    ("help_with_symptom", "emergency", 1.5,
+     lambda t, r, m: r.has("help_request") and not r.has("non_emergency_help")
+     and r.has("medium_symptom")),
+
+    ("feeling_statement", "mood_check", 2.0, lambda t, r, m: bool(_FEELING.search(t))),
+    ("negative_words", "mood_check", 1.0, lambda t, r, m: r.has("sentiment_negative")),
+    ("loneliness", "mood_check", 1.5, lambda t, r, m: r.has("emotion_loneliness")),
+    ("medium_symptom", "mood_check", 0.5, lambda t, r, m: r.has("medium_symptom")),
+
+    ("greeting", "general_chat", 2.0, lambda t, r, m: bool(_GREETING.search(t))),
+    ("thanks", "general_chat", 1.5, lambda t, r, m: bool(_THANKS.search(t))),
+    ("no_signal", "general_chat", 2.5,
+     lambda t, r, m: not (m or _MED.search(t) or _SCHEDULE.search(t) or _FEELING.search(t)
+                       or r.has("critical_symptom") or r.has("high_symptom")
+                       or r.has("medium_symptom"))),
+]
+
+# Per-intent bias priors (logit offsets)
+PRIOR_BIAS = {
+    "log_medication": -1.0,
+    "ask_medication": -1.0,
+    "ask_schedule": -1.0,
+    "emergency": -1.5,
+    "mood_check": -0.5,
+    "general_chat": 0.0,
+}
+
+
+class LocalIntentClassifier:
+    """Weighted-rule softmax classifier with weights fitted on chat history"""
+
+    def __init__(self, escalation_threshold: float = None):
+        """
+        Initialize the classifier with prior weights
+
+        Args:
+            escalation_threshold: Minimum confidence to answer locally
+                (default: CARELY_INTENT_ESCALATION_THRESHOLD or 0.85)
+        """
+        self.escalation_threshold = (DEFAULT_ESCALATION_THRESHOLD
+                                     if escalation_threshold is None else escalation_threshold)
+        self.router = get_intent_router()
+        self.weights: Dict[str, float] = {name: weight for name, _, weight, _ in RULES}
+        self.bias: Dict[str, float] = dict(PRIOR_BIAS)
+        self.trained_samples = 0
+        self._trained = False
+        self._train_lock = threading.Lock()
+        self._train_thread: Optional[threading.Thread] = None
+
+    def _active_rules(self, text: str, route: RouteMatch,
+                      names_medication: bool = False) -> List[Tuple[str, str]]:
+        return [(name, intent) for name, intent, _, predicate in RULES
+                if predicate(text, route, names_medication)]
+
+    def _probabilities(self, active: List[Tuple[str, str]], weights: Dict[str, float] = None,
+                       bias: Dict[str, float] = None) -> Dict[str, float]:
+        weights = self.weights if weights is None else weights
+        logits = dict(self.bias if bias is None else bias)
+        for name, intent in active:
+            logits[intent] += weights[name]
+        peak = max(logits.values())
+        exps = {intent: math.exp(value - peak) for intent, value in logits.items()}
+        total = sum(exps.values())
+        return {intent: value / total for intent, value in exps.items()}
+
+    def predict(self, text: str, route: RouteMatch = None,
+                names_medication: bool = False) -> Dict[str, object]:
+        """
+        Classify a message with the local model only
+
+        Args:
+            text: User message
+            route: Optional precomputed keyword route for the message
+            names_medication: The message names one of the user's medications
+                (see MedicationNameIndex.mentions)
+
+        Returns:
+            Dict with type, confidence, reasoning and probabilities; "escalate"
+            is set when the message must not be answered locally
+        """
+        route = route or self.router.match(text)
+        active = self._active_rules(route.text, route, names_medication)
+        probabilities = self._probabilities(active)
+        intent = max(probabilities, key=probabilities.get)
+        fired = [name for name, rule_intent in active if rule_intent == intent]
+        prediction = {
+            "type": intent,
+            "confidence": round(probabilities[intent], 4),
+            "reasoning": f"local rules: {', '.join(fired) if fired else 'prior'}",
+            "probabilities": probabilities,
+            "source": "local",
+        }
+        if intent == "general_chat" and (names_medication or _TOOK_MY.search(route.text)):
+            # "took the little white one" may be a dose the rules do not know:
+            # a missed log costs more than an LLM call. Other "had ..." turns
+            # ("I had lunch with my daughter") are left to the threshold
+            prediction["escalate"] = True
+        return prediction
+
+    def should_escalate(self, prediction: Dict[str, object]) -> bool:
+        """True when the local prediction is too uncertain (or not allowed) to act on"""
+        return (prediction.get("escalate", False)
+                or prediction["confidence"] < self.escalation_threshold)
+
+    def fit(self, samples: List[Tuple[str, str]], epochs: int = 60,
+            learning_rate: float = 0.5, l2: float = 0.05) -> int:
+        """
+        Fit rule weights and biases on labelled messages (softmax regression,
+        regularised towards the prior weights)
+
+        Args:
+            samples: List of (message, intent) or (message, intent,
+                names_medication) tuples
+            epochs: Full-batch gradient steps
+            learning_rate: Step size
+            l2: Strength of the pull towards the prior weights
+
+        Returns:
+            Number of samples used
+        """
+        data = []
+        for text, label, *rest in samples:
+            if label not in INTENTS or not text:
+                continue
+            route = self.router.match(text)
+            names_medication = bool(rest and rest[0])
+            data.append((self._active_rules(route.text, route, names_medication), label))
+        if not data:
+            return 0
+
+        # Fitted on copies and swapped in at the end: predict() may run meanwhile
+        priors = {name: weight for name, _, weight, _ in RULES}
+        weights, bias = dict(self.weights), dict(self.bias)
+        n = float(len(data))
+        for _ in range(epochs):
+            grad_w = {name: 0.0 for name in weights}
+            grad_b = {intent: 0.0 for intent in INTENTS}
+            for active, label in data:
+                probabilities = self._probabilities(active, weights, bias)
+                for intent in INTENTS:
+                    grad_b[intent] += probabilities[intent] - (1.0 if intent == label else 0.0)
+                for name, intent in active:
+                    grad_w[name] += probabilities[intent] - (1.0 if intent == label else 0.0)
+            for name in weights:
+                step = grad_w[name] / n + l2 * (weights[name] - priors[name])
+                weights[name] -= learning_rate * step
+            for intent in INTENTS:
+                step = grad_b[intent] / n + l2 * (bias[intent] - PRIOR_BIAS[intent])
+                bias[intent] -= learning_rate * step
+
+        self.weights, self.bias = weights, bias
+        self.trained_samples = len(data)
+        return len(data)
+
+    def train_from_history(self, limit: int = 2000) -> int:
+        """
+        Fit on stored conversations whose conversation_type maps to an intent.
+        Negative-sentiment "general" rows are skipped because mood and
+        emergency turns were historically saved as "general" too.
+
+        Args:
+            limit: Maximum number of conversations to read
+
+        Returns:
+            Number of samples used
+        """
+        from app.agents.medication_index import get_medication_index
+        from app.database.crud import ConversationCRUD
+
+        medication_index = get_medication_index()
+        conversations = ConversationCRUD.get_conversations_by_type(
+            list(CONVERSATION_TYPE_LABELS), limit=limit)
+        samples = []
+        for conv in conversations:
+            if conv.conversation_type == "general" and conv.sentiment_label == "negative":
+                continue
+            samples.append((conv.message, CONVERSATION_TYPE_LABELS[conv.conversation_type],
+                            medication_index.mentions(conv.user_id, conv.message or "")))
+        used = self.fit(samples)
+        logger.info(f"Local intent classifier trained on {used} stored conversations")
+        return used
+
+    def ensure_trained(self):
+        """Train once from history (failures keep the priors)"""
+        if self._trained:
+            return
+        with self._train_lock:
+            if self._trained:
+                return
+            try:
+                self.train_from_history()
+            except Exception as e:
+                logger.warning(f"Could not train local intent classifier: {e}")
+            self._trained = True
+
+    def train_in_background(self) -> Optional[threading.Thread]:
+        """
+        Start training from history in a daemon thread (once); predictions use
+        the prior weights until the fitted ones are swapped in
+
+        Returns:
+            The training thread, or None if training already ran or started
+        """
+        with self._train_lock:
+            if self._trained or self._train_thread is not None:
+                return None
+            self._train_thread = threading.Thread(target=self.ensure_trained, daemon=True,
+                                                  name="carely-intent-training")
+            self._train_thread.start()
+            return self._train_thread
+
+
+# Global instance for easy access
+_classifier: Optional[LocalIntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> LocalIntentClassifier:
+    """Get singleton local intent classifier (thread-safe)"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = LocalIntentClassifier()
+    return _classifier
@@ -0,0 +1,246 @@
+"""
+Compiled single-pass keyword router for the companion agent
+All keyword tables used by the deterministic fast paths, local sentiment,
+local emergency detection, caregiver alerting and quick actions are compiled
+once into a single trie-shaped regex and matched in one scan per message
+"""
+
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+
+# Keyword tables (category -> phrases). Matching is case-insensitive substring
+# matching, exactly like the `any(k in message_lower ...)` checks they replace.
+KEYWORD_TABLES: Dict[str, tuple] = {
+    # --- Deterministic fast paths in generate_response ---------------------
+    "medication_timing": (
+        'when should i take', 'next medication', 'next dose', 'meds due',
+        'medication due', 'what time are my meds', 'when is my medication',
+        'medication schedule', 'next pill', 'when do i take',
+    ),
+    "time_query": (
+        'time now', 'current time', 'what\'s the time', 'tell me the time',
+        'time is it', 'what is the time', 'what time is', 'what\'s time',
+    ),
+    "date_query": (
+        'what is the date', 'what\'s the date', 'what date', 'what day is it',
+        'what\'s the day', 'what is the day', 'date today', 'day today',
+        'today\'s date',
+    ),
+    "datetime_query": (
+        'day, time and date', 'date and time', 'time and date', 'day and time',
+        'time, date', 'date, time',
+    ),
+    "medication_word": ('med', 'pill', 'dose', 'medication'),
+    "what_time": ('what time',),
+    "what_time_is_it": ('what time is it', 'what time it is'),
+    "yesterday": ('yesterday', 'day before yesterday', 'two days ago'),
+    "day_before": ('day before',),
+    "talk": (
+        'talk', 'discuss', 'chat', 'conversation', 'tell me about',
+        'what did', 'what happened', 'summary', 'recap',
+    ),
+    "event_mention": ('meeting', 'appointment', 'doctor', 'event', 'visit'),
+    "event_question": ('when', 'what time', 'where', 'remind'),
+    "memory_query": (
+        'remember', 'talked about', 'medication schedule', 'breakfast',
+        'lunch', 'dinner', 'meal', 'yesterday', 'summary', 'discussed',
+    ),
+
+    # --- Verbosity heuristic (fallback when the LLM classifier fails) -------
+    "verbosity_long": (
+        "step by step", "step-by-step", "explain", "tell me about", "how do i",
+        "how can i", "story", "describe", "what happened", "walk me through",
+        "detail", "instruction",
+    ),
+    "verbosity_medium": (
+        "why", "how", "what is", "what are", "summary", "summarize", "compare",
+        "difference",
+    ),
+
+    # --- Local sentiment analysis ------------------------------------------
+    "sentiment_positive": (
+        "good", "great", "happy", "wonderful", "excellent", "love", "enjoy",
+        "better", "fine", "well", "nice", "pleasant", "comfortable", "peaceful",
+    ),
+    "sentiment_negative": (
+        "bad", "terrible", "awful", "hate", "horrible", "pain", "hurt", "sad",
+        "worried", "anxious", "confused", "lost", "dizzy", "sick", "tired",
+        "lonely", "scared", "frightened", "depressed", "upset",
+    ),
+    "sentiment_concern": (
+        "pain", "hurt", "dizzy", "fall", "emergency", "help", "confused",
+        "memory", "forgot", "lost", "scared", "can't", "unable", "difficult",
+    ),
+    "emotion_discomfort": ("pain", "hurt", "sick"),
+    "emotion_loneliness": ("lonely", "alone", "miss"),
+    "emotion_contentment": ("happy", "good", "great"),
+
+    # --- Local emergency detection -----------------------------------------
+    # Phrases that clearly are NOT medical emergencies
+    "non_emergency_help": (
+        "help me with", "help me go through", "help me understand",
+        "help me write", "help me study", "help me cook", "help me code",
+        "help me solve",
+    ),
+    # Generic "ask for help" phrases
+    "help_request": ("help me", "need help", "please help", "i need your help"),
+    # Critical emergency – life-threatening red flags
+    "critical_symptom": (
+        "chest pain", "crushing chest", "can't breathe", "cannot breathe",
+        "short of breath and chest pain", "heart attack", "stroke",
+        "slurred speech", "face drooping", "unconscious", "not waking up",
+        "fainted and not waking",
+    ),
+    # High severity – serious but not automatically life-threatening
+    "high_symptom": (
+        "severe pain", "severe headache", "worst headache", "hurts a lot",
+        "terrible pain", "can't move", "cannot move", "lost feeling",
+        "numbness", "difficulty breathing", "short of breath",
+        "breathing is hard", "bleeding a lot", "blood everywhere",
+        "fell and hit my head", "broken bone", "fractured bone",
+    ),
+    # Medium severity – concerning but often manageable
+    "medium_symptom": (
+        "dizzy", "lightheaded", "light-headed", "confused", "nausea",
+        "nauseous", "vomiting", "throwing up", "headache", "migraine", "weak",
+        "very tired", "exhausted", "shaky", "worried", "scared", "anxious",
+        "anxiety attack", "panic attack",
+    ),
+    # Words that explicitly indicate emergency context
+    "emergency_context": (
+        "call 911", "call the ambulance", "go to the er", "going to the er",
+        "go to the emergency room", "medical emergency", "this is an emergency",
+    ),
+
+    # --- Caregiver alerting ------------------------------------------------
+    "caregiver_concern": (
+        "pain", "hurt", "dizzy", "fall", "fell", "emergency", "help",
+        "can't breathe", "chest pain", "confused", "lost", "scared",
+    ),
+
+    # --- Quick action buttons ----------------------------------------------
+    "quick_medication": (
+        "medication", "med", "pill", "medicine", "take", "took", "dose",
+    ),
+    "quick_bored": ("bored", "lonely", "nothing to do", "entertain", "fun"),
+    "quick_music": ("music", "song", "relax", "calming", "peaceful"),
+}
+
+
+class RouteMatch:
+    """Result of a single routing pass over one message"""
+
+    __slots__ = ("text", "keywords", "_router")
+
+    def __init__(self, text: str, keywords: FrozenSet[str], router: "IntentRouter"):
+        self.text = text
+        self.keywords = keywords
+        self._router = router
+
+    def matched(self, category: str) -> Set[str]:
+        """Keywords of a category that occur in the message"""
+        return self.keywords & self._router.tables[category]
+
+    def has(self, category: str) -> bool:
+        """True if any keyword of the category occurs in the message"""
+        return not self.keywords.isdisjoint(self._router.tables[category])
+
+    def count(self, category: str) -> int:
+        """Number of distinct keywords of the category found in the message"""
+        return len(self.matched(category))
+
+    @property
+    def categories(self) -> Set[str]:
+        """All categories with at least one hit"""
+        index = self._router.keyword_categories
+        return set().union(*(index[k] for k in self.keywords))
+
+
+class IntentRouter:
+    """Matches every keyword table against a message in one regex scan"""
+
+    def __init__(self, tables: Dict[str, Iterable[str]]):
+        """
+        Compile keyword tables
+
+        Args:
+            tables: Mapping of category name to keyword phrases
+        """
+        self.tables: Dict[str, FrozenSet[str]] = {
+            name: frozenset(k.lower() for k in keywords)
+            for name, keywords in tables.items()
+        }
+        vocabulary = set().union(*self.tables.values()) if self.tables else set()
+        self.keyword_categories: Dict[str, FrozenSet[str]] = {
+            word: frozenset(name for name, words in self.tables.items() if word in words)
+            for word in vocabulary
+        }
+
+        # At any start position the regex reports only the longest keyword.
+        # Every shorter keyword that starts at the same position is a prefix of
+        # it, so the prefix closure restores full substring semantics.
+        self._prefix_closure: Dict[str, FrozenSet[str]] = {
+            word: frozenset(k for k in vocabulary if word.startswith(k))
+            for word in vocabulary
+        }
+        self._pattern = re.compile(
+            "(?=(" + self._trie_regex(vocabulary) + "))") if vocabulary else None
+
+    @staticmethod
+    def _trie_regex(words: Iterable[str]) -> str:
+        """Build a regex whose alternation is shaped like a character trie"""
+        trie: Dict = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        def emit(node: Dict) -> str:
+            terminal = "" in node
+            branches = [re.escape(char) + emit(child)
+                        for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            if terminal:
+                # Greedy optional suffix: the longest keyword wins at each position
+                body = body + "?" if len(branches) == 1 and len(branches[0]) == 1 \
+                    else "(?:" + body + ")?"
+            return body
+
+        return emit(trie)
+
+    def match(self, text: str) -> RouteMatch:
+        """
+        Scan a message once and collect every matching keyword
+
+        Args:
+            text: Raw user message (case-insensitive)
+
+        Returns:
+            RouteMatch with the matched keywords
+        """
+        lowered = text.lower()
+        found: Set[str] = set()
+        if self._pattern is not None:
+            closure = self._prefix_closure
+            for longest in set(m.group(1) for m in self._pattern.finditer(lowered)):
+                found |= closure[longest]
+        return RouteMatch(lowered, frozenset(found), self)
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Get the shared router compiled from KEYWORD_TABLES (thread-safe)"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter(KEYWORD_TABLES)
+    return _router
@@ -0,0 +1,338 @@
+"""
+Local fuzzy medication-name index
+Per-user index over the names of a user's active medications plus common
+brand/generic aliases, misspellings and lay terms ("water pill"). Free text
+is matched with exact phrases, character trigrams and edit distance; only a
+clear, unambiguous match is resolved locally, anything else is left to the
+LLM extractor. Entries are dropped and rebuilt per user when that user's
+medications change.
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Score needed to resolve locally, and lead over the runner-up medication
+DEFAULT_MIN_SCORE = float(os.getenv("CARELY_MEDICATION_MATCH_SCORE", "0.85"))
+DEFAULT_MIN_MARGIN = float(os.getenv("CARELY_MEDICATION_MATCH_MARGIN", "0.15"))
+
+# Generic name -> brand names, alternative names and frequent misspellings
+MEDICATION_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "lisinopril": ("zestril", "prinivil", "lisinipril", "lisinapril"),
+    "amlodipine": ("norvasc", "amlodapine", "amlodopine"),
+    "metformin": ("glucophage", "metformen", "metforman"),
+    "atorvastatin": ("lipitor",),
+    "simvastatin": ("zocor",),
+    "rosuvastatin": ("crestor",),
+    "levothyroxine": ("synthroid", "levoxyl", "levothyroxin"),
+    "metoprolol": ("lopressor", "toprol", "metoprolal"),
+    "losartan": ("cozaar",),
+    "hydrochlorothiazide": ("hctz", "microzide"),
+    "furosemide": ("lasix", "furosemid"),
+    "warfarin": ("coumadin", "jantoven"),
+    "apixaban": ("eliquis",),
+    "clopidogrel": ("plavix",),
+    "omeprazole": ("prilosec",),
+    "pantoprazole": ("protonix",),
+    "gabapentin": ("neurontin",),
+    "sertraline": ("zoloft",),
+    "donepezil": ("aricept",),
+    "acetaminophen": ("tylenol", "paracetamol"),
+    "ibuprofen": ("advil", "motrin"),
+    "aspirin": ("baby aspirin", "bayer"),
+    "insulin": ("lantus", "humalog", "novolog"),
+    "tamsulosin": ("flomax",),
+    "alendronate": ("fosamax",),
+    "vitamin d": ("vitamin d3", "cholecalciferol"),
+}
+
+# Lay terms -> generic names; resolved only if exactly one of the user's
+# medications falls in the group
+MEDICATION_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "water pill": ("furosemide", "hydrochlorothiazide"),
+    "blood pressure": ("lisinopril", "amlodipine", "losartan", "metoprolol", "hydrochlorothiazide"),
+    "blood thinner": ("warfarin", "apixaban", "clopidogrel", "aspirin"),
+    "cholesterol": ("atorvastatin", "simvastatin", "rosuvastatin"),
+    "statin": ("atorvastatin", "simvastatin", "rosuvastatin"),
+    "diabetes": ("metformin", "insulin"),
+    "thyroid": ("levothyroxine",),
+    "heartburn": ("omeprazole", "pantoprazole"),
+    "stomach pill": ("omeprazole", "pantoprazole"),
+    "memory pill": ("donepezil",),
+    "pain pill": ("acetaminophen", "ibuprofen"),
+    "painkiller": ("acetaminophen", "ibuprofen"),
+}
+
+EXACT_SCORE = 1.0
+ALIAS_SCORE = 0.95
+GROUP_SCORE = 0.9
+# Words shorter than this are never fuzzy-matched ("med" vs "meds")
+MIN_FUZZY_LENGTH = 4
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]")
+_CLAUSE_SPLIT = re.compile(r"\s*(?:[,;.!?]|\s-\s|\bbut\b|\band\b)\s*")
+_LOG_WORDS = re.compile(r"\b(took|taken|take|had|have|swallowed|finished|just|already|my|the|pills?|meds?|medications?|medicines?)\b")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def trigrams(word: str) -> FrozenSet[str]:
+    """Character trigrams of a padded word"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(a: str, b: str, limit: int = 3) -> int:
+    """
+    Edit distance counting a swap of adjacent letters as one edit (optimal
+    string alignment), giving up (returns limit + 1) once it exceeds limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1,
+                       previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before_previous[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    """Fuzzy word similarity in [0, 1]: the better of trigram overlap and edit distance"""
+    if a == b:
+        return 1.0
+    if len(a) < MIN_FUZZY_LENGTH or len(b) < MIN_FUZZY_LENGTH:
+        return 0.0
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    jaccard = len(grams_a & grams_b) / len(grams_a | grams_b)
+    distance = edit_distance(a, b)
+    edit = 1.0 - distance / max(len(a), len(b))
+    return max(jaccard, edit)
+
+
+class _Variant:
+    """One way of naming a medication (its name, an alias or a misspelling)"""
+
+    __slots__ = ("medication_id", "text", "words", "score")
+
+    def __init__(self, medication_id: int, text: str, score: float):
+        self.medication_id = medication_id
+        self.text = text
+        self.words = tuple(text.split())
+        self.score = score
+
+
+class _UserIndex:
+    """Variants and group memberships for one user's active medications"""
+
+    def __init__(self, medications):
+        self.names: Dict[int, str] = {}
+        self.variants: List[_Variant] = []
+        self.groups: Dict[str, List[int]] = {}
+        for medication in medications:
+            self.add(medication.id, medication.name)
+
+    def add(self, medication_id: int, name: str):
+        self.names[medication_id] = name
+        normalized = normalize(name)
+        if not normalized:
+            return
+        self.variants.append(_Variant(medication_id, normalized, EXACT_SCORE))
+        # "Lisinopril 10mg" / "Metformin ER": the leading word names it too
+        first_word = normalized.split()[0]
+        if first_word != normalized and len(first_word) >= MIN_FUZZY_LENGTH:
+            self.variants.append(_Variant(medication_id, first_word, EXACT_SCORE))
+
+        generics = {generic for generic, aliases in MEDICATION_ALIASES.items()
+                    if generic in normalized or any(alias in normalized.split() for alias in aliases)}
+        for generic in generics:
+            for alias in (generic,) + MEDICATION_ALIASES[generic]:
+                if alias not in (normalized, first_word):
+                    self.variants.append(_Variant(medication_id, alias, ALIAS_SCORE))
+            for group, members in MEDICATION_GROUPS.items():
+                if generic in members and medication_id not in self.groups.get(group, []):
+                    self.groups.setdefault(group, []).append(medication_id)
+
+
+class MedicationNameIndex:
+    """Thread-safe per-user medication-name index with lazy per-user rebuilds"""
+
+    def __init__(self, min_score: float = None, min_margin: float = None):
+        """
+        Initialize the index
+
+        Args:
+            min_score: Score needed to resolve a medication locally
+            min_margin: Required lead over the next-best medication
+        """
+        self.min_score = DEFAULT_MIN_SCORE if min_score is None else min_score
+        self.min_margin = DEFAULT_MIN_MARGIN if min_margin is None else min_margin
+        self._users: Dict[int, _UserIndex] = {}
+        # Bumped on every invalidation so a build racing a change is not kept
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def build(self, user_id: int, medications, generation: int = None):
+        """
+        (Re)build a user's entry
+
+        Args:
+            user_id: User ID
+            medications: The user's active medications (objects with id and name)
+            generation: Invalidation count the medications were read at; the
+                entry is not kept if the user changed since
+        """
+        index = _UserIndex(medications)
+        with self._lock:
+            if generation is None or self._generations.get(user_id, 0) == generation:
+                self._users[user_id] = index
+        metrics.increment("medication_index.builds")
+        return index
+
+    def _user_index(self, user_id: int) -> _UserIndex:
+        index = self._users.get(user_id)
+        if index is None:
+            from app.database.crud import MedicationCRUD
+            generation = self._generations.get(user_id, 0)
+            index = self.build(user_id, MedicationCRUD.get_user_medications(user_id, active_only=True),
+                               generation)
+        return index
+
+    def candidates(self, user_id: int, text: str) -> List[Dict]:
+        """
+        Score every medication of a user against free text
+
+        Args:
+            user_id: User ID
+            text: User message
+
+        Returns:
+            List of {"medication_id", "medication_name", "score", "matched"}
+            sorted best first (medications with no match are left out)
+        """
+        index = self._user_index(user_id)
+        words = normalize(text).split()
+        if not words or not index.names:
+            return []
+
+        best: Dict[int, Tuple[float, str]] = {}
+
+        def offer(medication_id: int, score: float, matched: str):
+            if score > best.get(medication_id, (0.0, ""))[0]:
+                best[medication_id] = (score, matched)
+
+        for variant in index.variants:
+            size = len(variant.words)
+            for start in range(len(words) - size + 1):
+                window = words[start:start + size]
+                if tuple(window) == variant.words:
+                    offer(variant.medication_id, variant.score, variant.text)
+                elif size == 1:
+                    score = similarity(window[0], variant.text) * variant.score
+                    if score > 0:
+                        offer(variant.medication_id, score, window[0])
+
+        phrase = " ".join(words)
+        for group, medication_ids in index.groups.items():
+            if re.search(r"\b" + re.escape(group), phrase) and len(medication_ids) == 1:
+                offer(medication_ids[0], GROUP_SCORE, group)
+
+        ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+        return [{"medication_id": medication_id, "medication_name": index.names[medication_id],
+                 "score": round(score, 3), "matched": matched}
+                for medication_id, (score, matched) in ranked]
+
+    def resolve(self, user_id: int, text: str, min_score: float = None,
+                min_margin: float = None) -> Optional[Dict]:
+        """
+        Resolve the medication a message refers to, if the match is clear
+
+        Args:
+            user_id: User ID
+            text: User message
+            min_score: Override the resolve threshold
+            min_margin: Override the required lead over the runner-up
+
+        Returns:
+            Best candidate (see candidates) or None when there is no match or
+            it is ambiguous
+        """
+        min_score = self.min_score if min_score is None else min_score
+        min_margin = self.min_margin if min_margin is None else min_margin
+        ranked = self.candidates(user_id, text)
+        if not ranked or ranked[0]["score"] < min_score:
+            metrics.increment("medication_index.misses")
+            return None
+        if len(ranked) > 1 and ranked[0]["score"] - ranked[1]["score"] < min_margin:
+            metrics.increment("medication_index.ambiguous")
+            return None
+        metrics.increment("medication_index.hits")
+        return ranked[0]
+
+    def mentions(self, user_id: int, text: str) -> bool:
+        """True if a message names one of the user's medications (even ambiguously)"""
+        if user_id is None:
+            return False
+        ranked = self.candidates(user_id, text)
+        return bool(ranked) and ranked[0]["score"] >= self.min_score
+
+    @staticmethod
+    def extract_notes(text: str, matched: str) -> str:
+        """
+        Clauses of a logging message other than the logging itself, e.g.
+        "tummy feels a bit off" in "Took my metformin, tummy feels a bit off"
+        """
+        notes = []
+        for clause in _CLAUSE_SPLIT.split(text or ""):
+            normalized = normalize(clause)
+            if not normalized or matched in normalized:
+                continue
+            if not _LOG_WORDS.sub(" ", normalized).strip():
+                continue
+            notes.append(clause.strip())
+        return ", ".join(notes)
+
+    def invalidate(self, user_id: int):
+        """Drop a user's index; it is rebuilt on the next lookup"""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def on_data_change(self, table: str, user_id: int):
+        """CRUD change listener: rebuild a user's entry when their medications change"""
+        if table == "medication":
+            self.invalidate(user_id)
+
+
+# Global instance for easy access
+_index: Optional[MedicationNameIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_medication_index() -> MedicationNameIndex:
+    """Get singleton medication-name index, subscribed to medication changes (thread-safe)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from app.database.crud import register_change_listener
+                _index = MedicationNameIndex()
+                register_change_listener(_index.on_data_change)
+    return _index
@@ -0,0 +1,128 @@
+"""
+Model tiering for the companion agent's LLM calls
+A routing table maps each call type (and, for chat replies, the verbosity level)
+to a model tier, max_tokens and temperature: JSON classifications and SHORT
+chit-chat go to the small model, detailed and safety-relevant replies to the
+large one
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+MODEL_TIERS = {
+    "small": os.getenv("CARELY_MODEL_SMALL", "llama-3.1-8b-instant"),
+    "large": os.getenv("CARELY_MODEL_LARGE", "llama-3.3-70b-versatile"),
+}
+
+# USD per million tokens (input, output), Groq on-demand pricing
+MODEL_PRICING_PER_M = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+# "tiered" uses the table below; "large" sends every call to the large model
+DEFAULT_ROUTING = os.getenv("CARELY_MODEL_ROUTING", "tiered").lower()
+
+
+class ModelRoute:
+    """Model tier and generation settings for one kind of call"""
+
+    def __init__(self, tier: str, max_tokens: int, temperature: float):
+        """
+        Args:
+            tier: Key of MODEL_TIERS
+            max_tokens: Completion token cap
+            temperature: Sampling temperature
+        """
+        self.tier = tier
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    @property
+    def model(self) -> str:
+        return MODEL_TIERS[self.tier]
+
+    def params(self) -> Dict[str, Any]:
+        """chat.completions.create arguments for this route"""
+        return {"model": self.model, "max_tokens": self.max_tokens,
+                "temperature": self.temperature}
+
+    def __repr__(self) -> str:
+        return f"ModelRoute({self.tier!r}, max_tokens={self.max_tokens}, temperature={self.temperature})"
+
+
+# (call type, verbosity) -> route; verbosity None matches any level
+ROUTING_TABLE: Dict[Tuple[str, Optional[str]], ModelRoute] = {
+    ("verbosity", None): ModelRoute("small", 50, 0.1),
+    ("intent", None): ModelRoute("small", 150, 0.1),
+    ("medication_extraction", None): ModelRoute("small", 150, 0.1),
+    # Carries the answer to medication questions, so it stays on the large model
+    ("medication_turn", None): ModelRoute("large", 300, 0.1),
+    ("ask_medication", None): ModelRoute("large", 200, 0.3),
+    ("greeting", None): ModelRoute("small", 150, 0.7),
+    ("chat", "SHORT"): ModelRoute("small", 220, 0.3),
+    ("chat", "MEDIUM"): ModelRoute("large", 600, 0.3),
+    ("chat", "LONG"): ModelRoute("large", 1200, 0.3),
+}
+DEFAULT_ROUTE = ModelRoute("large", 600, 0.3)
+
+
+class ModelRouter:
+    """Looks up the route for a call; can pin every call to one tier (A/B runs)"""
+
+    def __init__(self, table: Dict[Tuple[str, Optional[str]], ModelRoute] = None,
+                 force_tier: str = None):
+        """
+        Args:
+            table: Routing table (default: ROUTING_TABLE)
+            force_tier: Send every call to this tier, keeping the table's
+                max_tokens / temperature (default: "large" when
+                CARELY_MODEL_ROUTING=large, else None)
+        """
+        self.table = table or ROUTING_TABLE
+        if force_tier is None and DEFAULT_ROUTING == "large":
+            force_tier = "large"
+        self.force_tier = force_tier
+
+    def route(self, call_type: str, verbosity: str = None, emergency: bool = False) -> ModelRoute:
+        """
+        Route for a call
+
+        Args:
+            call_type: Call site (same labels as CompanionAgent._complete)
+            verbosity: SHORT / MEDIUM / LONG for chat replies
+            emergency: Emergency turns always get the large model
+
+        Returns:
+            The route
+        """
+        route = (self.table.get((call_type, verbosity)) or self.table.get((call_type, None))
+                 or DEFAULT_ROUTE)
+        tier = self.force_tier or ("large" if emergency else route.tier)
+        if tier != route.tier:
+            route = ModelRoute(tier, route.max_tokens, route.temperature)
+        return route
+
+
+def estimate_cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Price of one call, or None for models without a known price"""
+    pricing = MODEL_PRICING_PER_M.get(model)
+    if pricing is None:
+        return None
+    return (prompt_tokens * pricing[0] + completion_tokens * pricing[1]) / 1_000_000
+
+
+# Global instance for easy access
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Get singleton model router (thread-safe)"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
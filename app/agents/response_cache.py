@@ -0,0 +1,191 @@
+"""
+Response cache for repeated low-variance LLM answers
+Entries are keyed on the normalized user message plus a hash of the data
+context injected into the prompt, expire after a TTL, can optionally be matched
+by message-embedding similarity, and are dropped when a user's medications or
+medication logs change
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import metrics
+
+DEFAULT_TTL_S = float(os.getenv("CARELY_RESPONSE_CACHE_TTL_S", "600"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("CARELY_RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+# Cosine similarity needed for a nearest-neighbour hit (semantic lookups only)
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("CARELY_RESPONSE_CACHE_SIMILARITY", "0.95"))
+
+# "?" is kept: "I took my pill." and "I took my pill?" are different intents
+_PUNCTUATION = re.compile(r"[^\w\s?]")
+_WHITESPACE = re.compile(r"\s+")
+
+# (call type, user scope, context hash)
+Bucket = Tuple[str, Optional[int], str]
+
+
+class ResponseCache:
+    """Thread-safe LRU of LLM reply texts with TTL and per-user invalidation"""
+
+    def __init__(self, ttl_s: float = None, max_entries: int = None,
+                 similarity_threshold: float = None,
+                 embedding_function: Callable[[List[str]], List[List[float]]] = None):
+        """
+        Initialize the cache
+
+        Args:
+            ttl_s: Seconds an entry stays valid
+            max_entries: LRU capacity
+            similarity_threshold: Minimum cosine similarity for semantic hits
+            embedding_function: Optional text embedder (Chroma-style: list of
+                texts in, list of vectors out); enables semantic lookups
+        """
+        self.ttl_s = DEFAULT_TTL_S if ttl_s is None else ttl_s
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.similarity_threshold = (DEFAULT_SIMILARITY_THRESHOLD
+                                     if similarity_threshold is None else similarity_threshold)
+        self.embedding_function = embedding_function
+        # (bucket, normalized message) -> (value, expires_at, unit vector or None)
+        self._entries: "OrderedDict[Tuple[Bucket, str], Tuple[str, float, Optional[np.ndarray]]]" = OrderedDict()
+        self._buckets: Dict[Bucket, set] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase, strip punctuation (except "?") and collapse whitespace"""
+        text = _PUNCTUATION.sub(" ", (text or "").lower()).replace("?", " ? ")
+        return _WHITESPACE.sub(" ", text).strip()
+
+    @staticmethod
+    def context_hash(*parts: Any) -> str:
+        """Stable hash of the data injected into a prompt"""
+        blob = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        if self.embedding_function is None:
+            return None
+        try:
+            vector = np.asarray(self.embedding_function([normalized])[0], dtype=np.float32)
+        except Exception:
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def get(self, call_type: str, message: str, context_hash: str,
+            user_id: int = None, semantic: bool = False) -> Optional[str]:
+        """
+        Look up a cached reply
+
+        Args:
+            call_type: Which LLM call (e.g. "ask_medication", "intent")
+            message: User message the reply answers
+            context_hash: Hash of the prompt's data context
+            user_id: Scope for per-user entries (None for shared entries)
+            semantic: Also accept the most similar cached message in the same
+                bucket when an embedding function is configured
+
+        Returns:
+            Cached reply text or None
+        """
+        bucket = (call_type, user_id, context_hash)
+        normalized = self.normalize(message)
+        key = (bucket, normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                metrics.increment(f"response_cache.hits.{call_type}")
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            candidates = list(self._buckets.get(bucket, ())) if semantic else []
+
+        if candidates and self.embedding_function is not None:
+            query = self._embed(normalized)
+            if query is not None:
+                with self._lock:
+                    best_key, best_score = None, self.similarity_threshold
+                    for candidate in candidates:
+                        entry = self._entries.get(candidate)
+                        if entry is None or entry[2] is None or entry[1] <= now:
+                            continue
+                        score = float(np.dot(entry[2], query))
+                        if score >= best_score:
+                            best_key, best_score = candidate, score
+                    if best_key is not None:
+                        self._entries.move_to_end(best_key)
+                        metrics.increment(f"response_cache.semantic_hits.{call_type}")
+                        return self._entries[best_key][0]
+
+        metrics.increment(f"response_cache.misses.{call_type}")
+        return None
+
+    def put(self, call_type: str, message: str, context_hash: str, value: str,
+            user_id: int = None, semantic: bool = False):
+        """Store a reply (same arguments as get)"""
+        bucket = (call_type, user_id, context_hash)
+        normalized = self.normalize(message)
+        vector = self._embed(normalized) if semantic else None
+        with self._lock:
+            key = (bucket, normalized)
+            self._entries[key] = (value, time.monotonic() + self.ttl_s, vector)
+            self._entries.move_to_end(key)
+            self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        bucket_keys = self._buckets.get(key[0])
+        if bucket_keys is not None:
+            bucket_keys.discard(key)
+            if not bucket_keys:
+                del self._buckets[key[0]]
+
+    def invalidate_user(self, user_id: int):
+        """Drop every entry scoped to a user"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0][1] == user_id]
+            for key in stale:
+                self._remove(key)
+        if stale:
+            metrics.increment("response_cache.invalidations")
+
+    def on_data_change(self, table: str, user_id: int):
+        """CRUD change listener: medication and event data feed cached prompts"""
+        self.invalidate_user(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Global instance for easy access
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get singleton response cache, subscribed to medication changes (thread-safe)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from app.database.crud import register_change_listener
+                _cache = ResponseCache()
+                register_change_listener(_cache.on_data_change)
+    return _cache
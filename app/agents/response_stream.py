@@ -0,0 +1,175 @@
+"""
+Token streaming for the companion's main response
+Yields reply text as Groq produces it, applying the sentence limit and the
+emergency reassurance incrementally, then persists the turn when the stream ends
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.memory.context_packer import estimate_tokens
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+
+def chunk_usage(chunk) -> Any:
+    """Token usage carried by a stream chunk (Groq sends it on the last one), else None"""
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    return usage
+
+
+def estimated_usage(messages: List[Dict[str, str]], completion: str) -> SimpleNamespace:
+    """Usage of a stream that ended before the API reported it (e.g. at the sentence limit)"""
+    return SimpleNamespace(prompt_tokens=sum(estimate_tokens(m["content"]) for m in messages),
+                           completion_tokens=estimate_tokens(completion))
+
+
+class SentenceLimiter:
+    """
+    Incremental version of CompanionAgent._limit_to_sentences: passes text
+    through until `max_sentences` sentences (ending in ., ! or ? followed by
+    whitespace) have been emitted, then reports `done`
+    """
+
+    def __init__(self, max_sentences: Optional[int]):
+        self.max_sentences = max_sentences
+        self.sentences = 0
+        self.done = False
+        self._after_terminator = False
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        """
+        Args:
+            text: Next chunk of model output
+
+        Returns:
+            The part of the chunk that should be shown
+        """
+        if self.done or not text:
+            return ""
+        if not self.max_sentences:
+            return text
+
+        for index, char in enumerate(text):
+            if char in ".!?":
+                self._after_terminator = True
+            elif char.isspace():
+                if self._after_terminator and self._started:
+                    self.sentences += 1
+                    if self.sentences >= self.max_sentences:
+                        self.done = True
+                        return text[:index]
+                self._after_terminator = False
+            else:
+                self._started = True
+                self._after_terminator = False
+        return text
+
+
+class ResponseStream:
+    """
+    Iterable of reply text chunks for one chat turn. Iterate it (e.g. with
+    st.write_stream); once exhausted, `result` holds the same dict that
+    CompanionAgent.generate_response returns.
+    """
+
+    def __init__(self, agent, user_id: int, user_message: str,
+                 conversation_type: str = "general"):
+        self.agent = agent
+        self.user_id = user_id
+        self.user_message = user_message
+        self.conversation_type = conversation_type
+        self.result: Optional[Dict[str, Any]] = None
+        self.first_token_ms: Optional[float] = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        agent = self.agent
+        # Activated only around blocks that do not yield: the consumer may
+        # resume this generator from another thread / context
+        trace = tracer.start("chat_turn", user_id=self.user_id,
+                             conversation_type=self.conversation_type, streamed=True)
+        try:
+            with tracer.activate(trace):
+                turn = agent._prepare_response(self.user_id, self.user_message,
+                                               self.conversation_type)
+                if "request" not in turn and "error" not in turn:
+                    tracer.annotate(branch="fast_path")
+            if "request" not in turn:
+                # Deterministic branch: the whole reply is already known
+                self.result = turn
+                self._mark_first_token(start, trace)
+                yield turn["response"]
+                return
+            yield from self._stream_reply(agent, turn, start, trace)
+        finally:
+            metrics.observe("chat.stream_total_ms", (time.perf_counter() - start) * 1000.0)
+            tracer.finish(trace)
+
+    def _stream_reply(self, agent, turn: Dict[str, Any], start: float, trace) -> Iterator[str]:
+        from app.agents.companion_agent import EMERGENCY_REASSURANCE
+
+        if trace is not None:
+            trace.attrs["branch"] = "llm"
+        shown = []
+        try:
+            # Reassurance does not depend on the model, show it right away
+            if turn["is_emergency"]:
+                shown.append(EMERGENCY_REASSURANCE)
+                self._mark_first_token(start, trace)
+                yield EMERGENCY_REASSURANCE
+
+            limiter = SentenceLimiter(turn["sentence_limit"])
+            agent._observe_prompt_tokens("chat", turn["request"]["messages"], turn["user_id"])
+            llm_start = time.perf_counter()
+            stream = agent.client.chat.completions.create(**turn["request"], stream=True,
+                                                          call_type="chat")
+            usage, generated = None, []
+            try:
+                for chunk in stream:
+                    usage = chunk_usage(chunk) or usage
+                    if not chunk.choices:
+                        continue
+                    generated.append(chunk.choices[0].delta.content or "")
+                    text = limiter.feed(generated[-1])
+                    if text:
+                        shown.append(text)
+                        self._mark_first_token(start, trace)
+                        yield text
+                    if limiter.done:
+                        break
+            finally:
+                # Stop generation once the sentence limit is reached
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+                # Includes time the consumer spent rendering between chunks
+                tracer.record("llm.chat", (time.perf_counter() - llm_start) * 1000.0,
+                              start=llm_start, trace=trace, model=turn["request"]["model"],
+                              streamed=True)
+                if usage is None:
+                    metrics.increment("llm.usage_estimated.chat")
+                    usage = estimated_usage(turn["request"]["messages"], "".join(generated))
+                agent._record_usage("chat", turn["request"]["model"], usage)
+
+            with tracer.activate(trace):
+                self.result = agent._finalize_response(turn, "".join(shown))
+            if self.result.get("contains_pii"):
+                # Display version carries the privacy warning after the reply
+                yield self.result["response"][len("".join(shown)):]
+        except Exception as e:
+            with tracer.activate(trace):
+                self.result = agent._error_response(
+                    self.user_id, self.user_message, self.conversation_type, e)
+            yield ("\n\n" if shown else "") + self.result["response"]
+
+    def _mark_first_token(self, start: float, trace=None):
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - start) * 1000.0
+            metrics.observe("chat.first_token_ms", self.first_token_ms)
+            if trace is not None:
+                trace.attrs["first_token_ms"] = round(self.first_token_ms, 2)
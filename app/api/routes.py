@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, Depends, Path, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
 from typing import List, Optional, Dict, Any
@@ -130,6 +131,30 @@ async def chat_with_companion(message: ChatMessage):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def stream_chat_with_companion(message: ChatMessage):
+    """Chat with the AI companion, streaming the reply as Server-Sent Events
+
+    Emits `token` events ({"text": ...}) while the reply is generated and a
+    final `done` event carrying the same payload as POST /chat/
+    """
+    response_stream = companion_agent.generate_response_stream(
+        user_id=message.user_id,
+        user_message=message.message,
+        conversation_type=message.conversation_type
+    )
+
+    def event_source():
+        for text in response_stream:
+            yield f"event: token\ndata: {json.dumps({'text': text})}\n\n"
+        yield f"event: done\ndata: {json.dumps(response_stream.result, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/chat/history/{user_id}")
 async def get_chat_history(user_id: int, limit: int = 50):
     """Get chat history for a user"""
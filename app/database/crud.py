@@ -1,16 +1,34 @@
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from datetime import datetime, timedelta
 from utils.timezone_utils import now_central, start_of_day_central
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 import json
 import logging
 from app.database.models import (
     get_session, User, Medication, Conversation, Reminder, 
-    MedicationLog, CaregiverAlert, CaregiverPatientAssignment, PersonalEvent
+    MedicationLog, CaregiverAlert, CaregiverPatientAssignment, PersonalEvent,
+    PrecomputedGreeting, DailyContent
 )
 
 logger = logging.getLogger(__name__)
 
+# Callbacks run after medication / medication log / personal event writes:
+# callback(table, user_id)
+_change_listeners: List[Callable[[str, int], None]] = []
+
+def register_change_listener(callback: Callable[[str, int], None]):
+    """Get notified when a user's medications, medication logs or events change"""
+    if callback not in _change_listeners:
+        _change_listeners.append(callback)
+
+def _notify_change(table: str, user_id: int):
+    for callback in list(_change_listeners):
+        try:
+            callback(table, user_id)
+        except Exception as e:
+            logger.warning(f"Change listener failed for {table}: {e}")
+
 class UserCRUD:
     @staticmethod
     def create_user(name: str, email: str = None, phone: str = None, 
@@ -67,7 +85,8 @@ class MedicationCRUD:
             session.add(medication)
             session.commit()
             session.refresh(medication)
-            return medication
+        _notify_change("medication", user_id)
+        return medication
     
     @staticmethod
     def get_user_medications(user_id: int, active_only: bool = True) -> List[Medication]:
@@ -89,7 +108,9 @@ class MedicationCRUD:
                 session.add(medication)
                 session.commit()
                 session.refresh(medication)
-            return medication
+        if medication:
+            _notify_change("medication", medication.user_id)
+        return medication
 
 class ConversationCRUD:
     @staticmethod
@@ -120,6 +141,56 @@ class ConversationCRUD:
             ).order_by(Conversation.timestamp.desc()).limit(limit)
             return session.exec(query).all()
     
+    @staticmethod
+    def get_conversation_page(user_id: int, after_id: int = 0, limit: int = 500) -> List[Conversation]:
+        """Get a user's conversations with id > after_id, oldest first (keyset pagination)"""
+        with get_session() as session:
+            query = select(Conversation).where(
+                Conversation.user_id == user_id,
+                Conversation.id > after_id
+            ).order_by(Conversation.id).limit(limit)
+            return session.exec(query).all()
+
+    @staticmethod
+    def get_conversation_window(user_id: int, newest: int = None) -> tuple:
+        """
+        Id range of a user's newest conversations
+
+        Args:
+            user_id: User ID
+            newest: Number of newest conversations in the window (None = all)
+
+        Returns:
+            (after_id, count): conversations with id > after_id form the
+            window, count is its size
+        """
+        with get_session() as session:
+            query = select(Conversation.id).where(
+                Conversation.user_id == user_id
+            ).order_by(Conversation.id.desc())
+            if newest is not None:
+                query = query.limit(newest + 1)
+            ids = session.exec(query).all()
+            if newest is not None and len(ids) > newest:
+                return ids[-1], newest
+            return 0, len(ids)
+
+    @staticmethod
+    def get_user_ids_with_conversations() -> List[int]:
+        """Ids of users that have at least one saved conversation"""
+        with get_session() as session:
+            query = select(Conversation.user_id).distinct().order_by(Conversation.user_id)
+            return list(session.exec(query).all())
+
+    @staticmethod
+    def get_conversations_by_type(conversation_types: List[str], limit: int = 2000) -> List[Conversation]:
+        """Get recent conversations (all users) of the given conversation types"""
+        with get_session() as session:
+            query = select(Conversation).where(
+                Conversation.conversation_type.in_(conversation_types)
+            ).order_by(Conversation.timestamp.desc()).limit(limit)
+            return session.exec(query).all()
+
     @staticmethod
     def get_recent_sentiment_data(user_id: int, days: int = 7) -> List[Conversation]:
         """Get recent conversations with sentiment data"""
@@ -194,7 +265,8 @@ class MedicationLogCRUD:
             session.add(log)
             session.commit()
             session.refresh(log)
-            return log
+        _notify_change("medication_log", user_id)
+        return log
     
     @staticmethod
     def get_medication_adherence(user_id: int, days: int = 7) -> dict:
@@ -404,7 +476,8 @@ class PersonalEventCRUD:
             session.add(event)
             session.commit()
             session.refresh(event)
-            return event
+        _notify_change("personal_event", user_id)
+        return event
     
     @staticmethod
     def get_user_events(user_id: int, limit: int = 50) -> List[PersonalEvent]:
@@ -433,11 +506,13 @@ class PersonalEventCRUD:
         """Delete a personal event"""
         with get_session() as session:
             event = session.get(PersonalEvent, event_id)
-            if event:
-                session.delete(event)
-                session.commit()
-                return True
-            return False
+            if not event:
+                return False
+            user_id = event.user_id
+            session.delete(event)
+            session.commit()
+        _notify_change("personal_event", user_id)
+        return True
     
     @staticmethod
     def get_upcoming_past_events(user_id: int, window_days: int = 7) -> List[PersonalEvent]:
@@ -607,3 +682,93 @@ class PersonalEventCRUD:
             results.sort(key=lambda x: x["event_start_utc"])
             
             return results
+
+class GreetingCRUD:
+    @staticmethod
+    def save_greeting(user_id: int, message: str, time_of_day: str,
+                      valid_until: datetime) -> PrecomputedGreeting:
+        """Store a precomputed greeting, replacing the user's previous one"""
+        with get_session() as session:
+            greeting = session.exec(select(PrecomputedGreeting).where(
+                PrecomputedGreeting.user_id == user_id
+            )).first() or PrecomputedGreeting(user_id=user_id, message=message,
+                                              time_of_day=time_of_day, valid_until=valid_until)
+            greeting.message = message
+            greeting.time_of_day = time_of_day
+            greeting.valid_until = valid_until
+            greeting.created_at = now_central()
+            session.add(greeting)
+            session.commit()
+            session.refresh(greeting)
+            return greeting
+    
+    @staticmethod
+    def get_fresh_greeting(user_id: int) -> Optional[PrecomputedGreeting]:
+        """Get the user's precomputed greeting if it is still valid"""
+        with get_session() as session:
+            query = select(PrecomputedGreeting).where(
+                PrecomputedGreeting.user_id == user_id,
+                PrecomputedGreeting.valid_until > now_central()
+            )
+            return session.exec(query).first()
+    
+    @staticmethod
+    def delete_greeting(user_id: int) -> bool:
+        """Discard the user's precomputed greeting (used, or its context changed)"""
+        with get_session() as session:
+            greeting = session.exec(select(PrecomputedGreeting).where(
+                PrecomputedGreeting.user_id == user_id
+            )).first()
+            if greeting:
+                session.delete(greeting)
+                session.commit()
+                return True
+            return False
+    
+    @staticmethod
+    def on_data_change(table: str, user_id: int):
+        """Change listener: greetings mention pending medications and events, so drop stale ones"""
+        GreetingCRUD.delete_greeting(user_id)
+
+register_change_listener(GreetingCRUD.on_data_change)
+
+class DailyContentCRUD:
+    @staticmethod
+    def get_content(content_date: str, content_type: str, user_id: int = 0) -> Optional[str]:
+        """Get the stored content of a type for a day (user_id 0 = shared)"""
+        with get_session() as session:
+            query = select(DailyContent.content).where(
+                DailyContent.content_date == content_date,
+                DailyContent.content_type == content_type,
+                DailyContent.user_id == user_id
+            )
+            return session.exec(query).first()
+    
+    @staticmethod
+    def save_content(content_date: str, content_type: str, content: str, user_id: int = 0) -> str:
+        """
+        Store a day's content; if another process stored it first, keep theirs
+        
+        Returns:
+            The content now stored for the day
+        """
+        try:
+            with get_session() as session:
+                session.add(DailyContent(content_date=content_date, content_type=content_type,
+                                         user_id=user_id, content=content))
+                session.commit()
+            return content
+        except IntegrityError:
+            return DailyContentCRUD.get_content(content_date, content_type, user_id) or content
+    
+    @staticmethod
+    def delete_before(content_date: str) -> int:
+        """Delete content older than a day; returns the number of rows removed"""
+        with get_session() as session:
+            rows = session.exec(select(DailyContent).where(
+                DailyContent.content_date < content_date
+            )).all()
+            for row in rows:
+                session.delete(row)
+            session.commit()
+            return len(rows)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, create_engine, Session
+from sqlalchemy import UniqueConstraint
 from datetime import datetime, time
 from typing import Optional, List
 import sqlite3
@@ -112,6 +113,44 @@ class PersonalEvent(SQLModel, table=True):
     importance: str = Field(default="medium")  # low, medium, high
     created_at: datetime = Field(default_factory=now_central)
 
+class PostProcessingJob(SQLModel, table=True):
+    """Durable write-behind job (conversation persistence, indexing, alerts)"""
+    __table_args__ = {"extend_existing": True}
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(index=True)
+    job_type: str  # save_conversation, index_conversation, caregiver_alert
+    payload: str  # JSON string (redacted text only)
+    status: str = Field(default="pending", index=True)  # pending, running, failed
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=now_central)
+    claimed_at: Optional[datetime] = None  # When a worker last picked it up
+    next_attempt_at: Optional[datetime] = None  # Earliest retry after a failure
+
+class PrecomputedGreeting(SQLModel, table=True):
+    """Proactive greeting generated ahead of time (one per user)"""
+    __table_args__ = {"extend_existing": True}
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(index=True, unique=True)
+    message: str
+    time_of_day: str  # morning, afternoon, evening, night
+    valid_until: datetime  # Greeting is served only before this time
+    created_at: datetime = Field(default_factory=now_central)
+
+class DailyContent(SQLModel, table=True):
+    """Content generated once per day (affirmation, joke, puzzle, memory cue)"""
+    __table_args__ = (UniqueConstraint("content_date", "content_type", "user_id"),
+                      {"extend_existing": True})
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    content_date: str = Field(index=True)  # YYYY-MM-DD, Central Time
+    content_type: str  # affirmation, joke, puzzle, memory_cue
+    user_id: int = Field(default=0)  # 0 = shared by every user
+    content: str
+    created_at: datetime = Field(default_factory=now_central)
+
 def create_tables():
     """Create all database tables"""
     SQLModel.metadata.create_all(engine)
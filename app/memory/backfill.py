@@ -0,0 +1,267 @@
+"""
+Bulk (re)indexing of saved conversations into long-term vector memory
+Streams every user's conversations from the database in pages, embeds each page
+as one batch split across worker processes, upserts in chunks and records a
+checkpoint after every page so an interrupted run resumes where it stopped.
+
+Run from the repository root:
+    python -m app.memory.backfill [--workers N] [--rebuild] [--reset]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.database.crud import ConversationCRUD
+from app.memory.long_term_memory import LongTermMemory, load_embedder
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 512
+# Texts per worker embedding call
+DEFAULT_EMBED_BATCH = 64
+DEFAULT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+PROGRESS_INTERVAL_S = 5.0
+
+# Embedding function of a worker process (loaded once per process)
+_worker_embedder = None
+
+
+def _init_worker(embedding_model: str):
+    global _worker_embedder
+    _worker_embedder = load_embedder(embedding_model)[1]
+
+
+def _embed_in_worker(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_embedder(texts), dtype=np.float32)
+
+
+def _window_size(long_term: LongTermMemory, newest: Optional[int]) -> int:
+    """Newest conversations per user worth indexing: writes evict beyond max_raw_per_user"""
+    cap = long_term.max_raw_per_user
+    return cap if newest is None else min(newest, cap)
+
+
+class PoolEmbedder:
+    """Embedding function that splits each call into batches run on a process pool"""
+
+    def __init__(self, pool: ProcessPoolExecutor, batch_size: int = DEFAULT_EMBED_BATCH):
+        self.pool = pool
+        self.batch_size = batch_size
+
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        futures = [self.pool.submit(_embed_in_worker, texts[start:start + self.batch_size])
+                   for start in range(0, len(texts), self.batch_size)]
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+
+class Checkpoint:
+    """Last indexed conversation id per user, saved atomically as JSON"""
+
+    def __init__(self, path: str, model_name: str, reset: bool = False):
+        """
+        Args:
+            path: Checkpoint file
+            model_name: Embedding model of this run; a checkpoint written for
+                another model is ignored (everything must be re-embedded)
+            reset: Ignore any existing checkpoint
+        """
+        self.path = path
+        self.model_name = model_name
+        self.users: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if not reset and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                if data.get("model") == model_name:
+                    self.users = {str(k): int(v) for k, v in data.get("users", {}).items()}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable backfill checkpoint {path}: {e}")
+
+    def last_id(self, user_id: int) -> int:
+        with self._lock:
+            return self.users.get(str(user_id), 0)
+
+    def advance(self, user_id: int, conversation_id: int):
+        with self._lock:
+            self.users[str(user_id)] = conversation_id
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"model": self.model_name, "users": self.users}, f)
+            os.replace(tmp_path, self.path)
+
+
+class Progress:
+    """Thread-safe counters with a periodic one-line report"""
+
+    def __init__(self, users: int, total: int, interval_s: float = PROGRESS_INTERVAL_S):
+        self.users = users
+        self.total = total
+        self.interval_s = interval_s
+        self.done = 0
+        self.users_done = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, conversations: int = 0, user_done: bool = False):
+        with self._lock:
+            self.done += conversations
+            self.users_done += int(user_done)
+            now = time.monotonic()
+            if now - self._last_report >= self.interval_s or self.users_done == self.users:
+                self._last_report = now
+                print(self.line(), flush=True)
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        return (f"users {self.users_done}/{self.users}   conversations {self.done}/{self.total}   "
+                f"{rate:7.1f}/s   elapsed {elapsed:6.1f}s   eta {eta:6.1f}s")
+
+
+def backfill_user(long_term: LongTermMemory, user_id: int, checkpoint: Checkpoint,
+                  progress: Progress, page_size: int = DEFAULT_PAGE_SIZE,
+                  newest: Optional[int] = None) -> int:
+    """
+    Index one user's conversations page by page, checkpointing after each page
+
+    Args:
+        long_term: Long-term memory to index into
+        user_id: User ID
+        checkpoint: Resume point per user
+        progress: Progress report
+        page_size: Conversations read, embedded and upserted per page
+        newest: Only index the user's newest N conversations (default and
+            upper bound: long_term.max_raw_per_user, older ones would be
+            evicted right after being embedded)
+
+    Returns:
+        Number of conversations indexed
+    """
+    window_start, _ = ConversationCRUD.get_conversation_window(user_id, _window_size(long_term, newest))
+    after_id = max(window_start, checkpoint.last_id(user_id))
+    indexed = 0
+    while True:
+        page = ConversationCRUD.get_conversation_page(user_id, after_id, page_size)
+        if not page:
+            break
+        long_term.add_conversations(user_id, page)
+        after_id = page[-1].id
+        checkpoint.advance(user_id, after_id)
+        indexed += len(page)
+        metrics.increment("backfill.conversations", len(page))
+        progress.add(len(page))
+        if len(page) < page_size:
+            break
+    progress.add(user_done=True)
+    return indexed
+
+
+def run_backfill(storage_path: str = "data/vectors", embedding_model: str = "all-MiniLM-L6-v2",
+                 workers: int = DEFAULT_WORKERS, page_size: int = DEFAULT_PAGE_SIZE,
+                 embed_batch: int = DEFAULT_EMBED_BATCH, newest: Optional[int] = None,
+                 user_ids: List[int] = None, checkpoint_path: str = None,
+                 rebuild: bool = False, reset: bool = False) -> int:
+    """
+    Index saved conversations of many users
+
+    Args:
+        storage_path: Vector store directory
+        embedding_model: Embedding model name
+        workers: Embedding worker processes, also the number of users indexed
+            concurrently (0 = embed in this process, one user at a time)
+        page_size: Conversations per page
+        embed_batch: Texts per worker embedding call
+        newest: Only index each user's newest N conversations (default and
+            upper bound: the store's max_raw_per_user)
+        user_ids: Users to index (default: every user with conversations)
+        checkpoint_path: Checkpoint file (default: <storage_path>/backfill_checkpoint.json)
+        rebuild: Recreate the collection first (use after an embedding model change)
+        reset: Ignore the checkpoint and index everything again
+
+    Returns:
+        Number of conversations indexed
+    """
+    checkpoint_path = checkpoint_path or os.path.join(storage_path, "backfill_checkpoint.json")
+    pool = None
+    if workers > 0:
+        # Spawned, not forked: this process runs Chroma and indexing threads
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(embedding_model,))
+    try:
+        embedder = PoolEmbedder(pool, embed_batch) if pool else None
+        long_term = LongTermMemory(storage_path, embedding_model, embedder=embedder)
+        if rebuild:
+            long_term.rebuild_collection()
+            reset = True
+        checkpoint = Checkpoint(checkpoint_path, long_term.embedder_name, reset=reset)
+        newest = _window_size(long_term, newest)
+
+        user_ids = user_ids or ConversationCRUD.get_user_ids_with_conversations()
+        total = 0
+        for user_id in user_ids:
+            window_start, count = ConversationCRUD.get_conversation_window(user_id, newest)
+            if checkpoint.last_id(user_id) > window_start:
+                count = len(ConversationCRUD.get_conversation_page(
+                    user_id, checkpoint.last_id(user_id), limit=count))
+            total += count
+        progress = Progress(len(user_ids), total)
+        print(f"Backfilling {total} conversations for {len(user_ids)} users "
+              f"({workers} workers, embedding model {long_term.embedder_name})", flush=True)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as users_pool:
+            counts = list(users_pool.map(
+                lambda user_id: backfill_user(long_term, user_id, checkpoint, progress,
+                                              page_size, newest),
+                user_ids))
+        long_term.embedding_cache.flush()
+        return sum(counts)
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill long-term vector memory from saved conversations")
+    parser.add_argument("--storage-path", default="data/vectors", help="Vector store directory")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2", help="Embedding model name")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Embedding worker processes (0 = in-process)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Conversations per page")
+    parser.add_argument("--embed-batch", type=int, default=DEFAULT_EMBED_BATCH,
+                        help="Texts per worker embedding call")
+    parser.add_argument("--newest", type=int, default=None,
+                        help="Only index each user's newest N conversations "
+                             "(default and maximum: the per-user cap of long-term memory)")
+    parser.add_argument("--user", type=int, action="append", dest="user_ids", help="Only this user (repeatable)")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recreate the collection first (after an embedding model change)")
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    indexed = run_backfill(args.storage_path, args.embedding_model, args.workers, args.page_size,
+                           args.embed_batch, args.newest, args.user_ids, args.checkpoint,
+                           args.rebuild, args.reset)
+    print(f"Indexed {indexed} conversations")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
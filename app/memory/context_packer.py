@@ -0,0 +1,142 @@
+"""
+Token-budgeted prompt packer
+Estimates tokens per prompt section and fills a budget in priority order,
+truncating or dropping lower-priority memory sections that do not fit
+"""
+
+import math
+import os
+from typing import Dict, List, Optional
+
+from utils.metrics import metrics
+
+# Fits the persona, instructions, profile, 10 recent exchanges and 3 memories
+DEFAULT_PROMPT_TOKEN_BUDGET = int(os.getenv("CARELY_PROMPT_TOKEN_BUDGET", "1800"))
+
+# Rough Llama-family ratio; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+class PromptSection:
+    """One block of the prompt with its packing rules"""
+
+    def __init__(self, name: str, text: str, priority: int, header: str = "",
+                 truncate: Optional[str] = None, required: bool = False,
+                 unit_prefix: Optional[str] = None):
+        """
+        Args:
+            name: Section name (used in metrics and results)
+            text: Section body
+            priority: Lower numbers are packed first
+            header: Line(s) kept in front of the body whenever the section is kept
+            truncate: "head" keeps the first units, "tail" keeps the last units,
+                None means the section is kept whole or dropped
+            required: Always kept, even over budget
+            unit_prefix: Truncate in units that start at lines with this prefix
+                (e.g. "User: " keeps exchanges whole); default is single lines
+        """
+        self.name = name
+        self.text = text or ""
+        self.priority = priority
+        self.header = header
+        self.truncate = truncate
+        self.required = required
+        self.unit_prefix = unit_prefix
+
+    def units(self) -> List[str]:
+        """Body split into the pieces truncation may keep or drop"""
+        units: List[List[str]] = []
+        for line in self.text.split("\n"):
+            if not units or self.unit_prefix is None or line.startswith(self.unit_prefix):
+                units.append([line])
+            else:
+                units[-1].append(line)
+        return ["\n".join(unit) for unit in units]
+
+    def render(self, body: str) -> str:
+        return f"{self.header}\n{body}" if self.header else body
+
+
+class ContextPacker:
+    """Fills a token budget with prompt sections in priority order"""
+
+    def __init__(self, budget_tokens: int = None):
+        """
+        Args:
+            budget_tokens: Token budget for the whole prompt
+                (default: CARELY_PROMPT_TOKEN_BUDGET or 1800)
+        """
+        self.budget_tokens = budget_tokens or DEFAULT_PROMPT_TOKEN_BUDGET
+
+    @staticmethod
+    def _fit_units(section: PromptSection, budget: int) -> str:
+        """Largest run of whole units (from the head or tail) that fits"""
+        units = section.units()
+        if section.truncate == "tail":
+            units = units[::-1]
+        kept, used = [], estimate_tokens(section.header)
+        for unit in units:
+            cost = estimate_tokens(unit + "\n")
+            if used + cost > budget:
+                break
+            kept.append(unit)
+            used += cost
+        if section.truncate == "tail":
+            kept = kept[::-1]
+        return "\n".join(kept).strip("\n")
+
+    def pack(self, sections: List[PromptSection]) -> Dict:
+        """
+        Pack sections into the budget
+
+        Args:
+            sections: Prompt sections (any order)
+
+        Returns:
+            Dict with the rendered text of each kept section, per-section token
+            estimates, total tokens and the truncated / dropped section names
+        """
+        remaining = self.budget_tokens
+        texts: Dict[str, str] = {}
+        tokens: Dict[str, int] = {}
+        truncated: List[str] = []
+        dropped: List[str] = []
+
+        for section in sorted(sections, key=lambda s: s.priority):
+            if not section.text:
+                continue
+            rendered = section.render(section.text)
+            cost = estimate_tokens(rendered)
+            if section.required or cost <= remaining:
+                texts[section.name] = rendered
+            elif section.truncate:
+                body = self._fit_units(section, remaining)
+                if not body:
+                    dropped.append(section.name)
+                    continue
+                rendered = section.render(body)
+                cost = estimate_tokens(rendered)
+                texts[section.name] = rendered
+                truncated.append(section.name)
+            else:
+                dropped.append(section.name)
+                continue
+            tokens[section.name] = cost
+            remaining -= cost
+
+        for name in truncated:
+            metrics.increment(f"prompt_packer.truncated.{name}")
+        for name in dropped:
+            metrics.increment(f"prompt_packer.dropped.{name}")
+        return {
+            "texts": texts,
+            "tokens": tokens,
+            "total_tokens": sum(tokens.values()),
+            "truncated": truncated,
+            "dropped": dropped,
+        }
@@ -0,0 +1,303 @@
+"""
+Persistent embedding cache keyed by content hash
+Vectors live in a memory-mapped float32 file (one row per entry) with an
+append-only index of (key, row) records next to it, and an LRU of recent
+vectors in front. The key is a hash of the embedding model name plus the text,
+so re-indexing and repeated queries cost no model inference. Several processes
+may share a directory: appends are serialised with a file lock and each
+process picks up the others' entries from the index.
+
+The files are capped at CARELY_EMBEDDING_CACHE_MAX_ROWS rows. A write past the
+cap compacts them into a new generation holding the newest half of the rows;
+meta.json names the current generation and is replaced last, so a crash
+mid-compaction leaves the previous generation intact.
+"""
+
+import hashlib
+import json
+import logging
+import glob
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils.file_lock import file_lock
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LRU_SIZE = int(os.getenv("CARELY_EMBEDDING_LRU_SIZE", "2048"))
+# Rows kept on disk before compacting (0 for no limit)
+DEFAULT_MAX_ROWS = int(os.getenv("CARELY_EMBEDDING_CACHE_MAX_ROWS", "100000"))
+# Rows the vector file grows by when full (doubling once past this)
+INITIAL_ROWS = 1024
+KEY_BYTES = 20  # sha1 digest
+# Index record: key + row number (little-endian uint64)
+RECORD = struct.Struct(f"<{KEY_BYTES}sQ")
+FORMAT_VERSION = 3
+
+Embedder = Callable[[List[str]], List[List[float]]]
+
+
+def embedding_key(model_name: str, text: str) -> bytes:
+    """Cache key: hash of the model name and the exact text"""
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Disk-backed (memory-mapped) embedding store with an in-memory LRU front"""
+
+    def __init__(self, path: str, lru_size: int = None, max_rows: int = None):
+        """
+        Args:
+            path: Directory for the cache files (created if missing); None
+                keeps the cache in memory only (LRU)
+            lru_size: Vectors kept in the in-memory LRU
+            max_rows: Rows kept on disk before the oldest half is dropped
+                (0 for no limit)
+        """
+        self.path = path
+        self.lru_size = lru_size or DEFAULT_LRU_SIZE
+        self.max_rows = DEFAULT_MAX_ROWS if max_rows is None else max_rows
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._rows: Dict[bytes, int] = {}
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        # Generation of the files _rows and _vectors refer to
+        self._generation: Optional[int] = None
+        # Bytes of the index file already read into _rows
+        self._index_offset = 0
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _index_file(self, generation: int) -> str:
+        return os.path.join(self.path, f"index.{generation}.bin")
+
+    def _vectors_file(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors.{generation}.f32")
+
+    @property
+    def _index_path(self) -> str:
+        return self._index_file(self._generation)
+
+    @property
+    def _vectors_path(self) -> str:
+        return self._vectors_file(self._generation)
+
+    @property
+    def _lock_path(self) -> str:
+        return os.path.join(self.path, "write.lock")
+
+    def _load(self):
+        """Open existing cache files, discarding ones in an older layout"""
+        try:
+            with file_lock(self._lock_path):
+                if os.path.exists(self._meta_path):
+                    with open(self._meta_path) as f:
+                        meta = json.load(f)
+                    if meta.get("format") != FORMAT_VERSION:
+                        logger.info(f"Embedding cache at {self.path} has an old layout, starting empty")
+                        for pattern in ("meta.json", "keys.bin", "vectors*.f32", "index*.bin"):
+                            for stale in glob.glob(os.path.join(self.path, pattern)):
+                                os.remove(stale)
+                self._refresh()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Embedding cache at {self.path} unreadable, starting empty: {e}")
+            self._reset()
+
+    def _reset(self, dim: Optional[int] = None, generation: Optional[int] = None):
+        self._rows.clear()
+        self._dim = dim
+        self._generation = generation
+        self._vectors = None
+        self._index_offset = 0
+
+    def _write_meta(self, generation: int):
+        """Point meta.json at a generation (atomic replace)"""
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self._dim, "format": FORMAT_VERSION, "generation": generation}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _refresh(self):
+        """Read index records appended since the last read (by any process); file lock held"""
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        if meta["generation"] != self._generation:
+            # First read, or another process compacted: re-read the new files from the start
+            self._reset(int(meta["dim"]), meta["generation"])
+        try:
+            size = os.path.getsize(self._index_path)
+        except FileNotFoundError:
+            size = 0
+        # Only complete records: another process may be mid-append
+        end = size - size % RECORD.size
+        if end > self._index_offset:
+            with open(self._index_path, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read(end - self._index_offset)
+            for key, row in RECORD.iter_unpack(data):
+                self._rows[key] = row
+            self._index_offset = end
+        rows = self._index_offset // RECORD.size
+        if self._vectors is None or rows > self._vectors.shape[0]:
+            self._open_vectors(max(rows, INITIAL_ROWS))
+
+    def _open_vectors(self, rows: int):
+        """Map the vector file, growing it to hold at least `rows` rows"""
+        size = rows * self._dim * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        current = os.path.getsize(self._vectors_path) // (self._dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(current, self._dim))
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                return vector
+            if self.path and key not in self._rows:
+                with file_lock(self._lock_path):
+                    self._refresh()  # Another process may have added it
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            if row >= self._vectors.shape[0]:
+                self._open_vectors(row + 1)
+            vector = np.array(self._vectors[row])
+            self._remember(key, vector)
+            return vector
+
+    def put(self, key: bytes, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._remember(key, vector)
+            if not self.path or key in self._rows:
+                return vector
+            with file_lock(self._lock_path):
+                self._refresh()
+                if key in self._rows:
+                    return vector
+                if self._dim is None:
+                    self._reset(len(vector), 0)
+                    self._write_meta(0)
+                    self._open_vectors(INITIAL_ROWS)
+                elif len(vector) != self._dim:
+                    # Another model's vectors: serve from the LRU, do not persist
+                    return vector
+                # The next row is the index length across all writers
+                row = self._index_offset // RECORD.size
+                if self.max_rows and row >= self.max_rows:
+                    self._compact()
+                    row = self._index_offset // RECORD.size
+                if row >= self._vectors.shape[0]:
+                    self._vectors.flush()
+                    self._open_vectors(max(INITIAL_ROWS, row + 1, self._vectors.shape[0] * 2))
+                self._vectors[row] = vector
+                # Record is written after its vector, so a crash never exposes a torn row
+                with open(self._index_path, "ab") as f:
+                    f.write(RECORD.pack(key, row))
+                self._index_offset += RECORD.size
+                self._rows[key] = row
+            return vector
+
+    def _compact(self):
+        """Rewrite the files as a new generation keeping the newest half of the rows; file lock held"""
+        keep = sorted(self._rows.items(), key=lambda item: item[1])[-max(1, self.max_rows // 2):]
+        generation = self._generation + 1
+        rows = max(INITIAL_ROWS, len(keep))
+        vectors = np.memmap(self._vectors_file(generation), dtype=np.float32, mode="w+",
+                            shape=(rows, self._dim))
+        vectors[:len(keep)] = self._vectors[[row for _, row in keep]]
+        vectors.flush()
+        del vectors
+        with open(self._index_file(generation), "wb") as f:
+            f.write(b"".join(RECORD.pack(key, row) for row, (key, _) in enumerate(keep)))
+        # Readers switch once meta.json names the new generation
+        self._write_meta(generation)
+        dropped = len(self._rows) - len(keep)
+        self._reset(self._dim, generation)
+        self._refresh()
+        for pattern in ("vectors.*.f32", "index.*.bin"):
+            for stale in glob.glob(os.path.join(self.path, pattern)):
+                if stale not in (self._vectors_path, self._index_path):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass  # Still mapped by a reader (Windows); removed by a later compaction
+        metrics.increment("embedding_cache.compactions")
+        logger.info(f"Compacted embedding cache at {self.path}: dropped {dropped} oldest rows")
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def embed(self, texts: List[str], embedder: Embedder, model_name: str) -> List[List[float]]:
+        """
+        Embeddings for texts, computing only the ones not cached
+
+        Args:
+            texts: Texts to embed
+            embedder: Chroma-style embedding function (list of texts in,
+                list of vectors out), called once with all misses
+            model_name: Embedding model name (part of the cache key)
+
+        Returns:
+            One vector (list of floats) per text
+        """
+        keys = [embedding_key(model_name, text) for text in texts]
+        vectors = [self.get(key) for key in keys]
+        # First position of each distinct missing text (repeats are embedded once)
+        missing: Dict[bytes, int] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], i)
+        metrics.increment("embedding_cache.hits", len(texts) - len(missing))
+        if missing:
+            metrics.increment("embedding_cache.misses", len(missing))
+            with metrics.timer("embedding_cache.inference_ms"):
+                computed = embedder([texts[i] for i in missing.values()])
+            fresh = {key: self.put(key, vector) for key, vector in zip(missing, computed)}
+            vectors = [fresh[key] if vector is None else vector
+                       for key, vector in zip(keys, vectors)]
+        return [vector.tolist() for vector in vectors]
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows) if self.path else len(self._lru)
+
+
+# One cache per directory: every LongTermMemory in the process shares it
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(path: str) -> EmbeddingCache:
+    """Get the shared embedding cache for a directory (thread-safe)"""
+    key = os.path.abspath(path) if path else ""
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(path)
+        return _caches[key]
@@ -1,72 +1,213 @@
 """
-Long-term semantic memory using ChromaDB with embeddings
+Long-term semantic memory using a vector store (ChromaDB or in-process NumPy) with embeddings
 Retrieves semantically similar past conversations, summaries, and profile facts
 """
 
 import os
+import re
 import uuid
 import hashlib
+import importlib.util
 import math
+import zlib
 import logging
-from typing import List, Dict, Optional
+import threading
+import time
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
-import chromadb
-from chromadb.config import Settings
-from utils.timezone_utils import now_central
+import numpy as np
+
+from utils.timezone_utils import CENTRAL_TZ, now_central, to_central
 from app.database.crud import ConversationCRUD
+from utils.metrics import metrics
+from app.memory.embedding_cache import get_embedding_cache
+from app.memory.memory_index import DEFAULT_EVICTION_POLICY, UserMemoryIndex
+from app.memory.vector_store import DEFAULT_VECTOR_BACKEND, build_vector_store
 
 logger = logging.getLogger(__name__)
 
+COLLECTION_NAME = "carely_memory"
+# Collection layout: "shared" (one collection, filtered by user_id), "user"
+# (one collection per user) or "bucket" (users hashed into N collections);
+# unset = "user" for the numpy backend, "shared" for Chroma
+DEFAULT_PARTITIONING = os.getenv("CARELY_VECTOR_PARTITIONING")
+DEFAULT_BUCKETS = int(os.getenv("CARELY_VECTOR_BUCKETS", "64"))
+PARTITIONINGS = ("shared", "user", "bucket")
+# Retrieval re-ranking: combined = semantic weight * (1 - distance) +
+# recency weight * 0.5 ** (age in days / half-life)
+DEFAULT_SEMANTIC_WEIGHT = float(os.getenv("CARELY_MEMORY_SEMANTIC_WEIGHT", "0.7"))
+DEFAULT_RECENCY_WEIGHT = float(os.getenv("CARELY_MEMORY_RECENCY_WEIGHT", "0.3"))
+DEFAULT_HALF_LIFE_DAYS = float(os.getenv("CARELY_MEMORY_HALF_LIFE_DAYS", "30"))
+# Documents per upsert when indexing in bulk
+UPSERT_CHUNK = int(os.getenv("CARELY_VECTOR_UPSERT_CHUNK", "256"))
+
+
+def load_embedder(embedding_model: str) -> Tuple[Optional[Callable], Callable, str]:
+    """
+    Load the embedding function for a model
+    
+    Returns:
+        (collection embedding function or None for Chroma's default,
+        embedding function to call, model name used in cache keys)
+    """
+    # Try to use SentenceTransformer embedding function
+    # Falls back to ChromaDB default if sentence-transformers is unavailable
+    try:
+        from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+        embedding_function = SentenceTransformerEmbeddingFunction(model_name=embedding_model)
+        return embedding_function, embedding_function, embedding_model
+    except (ImportError, ValueError):
+        # Fallback to default embedding function
+        logger.info("Using ChromaDB default embedding (sentence-transformers not available)")
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        return None, DefaultEmbeddingFunction(), "chroma-default/all-MiniLM-L6-v2"
+
+
+def embedder_name_for(embedding_model: str) -> str:
+    """Model name load_embedder reports for embedding_model, without loading it"""
+    if importlib.util.find_spec("sentence_transformers") is None:
+        return "chroma-default/all-MiniLM-L6-v2"
+    return embedding_model
+
 
 class LongTermMemory:
-    """Manages long-term semantic memory using ChromaDB embeddings"""
+    """Manages long-term semantic memory using vector store embeddings"""
     
-    def __init__(self, storage_path: str = "data/vectors", embedding_model: str = "all-MiniLM-L6-v2"):
+    def __init__(self, storage_path: str = "data/vectors", embedding_model: str = "all-MiniLM-L6-v2",
+                 embedder: Callable[[List[str]], List[List[float]]] = None,
+                 partitioning: str = None, buckets: int = None, backend: str = None,
+                 embedder_name: str = None):
         """
-        Initialize long-term memory system with ChromaDB
+        Initialize long-term memory system
         
         Args:
             storage_path: Path to store vector database
             embedding_model: SentenceTransformers model name (default: all-MiniLM-L6-v2)
+            embedder: Computes the model's embeddings instead of loading it
+                here (e.g. a worker pool during backfill)
+            partitioning: Collection layout, one of PARTITIONINGS
+                (default: CARELY_VECTOR_PARTITIONING)
+            buckets: Number of collections for the "bucket" layout
+            backend: Vector store backend, "chroma" or "numpy"
+                (default: CARELY_VECTOR_BACKEND)
+            embedder_name: Model name for embedding cache keys when an
+                embedder is given (default: what load_embedder would report)
         """
         self.storage_path = storage_path
         self.embedding_model = embedding_model
         os.makedirs(storage_path, exist_ok=True)
         
-        # Initialize ChromaDB client with persistent storage
-        self.client = chromadb.PersistentClient(
-            path=storage_path,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        if embedder is None:
+            self.embedding_function, embedder, self.embedder_name = load_embedder(embedding_model)
+        else:
+            self.embedding_function = None
+            self.embedder_name = embedder_name or embedder_name_for(embedding_model)
+        self.backend = (backend or DEFAULT_VECTOR_BACKEND).lower()
+        self.store = build_vector_store(self.backend, storage_path, self.embedding_function)
         
-        # Try to use SentenceTransformer embedding function
-        # Falls back to ChromaDB default if sentence-transformers is unavailable
-        try:
-            from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-            embedding_function = SentenceTransformerEmbeddingFunction(model_name=embedding_model)
-        except (ImportError, ValueError):
-            # Fallback to default embedding function
-            embedding_function = None
-            logger.info("Using ChromaDB default embedding (sentence-transformers not available)")
-        
-        # Get or create collection with configured embedding function
-        self.collection = self.client.get_or_create_collection(
-            name="carely_memory",
-            metadata={"hnsw:space": "cosine"},
-            embedding_function=embedding_function
-        )
+        self.partitioning = (partitioning or DEFAULT_PARTITIONING
+                             or ("user" if self.backend == "numpy" else "shared")).lower()
+        if self.partitioning not in PARTITIONINGS:
+            raise ValueError(f"Unknown vector partitioning {self.partitioning!r}, expected one of {PARTITIONINGS}")
+        self.buckets = buckets or DEFAULT_BUCKETS
+        # Partition collections are created on first use; handles are cached by name
+        self._collections: Dict[str, object] = {}
+        self._collections_lock = threading.Lock()
+        # The single shared collection (None when partitioned)
+        self.collection = self._open_collection(COLLECTION_NAME) if self.partitioning == "shared" else None
         
+        # Embeddings are computed here (through the cache) and handed to the store
+        self._embedder = embedder
+        cache_enabled = os.getenv("CARELY_EMBEDDING_CACHE", "true").lower() in ("1", "true", "yes")
+        cache_dir = os.getenv("CARELY_EMBEDDING_CACHE_DIR", os.path.join(storage_path, "embedding_cache"))
+        self.embedding_cache = get_embedding_cache(cache_dir if cache_enabled else None)
         self.last_update = None
         self.max_raw_per_user = 200  # Hygiene: cap raw conversations per user
+        self.semantic_weight = DEFAULT_SEMANTIC_WEIGHT
+        self.recency_weight = DEFAULT_RECENCY_WEIGHT
+        self.half_life_days = DEFAULT_HALF_LIFE_DAYS
+        # Write-time dedup and capacity order per user, loaded on first write
+        self.eviction_policy = DEFAULT_EVICTION_POLICY
+        self._indexes: Dict[int, UserMemoryIndex] = {}
+        self._indexes_lock = threading.Lock()
+        # Collection name -> version the indexes last saw (see _collection_version)
+        self._index_versions: Dict[str, object] = {}
+    
+    def _open_collection(self, name: str):
+        """Get or create a collection (cached handle)"""
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        with self._collections_lock:
+            if name not in self._collections:
+                self._collections[name] = self.store.get_collection(name)
+            return self._collections[name]
+    
+    def partition_name(self, user_id: int) -> str:
+        """Name of the collection holding a user's memory items"""
+        if self.partitioning == "user":
+            return f"{COLLECTION_NAME}_user_{user_id}"
+        if self.partitioning == "bucket":
+            bucket = zlib.crc32(str(user_id).encode()) % self.buckets
+            return f"{COLLECTION_NAME}_bucket_{bucket}"
+        return COLLECTION_NAME
+    
+    def _collection_for(self, user_id: int):
+        """Collection holding a user's memory items (created on first use)"""
+        return self._open_collection(self.partition_name(user_id))
+    
+    def partition_names(self) -> List[str]:
+        """Existing collections of this layout"""
+        if self.partitioning == "shared":
+            return [COLLECTION_NAME]
+        prefix = f"{COLLECTION_NAME}_{self.partitioning}_"
+        return sorted(name for name in self.store.list_collections() if name.startswith(prefix))
+    
+    def _where(self, user_id: int, **conditions) -> Optional[Dict]:
+        """
+        Chroma where clause for a user's items plus equality conditions; the
+        user filter is dropped when the collection holds only that user
+        """
+        clauses = [{key: value} for key, value in conditions.items()]
+        if self.partitioning != "user":
+            clauses.insert(0, {"user_id": str(user_id)})  # Ensure string for ChromaDB filtering
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
     
     def _compute_content_hash(self, text: str) -> str:
         """Compute hash for deduplication"""
         return hashlib.md5(text.encode()).hexdigest()
     
+    @staticmethod
+    def _snippet(text: str) -> str:
+        """First two sentences of a document (what retrieval shows)"""
+        sentences = text.split('.')[:2]
+        concise_text = '. '.join(s.strip() for s in sentences if s.strip())
+        if concise_text and not concise_text.endswith('.'):
+            concise_text += '.'
+        return concise_text
+    
+    @staticmethod
+    def _item_epoch(metadata: Dict) -> float:
+        """
+        Item time as epoch seconds; items written before epochs were stored
+        fall back to parsing the ISO string (NaN if that fails)
+        """
+        epoch = metadata.get('timestamp_epoch')
+        if epoch is not None:
+            return float(epoch)
+        try:
+            timestamp_str = metadata.get('timestamp_utc') or metadata.get('timestamp', '')
+            return to_central(datetime.fromisoformat(timestamp_str)).timestamp()
+        except (TypeError, ValueError):
+            return math.nan
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, reusing cached vectors (same text + model = no inference)"""
+        return self.embedding_cache.embed(texts, self._embedder, self.embedder_name)
+    
     def add_conversation(self, user_id: int, conversation_id: int, 
                         user_message: str, assistant_response: str, 
                         timestamp: datetime, title: str = None, tags: List[str] = None) -> None:
@@ -83,38 +224,187 @@ class LongTermMemory:
             tags: Optional tags for categorization
         """
         try:
-            # Combine user message and response for richer context
-            combined_text = f"{user_message} {assistant_response}"
-            
-            # Compute content hash for deduplication
-            content_hash = self._compute_content_hash(combined_text)
-            
-            # Create unique ID for this entry
-            doc_id = f"user_{user_id}_conv_{conversation_id}"
-            
-            # Standardized metadata
-            metadata = {
-                "user_id": str(user_id),  # Store as string for ChromaDB consistency
-                "type": "conversation",
-                "timestamp_utc": timestamp.isoformat(),
-                "title": title or f"Conversation {conversation_id}",
-                "tags": ",".join(tags) if tags else "",
-                "content_hash": content_hash,
-                "source_id": conversation_id,
-                "user_message": user_message[:200],
-                "assistant_response": assistant_response[:200]
-            }
+            record = self._conversation_record(
+                user_id, conversation_id, user_message, assistant_response,
+                timestamp, title, tags)
             
             # Add to collection
-            self.collection.upsert(
-                ids=[doc_id],
-                documents=[combined_text],
-                metadatas=[metadata]
-            )
+            self._write_items(user_id, [record])
             
         except Exception as e:
             logger.error(f"Error adding conversation to vector store: {e}")
     
+    def _conversation_record(self, user_id: int, conversation_id: int,
+                             user_message: str, assistant_response: str,
+                             timestamp: datetime, title: str = None,
+                             tags: List[str] = None) -> Tuple[str, str, Dict]:
+        """Document id, text and metadata of a conversation entry"""
+        # Combine user message and response for richer context
+        combined_text = f"{user_message} {assistant_response}"
+        
+        # Compute content hash for deduplication
+        content_hash = self._compute_content_hash(combined_text)
+        
+        # Create unique ID for this entry
+        doc_id = f"user_{user_id}_conv_{conversation_id}"
+        
+        # Standardized metadata
+        metadata = {
+            "user_id": str(user_id),  # Store as string for ChromaDB consistency
+            "type": "conversation",
+            "timestamp_utc": timestamp.isoformat(),
+            "timestamp_epoch": to_central(timestamp).timestamp(),
+            "snippet": self._snippet(combined_text),
+            "title": title or f"Conversation {conversation_id}",
+            "tags": ",".join(tags) if tags else "",
+            "content_hash": content_hash,
+            "source_id": conversation_id,
+            "user_message": user_message[:200],
+            "assistant_response": assistant_response[:200]
+        }
+        return doc_id, combined_text, metadata
+    
+    def add_conversations(self, user_id: int, conversations: List, chunk_size: int = None) -> int:
+        """
+        Add many saved conversations (bulk indexing): one embedding call for
+        all of them, upserted in chunks
+        
+        Args:
+            user_id: User ID
+            conversations: Conversation rows (id, message, response, timestamp)
+            chunk_size: Documents per upsert (default UPSERT_CHUNK)
+        
+        Returns:
+            Number of conversations written (duplicates are skipped)
+        """
+        records = [self._conversation_record(user_id, conv.id, conv.message, conv.response,
+                                             conv.timestamp)
+                   for conv in conversations]
+        return self._write_items(user_id, records, chunk_size)
+    
+    def _stamp_path(self, name: str) -> str:
+        return os.path.join(self.storage_path, "write_stamps", name)
+
+    def _collection_version(self, collection):
+        """
+        Changes whenever any process writes the collection: the NumPy
+        generation, or for Chroma the item count plus a stamp file that
+        LongTermMemory writers replace after each write
+        """
+        version = getattr(collection, "version", None)
+        if version is not None:
+            return version()
+        try:
+            stat = os.stat(self._stamp_path(collection.name))
+            stamp = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+        return collection.count(), stamp
+
+    def _stamp_write(self, collection):
+        """Tell other processes' indexes that the collection changed (Chroma)"""
+        if getattr(collection, "version", None) is not None:
+            return
+        path = self._stamp_path(collection.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)  # New inode: a version no other write shares
+
+    def _index_for(self, user_id: int) -> UserMemoryIndex:
+        """
+        A user's dedup / capacity index, built from the store on first use and
+        rebuilt after another process (app, API, scheduler, backfill) wrote
+        the user's collection
+        """
+        collection = self._collection_for(user_id)
+        version = self._collection_version(collection)
+        with self._indexes_lock:
+            if self._index_versions.setdefault(collection.name, version) != version:
+                stale = [uid for uid in self._indexes if self.partition_name(uid) == collection.name]
+                for uid in stale:
+                    del self._indexes[uid]
+                self._index_versions[collection.name] = version
+                if stale:
+                    metrics.increment("memory.index_rebuilds", len(stale))
+        index = self._indexes.get(user_id)
+        if index is not None:
+            return index
+        with self._indexes_lock:
+            if user_id not in self._indexes:
+                index = UserMemoryIndex(self.eviction_policy)
+                results = self._collection_for(user_id).get(where=self._where(user_id),
+                                                             include=["metadatas"])
+                for doc_id, metadata in zip(results['ids'], results['metadatas']):
+                    metadata = metadata or {}
+                    index.add(doc_id, metadata.get('content_hash'), self._item_epoch(metadata),
+                              evictable=metadata.get('type') == 'conversation')
+                self._indexes[user_id] = index
+            return self._indexes[user_id]
+    
+    def _forget_index(self, user_id: int = None):
+        """Drop cached indexes (one user, or all) after bulk changes to the store"""
+        with self._indexes_lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(user_id, None)
+    
+    def _write_items(self, user_id: int, records: List[Tuple[str, str, Dict]],
+                     chunk_size: int = None) -> int:
+        """
+        Upsert items, skipping content already stored under another id, then
+        evict the user's conversations beyond max_raw_per_user
+        
+        Args:
+            user_id: User ID
+            records: (doc id, text, metadata) of each item
+            chunk_size: Documents per upsert (default UPSERT_CHUNK)
+        
+        Returns:
+            Number of items written
+        """
+        index = self._index_for(user_id)
+        collection = self._collection_for(user_id)
+        with index.lock:
+            fresh = []
+            for doc_id, text, metadata in records:
+                content_hash = metadata.get('content_hash')
+                if content_hash and index.duplicate_of(content_hash, doc_id):
+                    metrics.increment("memory.duplicates_skipped")
+                    continue
+                index.add(doc_id, content_hash, metadata['timestamp_epoch'],
+                          evictable=metadata['type'] == 'conversation')
+                fresh.append((doc_id, text, metadata))
+            try:
+                if fresh:
+                    embeddings = self.embed_texts([text for _, text, _ in fresh])
+                    chunk_size = chunk_size or UPSERT_CHUNK
+                    for start in range(0, len(fresh), chunk_size):
+                        chunk = fresh[start:start + chunk_size]
+                        collection.upsert(
+                            ids=[doc_id for doc_id, _, _ in chunk],
+                            documents=[text for _, text, _ in chunk],
+                            embeddings=embeddings[start:start + chunk_size],
+                            metadatas=[metadata for _, _, metadata in chunk]
+                        )
+                victims = index.evict(self.max_raw_per_user)
+                if victims:
+                    collection.delete(ids=victims)
+                    metrics.increment("memory.evicted", len(victims))
+                # Our own write is already in the index
+                if fresh or victims:
+                    self._stamp_write(collection)
+                version = self._collection_version(collection)
+                with self._indexes_lock:
+                    self._index_versions[collection.name] = version
+            except Exception:
+                # The index may be ahead of the store; rebuild it on next use
+                self._forget_index(user_id)
+                raise
+        return len(fresh)
+    
     def add_summary(self, user_id: int, summary_text: str, date: datetime, 
                    key_topics: List[str] = None) -> None:
         """
@@ -138,17 +428,15 @@ class LongTermMemory:
                 "user_id": str(user_id),  # Store as string for ChromaDB consistency
                 "type": "summary",
                 "timestamp_utc": date.isoformat(),
+                "timestamp_epoch": to_central(date).timestamp(),
+                "snippet": self._snippet(concise_summary),
                 "title": f"Daily Summary {date.strftime('%Y-%m-%d')}",
                 "tags": ",".join(key_topics) if key_topics else "",
                 "date": date.strftime('%Y-%m-%d'),
                 "content_hash": self._compute_content_hash(concise_summary)
             }
             
-            self.collection.upsert(
-                ids=[doc_id],
-                documents=[concise_summary],
-                metadatas=[metadata]
-            )
+            self._write_items(user_id, [(doc_id, concise_summary, metadata)])
             
         except Exception as e:
             logger.error(f"Error adding summary to vector store: {e}")
@@ -166,46 +454,26 @@ class LongTermMemory:
         """
         try:
             doc_id = f"user_{user_id}_fact_{fact_type}_{uuid.uuid4().hex[:8]}"
+            added_at = now_central()
             
             # Standardized metadata
             metadata = {
                 "user_id": str(user_id),  # Store as string for ChromaDB consistency
                 "type": "profile_fact",
-                "timestamp_utc": now_central().isoformat(),
+                "timestamp_utc": added_at.isoformat(),
+                "timestamp_epoch": added_at.timestamp(),
+                "snippet": self._snippet(fact),
                 "title": f"{fact_type.replace('_', ' ').title()} fact",
                 "tags": ",".join(tags) if tags else fact_type,
                 "fact_type": fact_type,
                 "content_hash": self._compute_content_hash(fact)
             }
             
-            self.collection.upsert(
-                ids=[doc_id],
-                documents=[fact],
-                metadatas=[metadata]
-            )
+            self._write_items(user_id, [(doc_id, fact, metadata)])
             
         except Exception as e:
             logger.error(f"Error adding profile fact to vector store: {e}")
     
-    def _calculate_recency_score(self, timestamp_str: str, half_life_days: float = 30.0) -> float:
-        """
-        Calculate recency score with exponential decay
-        
-        Args:
-            timestamp_str: ISO timestamp string
-            half_life_days: Number of days for 50% decay (default 30)
-        
-        Returns:
-            Recency score between 0 and 1
-        """
-        try:
-            timestamp = datetime.fromisoformat(timestamp_str)
-            age_days = (now_central() - timestamp).total_seconds() / 86400.0
-            decay_rate = math.log(2) / half_life_days
-            return math.exp(-decay_rate * age_days)
-        except:
-            return 0.5  # Default mid-range score if parsing fails
-    
     def retrieve_similar_conversations(self, query: str, user_id: int, 
                                       top_k: int = 7, exclude_query: str = None) -> List[Dict]:
         """
@@ -223,89 +491,98 @@ class LongTermMemory:
         """
         try:
             # Query the collection - get more candidates for filtering
-            results = self.collection.query(
-                query_texts=[query],
+            results = self._collection_for(user_id).query(
+                query_embeddings=self.embed_texts([query]),
                 n_results=min(top_k * 3, 30),
-                where={"user_id": str(user_id)}  # Ensure string for ChromaDB filtering
+                where=self._where(user_id)
             )
             
             if not results or not results['ids'] or not results['ids'][0]:
                 return []
             
-            # First pass: collect and score all items
-            candidates = []
-            exclude_lower = exclude_query.lower().strip() if exclude_query else ""
+            items = self._rank_candidates(results, top_k, exclude_query)
+            if self.eviction_policy == "lru" and user_id in self._indexes:
+                self._indexes[user_id].touch([item['id'] for item in items])
+            return items
             
-            for idx, doc_id in enumerate(results['ids'][0]):
-                metadata = results['metadatas'][0][idx]
-                document = results['documents'][0][idx]
-                distance = results['distances'][0][idx] if 'distances' in results else 0.5
-                
-                # Skip if too similar to current query (avoid echoing)
-                if exclude_query and metadata.get('user_message', '').lower().strip() == exclude_lower:
+        except Exception as e:
+            logger.error(f"Error retrieving similar conversations: {e}")
+            return []
+    
+    def _rank_candidates(self, results: Dict, top_k: int, exclude_query: str = None) -> List[Dict]:
+        """
+        Score query results by semantic relevance and recency (one array pass)
+        and pick the best, at most 2 summaries and 5 other items
+        
+        Args:
+            results: Vector store query results for one query
+            top_k: Number of items to return
+            exclude_query: Query text to exclude from results
+        
+        Returns:
+            Items, best first
+        """
+        metadatas = results['metadatas'][0]
+        documents = results['documents'][0]
+        if 'distances' in results and results['distances']:
+            distances = np.asarray(results['distances'][0], dtype=np.float64)
+        else:
+            distances = np.full(len(metadatas), 0.5)
+        
+        # Skip near duplicates (very low distance) and echoes of the current query
+        keep = distances >= 0.05
+        if exclude_query:
+            exclude_lower = exclude_query.lower().strip()
+            keep &= np.array([metadata.get('user_message', '').lower().strip() != exclude_lower
+                              for metadata in metadatas])
+        
+        semantic = 1.0 - distances
+        epochs = np.array([self._item_epoch(metadata) for metadata in metadatas])
+        age_days = (now_central().timestamp() - epochs) / 86400.0
+        recency = np.exp(-math.log(2) / self.half_life_days * age_days)
+        recency[np.isnan(recency)] = 0.5  # Default mid-range score without a timestamp
+        combined = self.semantic_weight * semantic + self.recency_weight * recency
+        
+        # Best first, enforcing the mix ratio (2 summaries + 3-5 snippets)
+        selected = []
+        summaries = others = 0
+        for idx in np.argsort(-combined, kind="stable"):
+            if not keep[idx]:
+                continue
+            if metadatas[idx].get('type', 'conversation') == 'summary':
+                if summaries == 2:
                     continue
-                if distance < 0.05:  # Very low distance = near duplicate
+                summaries += 1
+            else:
+                if others == 5:
                     continue
-                
-                # Get timestamp for recency scoring
-                timestamp_str = metadata.get('timestamp_utc') or metadata.get('timestamp', '')
-                recency_score = self._calculate_recency_score(timestamp_str)
-                
-                # Semantic relevance (inverse of distance)
-                semantic_score = 1.0 - distance
-                
-                # Combined score: 70% semantic, 30% recency
-                combined_score = (semantic_score * 0.7) + (recency_score * 0.3)
-                
-                item_type = metadata.get('type', 'conversation')
-                
-                # Truncate to ≤2 sentences
-                sentences = document.split('.')[:2]
-                concise_text = '. '.join(s.strip() for s in sentences if s.strip())
-                if concise_text and not concise_text.endswith('.'):
-                    concise_text += '.'
-                
-                candidate = {
-                    "type": item_type,
-                    "text": concise_text,
-                    "metadata": metadata,
-                    "relevance": semantic_score,
-                    "recency": recency_score,
-                    "combined_score": combined_score,
-                    "timestamp_str": timestamp_str
-                }
-                
-                # Add type-specific fields
-                if item_type == 'conversation':
-                    candidate['user_message'] = metadata.get('user_message', '')
-                    candidate['assistant_response'] = metadata.get('assistant_response', '')
-                
-                candidates.append(candidate)
-            
-            # Sort by combined score
-            candidates.sort(key=lambda x: x['combined_score'], reverse=True)
-            
-            # Second pass: enforce mix ratio (2 summaries + 3-5 snippets)
-            summaries = [c for c in candidates if c['type'] == 'summary'][:2]
-            non_summaries = [c for c in candidates if c['type'] != 'summary'][:5]
-            
-            # Combine and re-sort
-            final_items = summaries + non_summaries
-            final_items.sort(key=lambda x: x['combined_score'], reverse=True)
-            
-            # Add timestamp objects for compatibility
-            for item in final_items:
-                if item['timestamp_str']:
-                    try:
-                        item['timestamp'] = datetime.fromisoformat(item['timestamp_str'])
-                    except:
-                        pass
+                others += 1
+            selected.append(idx)
+        
+        items = []
+        for idx in selected[:top_k]:
+            metadata = metadatas[idx]
+            item_type = metadata.get('type', 'conversation')
+            item = {
+                "id": results['ids'][0][idx],
+                "type": item_type,
+                "text": metadata.get('snippet') or self._snippet(documents[idx]),
+                "metadata": metadata,
+                "relevance": float(semantic[idx]),
+                "recency": float(recency[idx]),
+                "combined_score": float(combined[idx]),
+                "timestamp_str": metadata.get('timestamp_utc') or metadata.get('timestamp', '')
+            }
+            if not math.isnan(epochs[idx]):
+                item['timestamp'] = datetime.fromtimestamp(epochs[idx], CENTRAL_TZ)
             
-            return final_items[:top_k]
+            # Add type-specific fields
+            if item_type == 'conversation':
+                item['user_message'] = metadata.get('user_message', '')
+                item['assistant_response'] = metadata.get('assistant_response', '')
             
-        except Exception as e:
-            logger.error(f"Error retrieving similar conversations: {e}")
-            return []
+            items.append(item)
+        return items
     
     def get_formatted_similar_context(self, query: str, user_id: int, 
                                      top_k: int = 3) -> str:
@@ -357,15 +634,8 @@ class LongTermMemory:
             if not conversations:
                 return
             
-            # Add each conversation to the vector store
-            for conv in conversations:
-                self.add_conversation(
-                    user_id=user_id,
-                    conversation_id=conv.id,
-                    user_message=conv.message,
-                    assistant_response=conv.response,
-                    timestamp=conv.timestamp
-                )
+            # One embedding call and chunked upserts for the whole batch
+            self.add_conversations(user_id, conversations)
             
             self.last_update = now_central()
             logger.info(f"Indexed {len(conversations)} conversations for user {user_id}")
@@ -373,9 +643,85 @@ class LongTermMemory:
         except Exception as e:
             logger.error(f"Error building memory index: {e}")
     
+    def rebuild_collection(self) -> int:
+        """
+        Recreate the collection with this instance's embedding model (after a
+        model change). Summaries and profile facts exist only here, so they
+        are re-embedded from their stored text; conversations are dropped and
+        must be re-indexed from the database (see app.memory.backfill).
+        
+        Returns:
+            Number of summaries / profile facts carried over
+        """
+        carried = 0
+        for name in self.partition_names():
+            kept = self._open_collection(name).get(
+                where={"type": {"$ne": "conversation"}},
+                include=["documents", "metadatas"]
+            )
+            self._drop_collection(name)
+            collection = self._open_collection(name)
+            if name == COLLECTION_NAME:
+                self.collection = collection
+            ids = kept["ids"] if kept else []
+            for start in range(0, len(ids), UPSERT_CHUNK):
+                documents = kept["documents"][start:start + UPSERT_CHUNK]
+                collection.upsert(
+                    ids=ids[start:start + UPSERT_CHUNK],
+                    documents=documents,
+                    embeddings=self.embed_texts(documents),
+                    metadatas=kept["metadatas"][start:start + UPSERT_CHUNK]
+                )
+            carried += len(ids)
+        self._forget_index()
+        logger.info(f"Rebuilt vector collections, re-embedded {carried} summaries and facts")
+        return carried
+    
+    def migrate_metadata(self, page_size: int = UPSERT_CHUNK) -> int:
+        """
+        Add timestamp_epoch and snippet to items written before they were
+        stored at write time (embeddings are kept as they are)
+        
+        Args:
+            page_size: Items rewritten per upsert
+        
+        Returns:
+            Number of items updated
+        """
+        updated = 0
+        for name in self.partition_names():
+            collection = self._open_collection(name)
+            listing = collection.get(include=["metadatas"])
+            stale = [doc_id for doc_id, metadata in zip(listing["ids"], listing["metadatas"])
+                     if 'timestamp_epoch' not in (metadata or {}) or 'snippet' not in (metadata or {})]
+            for start in range(0, len(stale), page_size):
+                page = collection.get(ids=stale[start:start + page_size],
+                                      include=["embeddings", "documents", "metadatas"])
+                metadatas = []
+                for document, metadata in zip(page["documents"], page["metadatas"]):
+                    metadata = dict(metadata or {})
+                    epoch = self._item_epoch(metadata)
+                    if not math.isnan(epoch):
+                        metadata['timestamp_epoch'] = epoch
+                    metadata['snippet'] = self._snippet(document or "")
+                    metadatas.append(metadata)
+                collection.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                                  documents=page["documents"], metadatas=metadatas)
+                updated += len(page["ids"])
+        logger.info(f"Added epoch timestamps and snippets to {updated} memory items")
+        return updated
+    
+    def _drop_collection(self, name: str):
+        """Delete a collection and forget its cached handle"""
+        with self._collections_lock:
+            self._collections.pop(name, None)
+            self.store.delete_collection(name)
+    
     def deduplicate_by_hash(self, user_id: int) -> int:
         """
         Remove duplicate entries based on content hash
+        Full scan for the offline sweep (app.memory.memory_sweep); writes are
+        deduplicated as they happen
         
         Args:
             user_id: User ID
@@ -385,9 +731,8 @@ class LongTermMemory:
         """
         try:
             # Get all items for this user
-            results = self.collection.get(
-                where={"user_id": str(user_id)}  # Ensure string for ChromaDB filtering
-            )
+            collection = self._collection_for(user_id)
+            results = collection.get(where=self._where(user_id))
             
             if not results or not results['ids']:
                 return 0
@@ -409,7 +754,8 @@ class LongTermMemory:
             
             # Delete duplicates
             if duplicates:
-                self.collection.delete(ids=duplicates)
+                collection.delete(ids=duplicates)
+                self._forget_index(user_id)
                 logger.info(f"Removed {len(duplicates)} duplicate entries for user {user_id}")
             
             return len(duplicates)
@@ -421,7 +767,8 @@ class LongTermMemory:
     def cleanup_old_conversations(self, user_id: int, max_conversations: int = 200) -> int:
         """
         Keep only the most recent N raw conversations per user
-        Preserves summaries and profile facts
+        Preserves summaries and profile facts. Full scan for the offline sweep
+        (app.memory.memory_sweep); writes evict incrementally
         
         Args:
             user_id: User ID
@@ -432,29 +779,19 @@ class LongTermMemory:
         """
         try:
             # Get all conversations for this user
-            results = self.collection.get(
-                where={
-                    "user_id": str(user_id),  # Ensure string for ChromaDB filtering
-                    "type": "conversation"
-                }
-            )
+            collection = self._collection_for(user_id)
+            results = collection.get(where=self._where(user_id, type="conversation"))
             
             if not results or not results['ids']:
                 return 0
             
-            # Sort by timestamp (newest first)
+            # Sort by timestamp (newest first); unknown times sort oldest
             conversations = []
             for idx, doc_id in enumerate(results['ids']):
-                metadata = results['metadatas'][idx]
-                timestamp_str = metadata.get('timestamp_utc') or metadata.get('timestamp', '')
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                except:
-                    timestamp = datetime.min
-                
+                epoch = self._item_epoch(results['metadatas'][idx])
                 conversations.append({
                     'id': doc_id,
-                    'timestamp': timestamp
+                    'timestamp': -math.inf if math.isnan(epoch) else epoch
                 })
             
             conversations.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -464,7 +801,8 @@ class LongTermMemory:
                 old_conversations = conversations[max_conversations:]
                 old_ids = [c['id'] for c in old_conversations]
                 
-                self.collection.delete(ids=old_ids)
+                collection.delete(ids=old_ids)
+                self._forget_index(user_id)
                 logger.info(f"Removed {len(old_ids)} old conversations for user {user_id}")
                 return len(old_ids)
             
@@ -488,12 +826,9 @@ class LongTermMemory:
             List of memory items with metadata
         """
         try:
-            where_clause = {"user_id": str(user_id)}  # Ensure string for ChromaDB filtering
-            if memory_type:
-                where_clause["type"] = memory_type
-            
-            results = self.collection.get(
-                where=where_clause,
+            conditions = {"type": memory_type} if memory_type else {}
+            results = self._collection_for(user_id).get(
+                where=self._where(user_id, **conditions),
                 limit=limit
             )
             
@@ -534,7 +869,14 @@ class LongTermMemory:
             True if successful, False otherwise
         """
         try:
-            self.collection.delete(ids=[doc_id])
+            # Document ids start with user_<id>_ (see the add_* methods)
+            match = re.match(r"user_(\d+)_", doc_id)
+            user_id = int(match.group(1)) if match else None
+            collection = self._collection_for(user_id) if match else self.collection
+            collection.delete(ids=[doc_id])
+            if user_id in self._indexes:
+                with self._indexes[user_id].lock:
+                    self._indexes[user_id].remove([doc_id])
             return True
         except Exception as e:
             logger.error(f"Error deleting memory item: {e}")
@@ -548,14 +890,77 @@ class LongTermMemory:
             user_id: User ID
         """
         try:
+            self._forget_index(user_id)
+            if self.partitioning == "user":
+                # The user's collection holds nothing else: drop it instead of scanning
+                name = self.partition_name(user_id)
+                if name in self.partition_names():
+                    self._drop_collection(name)
+                    logger.info(f"Cleared memory collection {name} for user {user_id}")
+                return
+            
             # Query all documents for this user
-            results = self.collection.get(
-                where={"user_id": str(user_id)}  # Ensure string for ChromaDB filtering
-            )
+            collection = self._collection_for(user_id)
+            results = collection.get(where=self._where(user_id))
             
             if results and results['ids']:
-                self.collection.delete(ids=results['ids'])
+                collection.delete(ids=results['ids'])
                 logger.info(f"Cleared {len(results['ids'])} memory items for user {user_id}")
                 
         except Exception as e:
             logger.error(f"Error clearing user memory: {e}")
+
+
+# Process-wide instance: one embedding model, vector client and write index
+# shared by every MemoryManager (sessions, API, scheduler)
+_shared_memory: Optional[LongTermMemory] = None
+_shared_memory_lock = threading.Lock()
+# Guards only the warm-up thread handle: never held while loading
+_warm_up_thread: Optional[threading.Thread] = None
+_warm_up_lock = threading.Lock()
+# Start loading it in the background at startup (off = load on first use)
+WARM_UP_ENABLED = os.getenv("CARELY_MEMORY_WARM_UP", "true").lower() in ("1", "true", "yes")
+
+
+def get_long_term_memory() -> LongTermMemory:
+    """Get the shared long-term memory, loading it on first use (thread-safe)"""
+    global _shared_memory
+    if _shared_memory is None:
+        with _shared_memory_lock:
+            if _shared_memory is None:
+                start = time.perf_counter()
+                _shared_memory = LongTermMemory()
+                metrics.observe("memory.long_term_load_ms", (time.perf_counter() - start) * 1000.0)
+    return _shared_memory
+
+
+def _warm_up():
+    try:
+        long_term = get_long_term_memory()
+        # Some embedders load their model on the first call, not in the constructor
+        start = time.perf_counter()
+        long_term._embedder(["warm up"])
+        metrics.observe("memory.embedder_warm_up_ms", (time.perf_counter() - start) * 1000.0)
+        logger.info("Long-term memory warmed up")
+    except Exception as e:
+        logger.warning(f"Long-term memory warm-up failed: {e}")
+
+
+def warm_up_long_term_memory() -> Optional[threading.Thread]:
+    """
+    Start loading the shared long-term memory in a background thread
+    Safe to call repeatedly and returns at once, even while the load runs;
+    callers that need the instance meanwhile wait for it in get_long_term_memory
+    
+    Returns:
+        The warm-up thread (None when CARELY_MEMORY_WARM_UP is off)
+    """
+    global _warm_up_thread
+    if not WARM_UP_ENABLED:
+        return None
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_warm_up, daemon=True,
+                                               name="carely-memory-warm-up")
+            _warm_up_thread.start()
+        return _warm_up_thread
@@ -0,0 +1,111 @@
+"""
+Per-user write-time index for long-term memory
+Maps content hashes to document ids (so duplicates are rejected at upsert
+time) and keeps the eviction order of a user's raw conversations (oldest
+first, or least recently retrieved) so the capacity cap is enforced one write
+at a time. Summaries and profile facts are indexed for dedup but never evicted.
+"""
+
+import heapq
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+EVICTION_POLICIES = ("oldest", "lru")
+DEFAULT_EVICTION_POLICY = os.getenv("CARELY_MEMORY_EVICTION", "oldest").lower()
+
+
+class UserMemoryIndex:
+    """Content-hash index and capacity order of one user's memory items"""
+
+    def __init__(self, policy: str = None):
+        """
+        Args:
+            policy: "oldest" (evict the oldest conversation) or "lru" (evict
+                the conversation retrieved least recently)
+        """
+        self.policy = (policy or DEFAULT_EVICTION_POLICY).lower()
+        if self.policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {self.policy!r}, expected one of {EVICTION_POLICIES}")
+        self._hash_to_id: Dict[str, str] = {}
+        self._id_to_hash: Dict[str, str] = {}
+        # Evictable (conversation) ids: doc id -> epoch
+        self._evictable: Dict[str, float] = {}
+        # oldest: min-heap of (epoch, doc id), stale entries skipped lazily
+        self._heap: List[Tuple[float, str]] = []
+        # lru: least recently used first
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        # Held by the writer across dedup check, upsert and eviction
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._evictable)
+
+    def duplicate_of(self, content_hash: str, doc_id: str) -> Optional[str]:
+        """Id of another item with the same content, if any"""
+        existing = self._hash_to_id.get(content_hash)
+        return existing if existing is not None and existing != doc_id else None
+
+    def add(self, doc_id: str, content_hash: Optional[str], epoch: float = math.nan,
+            evictable: bool = False):
+        """
+        Record an upserted item
+
+        Args:
+            doc_id: Document id
+            content_hash: Content hash from the item metadata
+            epoch: Item time (oldest-first order; unknown times evict first)
+            evictable: True for raw conversations
+        """
+        previous = self._id_to_hash.pop(doc_id, None)
+        if previous is not None and self._hash_to_id.get(previous) == doc_id:
+            del self._hash_to_id[previous]
+        if content_hash:
+            self._hash_to_id.setdefault(content_hash, doc_id)
+            self._id_to_hash[doc_id] = content_hash
+        if not evictable:
+            return
+        epoch = -math.inf if math.isnan(epoch) else epoch
+        if self._evictable.get(doc_id) != epoch:
+            self._evictable[doc_id] = epoch
+            if self.policy == "oldest":
+                heapq.heappush(self._heap, (epoch, doc_id))
+        if self.policy == "lru":
+            self._lru[doc_id] = None
+            self._lru.move_to_end(doc_id)
+
+    def touch(self, doc_ids: List[str]):
+        """Mark items as used (retrieved into context); LRU policy only"""
+        if self.policy != "lru":
+            return
+        for doc_id in doc_ids:
+            if doc_id in self._lru:
+                self._lru.move_to_end(doc_id)
+
+    def remove(self, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            content_hash = self._id_to_hash.pop(doc_id, None)
+            if content_hash is not None and self._hash_to_id.get(content_hash) == doc_id:
+                del self._hash_to_id[content_hash]
+            self._evictable.pop(doc_id, None)
+            self._lru.pop(doc_id, None)
+
+    def evict(self, capacity: int) -> List[str]:
+        """Pop conversations beyond capacity (usually none or one per write)"""
+        victims = []
+        while len(self._evictable) > capacity:
+            if self.policy == "lru":
+                doc_id, _ = self._lru.popitem(last=False)
+            else:
+                epoch, doc_id = heapq.heappop(self._heap)
+                if self._evictable.get(doc_id) != epoch:
+                    continue  # Stale heap entry (re-added or removed)
+            victims.append(doc_id)
+            self.remove([doc_id])
+        if self.policy == "oldest" and len(self._heap) > 2 * len(self._evictable) + 64:
+            # Drop stale entries once they dominate the heap
+            self._heap = [(epoch, doc_id) for doc_id, epoch in self._evictable.items()]
+            heapq.heapify(self._heap)
+        return victims
@@ -5,28 +5,85 @@ Provides a single interface for context-aware, personalized responses
 
 from typing import Dict, List, Optional
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import logging
+import os
+import threading
+import time
 
 from app.memory.short_term_memory import ShortTermMemory
-from app.memory.long_term_memory import LongTermMemory
+from app.memory.long_term_memory import LongTermMemory, get_long_term_memory, warm_up_long_term_memory
 from app.memory.episodic_memory import EpisodicMemory
 from app.memory.structured_memory import StructuredMemory
 from utils.timezone_utils import now_central
+from utils.metrics import metrics
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Default per-layer deadlines (ms) for concurrent context assembly
+DEFAULT_LAYER_BUDGETS_MS = {
+    "profile": float(os.getenv("CARELY_CONTEXT_BUDGET_PROFILE_MS", "300")),
+    "recent": float(os.getenv("CARELY_CONTEXT_BUDGET_RECENT_MS", "300")),
+    "similar": float(os.getenv("CARELY_CONTEXT_BUDGET_SIMILAR_MS", "600")),
+}
+
+# Prompt header of each layer, in prompt order
+CONTEXT_HEADERS = {
+    "profile": "=== USER PROFILE ===",
+    "recent": "\n=== RECENT CONVERSATION ===",
+    "similar": "\n=== RELEVANT PAST CONTEXT ===",
+}
+
+_context_pool = None
+_context_pool_lock = threading.Lock()
+
+
+def get_context_pool() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool shared by all memory managers"""
+    global _context_pool
+    if _context_pool is None:
+        with _context_pool_lock:
+            if _context_pool is None:
+                _context_pool = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("CARELY_CONTEXT_WORKERS", "8")),
+                    thread_name_prefix="carely-context")
+    return _context_pool
+
 
 class MemoryManager:
     """Unified interface for all memory layers"""
 
-    def __init__(self):
-        """Initialize all memory layers"""
+    def __init__(self, layer_budgets_ms: Dict[str, float] = None):
+        """
+        Initialize all memory layers
+        
+        Args:
+            layer_budgets_ms: Optional per-layer deadlines for build_context
+                (keys: profile, recent, similar)
+        """
         self.short_term = ShortTermMemory(
             max_size=10)  # DB-based, fetches last 10
-        self.long_term = LongTermMemory()  # ChromaDB-based embeddings
+        # Vector store embeddings (CARELY_VECTOR_BACKEND): one model and client
+        # per process, loaded in the background and resolved on first use
+        self._long_term: Optional[LongTermMemory] = None
+        warm_up_long_term_memory()
         self.episodic = EpisodicMemory()
         self.structured = StructuredMemory()
-        self.turn_count = 0  # Track turns since last summary
+        self.layer_budgets_ms = dict(DEFAULT_LAYER_BUDGETS_MS)
+        if layer_budgets_ms:
+            self.layer_budgets_ms.update(layer_budgets_ms)
+
+    @property
+    def long_term(self) -> LongTermMemory:
+        """Long-term memory layer (the process-wide shared instance by default)"""
+        if self._long_term is None:
+            self._long_term = get_long_term_memory()
+        return self._long_term
+
+    @long_term.setter
+    def long_term(self, long_term: LongTermMemory):
+        self._long_term = long_term
 
     def is_vector_worthy(self, user_message: str, assistant_response: str) -> bool:
         """
@@ -96,56 +153,160 @@ class MemoryManager:
                     user_message=user_message,
                     assistant_response=assistant_response,
                     timestamp=timestamp)
-                
-                # Increment turn count
-                self.turn_count += 1
-                
-                # Every 10 turns, run hygiene: dedupe + cleanup old conversations
-                if self.turn_count % 10 == 0:
-                    self.long_term.deduplicate_by_hash(user_id)
-                    self.long_term.cleanup_old_conversations(user_id, max_conversations=200)
+                # Dedup and the per-user cap are enforced by the write itself;
+                # the full-scan sweep is an offline job (app.memory.memory_sweep)
         except Exception as e:
             logger.warning(f"Could not add conversation to vector store: {e}")
 
-    def get_full_context(self, user_id: int, current_query: str) -> str:
+    def _fetch_profile_layer(self, user_id: int, current_query: str) -> str:
+        """Structured Memory - User Profile and Preferences"""
+        return self.structured.get_formatted_profile(user_id) or ""
+
+    def _fetch_recent_layer(self, user_id: int, current_query: str) -> str:
+        """Short-Term Memory - Recent conversation (DB-based, last 10 messages)"""
+        short_term_context = self.short_term.get_formatted_context(
+            user_id, num_exchanges=10)
+        if short_term_context and "No recent" not in short_term_context:
+            return short_term_context
+        return ""
+
+    def _fetch_similar_layer(self, user_id: int, current_query: str) -> str:
+        """Long-Term Memory - Semantically similar past context"""
+        # Retrieves top-1 conversation + top-2 summaries/facts (max 3 total, ≤2 sentences each)
+        return self.long_term.get_formatted_similar_context(
+            current_query, user_id, top_k=3) or ""
+
+    def _timed_layer(self, fetch, user_id: int, current_query: str):
+        """Run one layer fetch on a worker thread, measuring its own duration"""
+        start = time.perf_counter()
+        text = fetch(user_id, current_query)
+        return text, (time.perf_counter() - start) * 1000.0
+
+    def _context_layers(self):
+        return [
+            ("profile", self._fetch_profile_layer),
+            ("recent", self._fetch_recent_layer),
+            ("similar", self._fetch_similar_layer),
+        ]
+
+    def start_context(self, user_id: int, current_query: str) -> Dict:
         """
-        Get comprehensive context from all memory layers
+        Submit all layer fetches to the shared pool without waiting for them.
+        Used to retrieve context speculatively while other work is in flight.
         
         Args:
             user_id: User ID
             current_query: Current user query
         
         Returns:
-            Complete context string for AI prompt
+            Pending handle for collect_context / cancel_context
         """
-        context_parts = []
+        pool = get_context_pool()
+        return {
+            "started": time.perf_counter(),
+            "futures": {
+                name: pool.submit(self._timed_layer, fetch, user_id, current_query)
+                for name, fetch in self._context_layers()
+            },
+        }
 
-        # 1. Structured Memory - User Profile and Preferences
-        profile = self.structured.get_formatted_profile(user_id)
-        if profile:
-            context_parts.append("=== USER PROFILE ===")
-            context_parts.append(profile)
+    def cancel_context(self, pending: Dict):
+        """Discard a pending context fetch (layers not yet started are skipped)"""
+        for future in pending["futures"].values():
+            future.cancel()
 
-        # 2. Short-Term Memory - Recent conversation (DB-based, last 10 messages)
-        short_term_context = self.short_term.get_formatted_context(
-            user_id, num_exchanges=10)
-        if short_term_context and "No recent" not in short_term_context:
-            context_parts.append("\n=== RECENT CONVERSATION ===")
-            context_parts.append(short_term_context)
+    def build_context(self, user_id: int, current_query: str) -> Dict:
+        """
+        Fetch all memory layers concurrently, each under its own time budget.
+        A layer that misses its deadline (or fails) is dropped from the
+        prompt instead of stalling the turn.
+        
+        Args:
+            user_id: User ID
+            current_query: Current user query
+        
+        Returns:
+            Dict with the assembled context string, per-layer section bodies,
+            per-layer timings (ms), per-layer status and the dropped layers
+        """
+        return self.collect_context(self.start_context(user_id, current_query))
 
-        # 3. Long-Term Memory - Semantically similar past context
-        # Retrieves top-1 conversation + top-2 summaries/facts (max 3 total, ≤2 sentences each)
-        try:
-            similar_context = self.long_term.get_formatted_similar_context(
-                current_query, user_id, top_k=3)
-            if similar_context:
-                context_parts.append("\n=== RELEVANT PAST CONTEXT ===")
-                context_parts.append(similar_context)
-        except Exception as e:
-            # Gracefully handle vector store errors
-            logger.warning(f"Long-term memory retrieval failed: {e}")
+    def collect_context(self, pending: Dict) -> Dict:
+        """
+        Wait for a pending context fetch, honouring each layer's deadline
+        (measured from when the fetch was started)
+        
+        Args:
+            pending: Handle returned by start_context
+        
+        Returns:
+            Same dict as build_context
+        """
+        layers = self._context_layers()
+        start = pending["started"]
+        futures = pending["futures"]
+        wait_start = time.perf_counter()
 
-        return "\n".join(context_parts)
+        sections, timings, status, dropped = {}, {}, {}, []
+        for name, _ in layers:
+            budget_s = self.layer_budgets_ms.get(name, 500) / 1000.0
+            remaining = budget_s - (time.perf_counter() - start)
+            try:
+                text, elapsed_ms = futures[name].result(timeout=max(0.0, remaining))
+                sections[name] = text
+                timings[name] = elapsed_ms
+                status[name] = "ok" if text else "empty"
+            except FuturesTimeoutError:
+                # Leave the worker running; its late result is discarded
+                timings[name] = (time.perf_counter() - start) * 1000.0
+                status[name] = "timeout"
+                dropped.append(name)
+                logger.warning(f"Memory layer '{name}' missed its {budget_s * 1000:.0f} ms budget")
+            except Exception as e:
+                # Gracefully handle database / vector store errors
+                timings[name] = (time.perf_counter() - start) * 1000.0
+                status[name] = "error"
+                dropped.append(name)
+                logger.warning(f"Memory layer '{name}' retrieval failed: {e}")
+            metrics.observe(f"memory.layer.{name}_ms", timings[name])
+            tracer.record(f"memory.{name}", timings[name], start=start, status=status[name])
+            if status[name] in ("timeout", "error"):
+                metrics.increment(f"memory.layer.{name}_{status[name]}")
+
+        now = time.perf_counter()
+        total_ms = (now - start) * 1000.0
+        wait_ms = (now - wait_start) * 1000.0  # Time the caller was actually blocked
+        metrics.observe("memory.context_total_ms", total_ms)
+        metrics.observe("memory.context_wait_ms", wait_ms)
+        context = self.format_context(sections)
+        return {
+            "context": context,
+            "sections": sections,
+            "timings": timings,
+            "status": status,
+            "dropped": dropped,
+            "total_ms": total_ms,
+            "wait_ms": wait_ms,
+        }
+
+    @staticmethod
+    def format_context(sections: Dict[str, str]) -> str:
+        """Join layer bodies under their prompt headers"""
+        return "\n".join(f"{CONTEXT_HEADERS[name]}\n{sections[name]}"
+                         for name in CONTEXT_HEADERS if sections.get(name))
+
+    def get_full_context(self, user_id: int, current_query: str) -> str:
+        """
+        Get comprehensive context from all memory layers
+        
+        Args:
+            user_id: User ID
+            current_query: Current user query
+        
+        Returns:
+            Complete context string for AI prompt
+        """
+        return self.build_context(user_id, current_query)["context"]
 
     def recall_information(self, user_id: int, query: str) -> str:
         """
@@ -0,0 +1,54 @@
+"""
+Offline long-term memory hygiene sweep
+Full scan per user: removes items with duplicate content and raw conversations
+beyond the per-user cap. Writes already enforce both incrementally and pick
+up other processes' writes, so this repairs stores written by older versions
+or outside LongTermMemory, and the rare race of two processes writing the
+same user at the same moment (run it periodically when several processes
+write one store).
+
+Run from the repository root:
+    python -m app.memory.memory_sweep [--user ID ...]
+"""
+
+import argparse
+import logging
+from typing import List
+
+from app.database.crud import ConversationCRUD, UserCRUD
+from app.memory.long_term_memory import LongTermMemory
+
+
+def sweep(long_term: LongTermMemory, user_ids: List[int]) -> dict:
+    """
+    Deduplicate and cap each user's memory
+
+    Returns:
+        Totals: {"duplicates": n, "evicted": n}
+    """
+    totals = {"duplicates": 0, "evicted": 0}
+    for user_id in user_ids:
+        totals["duplicates"] += long_term.deduplicate_by_hash(user_id)
+        totals["evicted"] += long_term.cleanup_old_conversations(
+            user_id, max_conversations=long_term.max_raw_per_user)
+    return totals
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Deduplicate and cap long-term memory (full scan)")
+    parser.add_argument("--storage-path", default="data/vectors", help="Vector store directory")
+    parser.add_argument("--user", type=int, action="append", dest="user_ids", help="Only this user (repeatable)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    long_term = LongTermMemory(args.storage_path)
+    user_ids = args.user_ids or sorted({user.id for user in UserCRUD.get_all_users()}
+                                       | set(ConversationCRUD.get_user_ids_with_conversations()))
+    totals = sweep(long_term, user_ids)
+    print(f"Swept {len(user_ids)} users: removed {totals['duplicates']} duplicates, "
+          f"evicted {totals['evicted']} old conversations")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+"""
+Add epoch timestamps and snippets to long-term memory items written before
+they were stored at write time (retrieval re-ranking reads them instead of
+parsing ISO strings and splitting documents on every query)
+
+Run from the repository root:
+    python -m app.memory.metadata_migration
+"""
+
+import argparse
+import logging
+from typing import List
+
+from app.memory.long_term_memory import PARTITIONINGS, LongTermMemory
+from app.memory.vector_store import VECTOR_BACKENDS
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Add epoch timestamps and snippets to memory items")
+    parser.add_argument("--storage-path", default="data/vectors", help="Vector store directory")
+    parser.add_argument("--partitioning", default=None, choices=PARTITIONINGS,
+                        help="Collection layout (default: CARELY_VECTOR_PARTITIONING)")
+    parser.add_argument("--backend", default=None, choices=VECTOR_BACKENDS,
+                        help="Vector backend (default: CARELY_VECTOR_BACKEND)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    long_term = LongTermMemory(args.storage_path, partitioning=args.partitioning, backend=args.backend)
+    print(f"Updated {long_term.migrate_metadata()} memory items")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Move long-term memory items between vector collection layouts and backends
+Copies every item (with its stored embedding, so nothing is re-embedded) from
+the source layout's collections into the target layout's, grouped by user,
+then drops the source collections.
+
+Run from the repository root:
+    python -m app.memory.partition_migration --to user
+    python -m app.memory.partition_migration --to bucket --buckets 64
+    python -m app.memory.partition_migration --to user --to-backend numpy
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+from app.memory.long_term_memory import PARTITIONINGS, LongTermMemory
+from app.memory.vector_store import VECTOR_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def migrate_partitions(source: LongTermMemory, target: LongTermMemory,
+                       page_size: int = DEFAULT_PAGE_SIZE, keep_source: bool = False) -> int:
+    """
+    Copy all memory items from one layout to another
+
+    Args:
+        source: Long-term memory opened with the current layout
+        target: Long-term memory (same storage path) opened with the new layout
+        page_size: Items read per page
+        keep_source: Leave the source collections in place
+
+    Returns:
+        Number of items copied
+    """
+    if (source.backend, source.partitioning) == (target.backend, target.partitioning):
+        raise ValueError(f"Both layouts are {source.partitioning!r} on {source.backend}; nothing to migrate")
+    copied = 0
+    source_names = source.partition_names()
+    for name in source_names:
+        collection = source._open_collection(name)
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset,
+                                  include=["embeddings", "documents", "metadatas"])
+            ids = page["ids"] if page else []
+            if not ids:
+                break
+            by_user: Dict[str, List[int]] = defaultdict(list)
+            for idx, metadata in enumerate(page["metadatas"]):
+                user_id = (metadata or {}).get("user_id")
+                if user_id is None:
+                    logger.warning(f"Skipping memory item {ids[idx]} without a user_id")
+                    continue
+                by_user[user_id].append(idx)
+            for user_id, rows in by_user.items():
+                target._collection_for(int(user_id)).upsert(
+                    ids=[ids[i] for i in rows],
+                    embeddings=[page["embeddings"][i] for i in rows],
+                    documents=[page["documents"][i] for i in rows],
+                    metadatas=[page["metadatas"][i] for i in rows]
+                )
+                copied += len(rows)
+            offset += len(ids)
+        logger.info(f"Copied collection {name} ({offset} items)")
+
+    if not keep_source:
+        target_names = set(target.partition_names()) if target.backend == source.backend else set()
+        for name in source_names:
+            if name not in target_names:
+                source._drop_collection(name)
+    return copied
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move long-term memory to another collection layout")
+    parser.add_argument("--storage-path", default="data/vectors", help="Vector store directory")
+    parser.add_argument("--from", dest="source", default="shared", choices=PARTITIONINGS,
+                        help="Current layout")
+    parser.add_argument("--to", dest="target", required=True, choices=PARTITIONINGS, help="New layout")
+    parser.add_argument("--buckets", type=int, default=None, help="Collections for the bucket layout")
+    parser.add_argument("--from-backend", default=None, choices=VECTOR_BACKENDS,
+                        help="Current vector backend (default: CARELY_VECTOR_BACKEND)")
+    parser.add_argument("--to-backend", default=None, choices=VECTOR_BACKENDS,
+                        help="New vector backend (default: the current one)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Items read per page")
+    parser.add_argument("--keep-source", action="store_true", help="Do not drop the source collections")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    source = LongTermMemory(args.storage_path, partitioning=args.source, buckets=args.buckets,
+                            backend=args.from_backend)
+    target = LongTermMemory(args.storage_path, partitioning=args.target, buckets=args.buckets,
+                            backend=args.to_backend or source.backend)
+    copied = migrate_partitions(source, target, args.page_size, args.keep_source)
+    print(f"Copied {copied} memory items from the {args.source} layout ({source.backend}) to the "
+          f"{args.target} layout ({target.backend}); set CARELY_VECTOR_PARTITIONING={args.target} "
+          f"and CARELY_VECTOR_BACKEND={target.backend}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -264,7 +264,7 @@ class StructuredMemory:
         if user.preferences:
             try:
                 prefs = json.loads(user.preferences)
-                profile += f"Preferences: {json.dumps(prefs, indent=2)}\n"
+                profile += f"Preferences: {json.dumps(prefs)}\n"  # Compact: saves prompt tokens
             except:
                 pass
         
@@ -0,0 +1,419 @@
+"""
+Vector store backends for long-term memory
+LongTermMemory talks to a VectorStore (named collections with Chroma-style
+upsert / query / get / delete). Two backends:
+- chroma: Chroma persistent client (the original storage)
+- numpy: one directory per collection holding a float16 embedding matrix in a
+  memory-mapped .npy file plus the ids, documents and metadata as JSON; a query
+  is one matrix-vector product. Meant for small per-user collections; safe for
+  several processes (file lock + generation pointer).
+Selected through CARELY_VECTOR_BACKEND (see build_vector_store).
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+from utils.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+VECTOR_BACKENDS = ("chroma", "numpy")
+DEFAULT_VECTOR_BACKEND = os.getenv("CARELY_VECTOR_BACKEND", "chroma").lower()
+
+
+class VectorCollection(Protocol):
+    """A named set of (id, embedding, document, metadata) items"""
+
+    name: str
+
+    def upsert(self, ids: List[str], embeddings: Sequence, documents: List[str] = None,
+               metadatas: List[Dict[str, Any]] = None) -> None: ...
+
+    def query(self, query_embeddings: Sequence, n_results: int = 10,
+              where: Dict[str, Any] = None, include: List[str] = None) -> Dict[str, List]: ...
+
+    def get(self, ids: List[str] = None, where: Dict[str, Any] = None, limit: int = None,
+            offset: int = None, include: List[str] = None) -> Dict[str, List]: ...
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None) -> None: ...
+
+    def count(self) -> int: ...
+
+
+class VectorStore(Protocol):
+    """Named collections (created on first use)"""
+
+    def get_collection(self, name: str) -> VectorCollection: ...
+
+    def delete_collection(self, name: str) -> None: ...
+
+    def list_collections(self) -> List[str]: ...
+
+
+class ChromaStore:
+    """VectorStore over a Chroma persistent client"""
+
+    def __init__(self, path: str, embedding_function: Callable = None):
+        """
+        Args:
+            path: Chroma storage directory
+            embedding_function: Embedding function attached to new collections
+                (None = Chroma's default)
+        """
+        import chromadb
+        from chromadb.config import Settings
+
+        self.embedding_function = embedding_function
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+
+    def get_collection(self, name: str):
+        return self.client.get_or_create_collection(
+            name=name,
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self.embedding_function
+        )
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name)
+
+    def list_collections(self) -> List[str]:
+        return [c if isinstance(c, str) else c.name for c in self.client.list_collections()]
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma metadata filter ($and/$or, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            ok = value == operand
+        elif operator == "$ne":
+            ok = value != operand
+        elif operator == "$in":
+            ok = value in operand
+        elif operator == "$nin":
+            ok = value not in operand
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            ok = {"$gt": value > operand, "$gte": value >= operand,
+                  "$lt": value < operand, "$lte": value <= operand}[operator]
+        else:
+            raise ValueError(f"Unsupported where operator {operator}")
+        if not ok:
+            return False
+    return True
+
+
+class NumpyCollection:
+    """
+    Collection kept as a memory-mapped float16 matrix of unit-length embeddings
+    plus the ids, documents and metadata as JSON. Every write produces a new
+    generation (vectors.<n>.npy + items.<n>.json) and then switches the CURRENT
+    pointer to it, so readers never see a matrix and items that disagree.
+    Writers in any process serialise on a file lock and start from the latest
+    generation; readers reload when CURRENT changes.
+    """
+
+    def __init__(self, name: str, path: str):
+        """
+        Args:
+            name: Collection name
+            path: Directory for the collection files (created if missing)
+        """
+        self.name = name
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None  # (rows, dim) float16, memory-mapped
+        self._generation = 0
+        self._pointer_stat = None  # (inode, mtime) of CURRENT when loaded
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._refresh()
+
+    @property
+    def _pointer_path(self) -> str:
+        return os.path.join(self.path, "CURRENT")
+
+    @property
+    def _lock_path(self) -> str:
+        return os.path.join(self.path, "write.lock")
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors.{generation}.npy")
+
+    def _items_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"items.{generation}.json")
+
+    def _refresh(self):
+        """Reload if another writer (in any process) switched generations"""
+        for attempt in range(3):
+            try:
+                stat = os.stat(self._pointer_path)
+            except FileNotFoundError:
+                if self._pointer_stat is None and self._generation == 0:
+                    self._load_legacy()
+                return
+            key = (stat.st_ino, stat.st_mtime_ns)
+            if key == self._pointer_stat:
+                return
+            try:
+                with open(self._pointer_path) as f:
+                    generation = int(f.read().strip())
+                self._load(generation)
+                self._pointer_stat = key
+                return
+            except FileNotFoundError:
+                # Generation removed under us by a newer write: read CURRENT again
+                continue
+        raise OSError(f"Vector collection {self.name} kept changing while loading")
+
+    def _load(self, generation: int):
+        with open(self._items_path(generation)) as f:
+            items = json.load(f)
+        vectors = np.load(self._vectors_path(generation), mmap_mode="r") if items["ids"] else None
+        self._ids = items["ids"]
+        self._documents = items["documents"]
+        self._metadatas = items["metadatas"]
+        self._vectors = vectors
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._generation = generation
+
+    def _load_legacy(self):
+        """Single vectors.npy + items.json written before generations"""
+        items_path = os.path.join(self.path, "items.json")
+        if not os.path.exists(items_path):
+            return
+        with open(items_path) as f:
+            items = json.load(f)
+        self._ids = items["ids"]
+        self._documents = items["documents"]
+        self._metadatas = items["metadatas"]
+        if self._ids:
+            self._vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+            if len(self._vectors) != len(self._ids):
+                # Interrupted write of the old layout: keep the rows both files agree on
+                logger.warning(f"Vector collection {self.name} has {len(self._vectors)} vectors "
+                               f"for {len(self._ids)} items, truncating")
+                rows = min(len(self._vectors), len(self._ids))
+                del self._ids[rows:], self._documents[rows:], self._metadatas[rows:]
+                self._vectors = self._vectors[:rows]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def _save(self, vectors: Optional[np.ndarray]):
+        """Write the matrix and items as the next generation, then point CURRENT at it"""
+        generation = self._generation + 1
+        if self._ids:
+            np.save(self._vectors_path(generation), vectors)
+        with open(self._items_path(generation), "w") as f:
+            json.dump({"ids": self._ids, "documents": self._documents,
+                       "metadatas": self._metadatas}, f)
+        tmp_pointer = f"{self._pointer_path}.tmp"
+        with open(tmp_pointer, "w") as f:
+            f.write(str(generation))
+        os.replace(tmp_pointer, self._pointer_path)
+        stat = os.stat(self._pointer_path)
+        self._pointer_stat = (stat.st_ino, stat.st_mtime_ns)
+        self._generation = generation
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._vectors = np.load(self._vectors_path(generation), mmap_mode="r") if self._ids else None
+        # Keep the previous generation for readers that just read CURRENT
+        for name in os.listdir(self.path):
+            parts = name.split(".")
+            if (len(parts) == 3 and parts[0] in ("vectors", "items") and parts[1].isdigit()
+                    and int(parts[1]) < generation - 1) or name in ("vectors.npy", "items.json"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _normalize(embeddings: Sequence) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def upsert(self, ids: List[str], embeddings: Sequence, documents: List[str] = None,
+               metadatas: List[Dict[str, Any]] = None):
+        fresh = self._normalize(embeddings).astype(np.float16)
+        if len(fresh) != len(ids):
+            raise ValueError(f"Got {len(fresh)} embeddings for {len(ids)} ids")
+        with self._lock, file_lock(self._lock_path):
+            self._refresh()
+            if self._vectors is not None and fresh.shape[1] != self._vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {fresh.shape[1]} does not match collection "
+                                 f"{self.name} dimension {self._vectors.shape[1]}")
+            vectors = np.array(self._vectors) if self._vectors is not None else fresh[:0]
+            appended = []
+            for i, doc_id in enumerate(ids):
+                document = documents[i] if documents else None
+                metadata = metadatas[i] if metadatas else None
+                row = self._rows.get(doc_id)
+                if row is None:
+                    self._rows[doc_id] = len(self._ids)
+                    self._ids.append(doc_id)
+                    self._documents.append(document)
+                    self._metadatas.append(metadata)
+                    appended.append(i)
+                else:
+                    vectors[row] = fresh[i]
+                    self._documents[row] = document
+                    self._metadatas[row] = metadata
+            if appended:
+                vectors = np.concatenate([vectors, fresh[appended]])
+            self._save(vectors)
+
+    def _select(self, ids: List[str] = None, where: Dict[str, Any] = None) -> List[int]:
+        if ids is not None:
+            rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        else:
+            rows = range(len(self._ids))
+        return [row for row in rows if matches_where(self._metadatas[row] or {}, where)]
+
+    def query(self, query_embeddings: Sequence, n_results: int = 10,
+              where: Dict[str, Any] = None, include: List[str] = None) -> Dict[str, List]:
+        include = include or ["documents", "metadatas", "distances"]
+        queries = self._normalize(query_embeddings)
+        result = {"ids": []}
+        for key in include:
+            result[key] = []
+        with self._lock:
+            self._refresh()
+            rows = np.array(self._select(where=where) if where else range(len(self._ids)), dtype=np.intp)
+            vectors = self._vectors
+            for query in queries:
+                if vectors is None or not len(rows):
+                    top, distances = rows[:0], np.zeros(0, dtype=np.float32)
+                else:
+                    # Cosine distance of unit vectors: one matrix-vector product
+                    candidates = vectors if len(rows) == len(vectors) else vectors[rows]
+                    distances = 1.0 - candidates.astype(np.float32) @ query
+                    k = min(n_results, len(rows))
+                    best = np.argpartition(distances, k - 1)[:k]
+                    best = best[np.argsort(distances[best])]
+                    top, distances = rows[best], distances[best]
+                result["ids"].append([self._ids[row] for row in top])
+                if "documents" in include:
+                    result["documents"].append([self._documents[row] for row in top])
+                if "metadatas" in include:
+                    result["metadatas"].append([self._metadatas[row] for row in top])
+                if "distances" in include:
+                    result["distances"].append(distances.tolist())
+                if "embeddings" in include:
+                    result["embeddings"].append([np.asarray(vectors[row], dtype=np.float32) for row in top])
+        return result
+
+    def get(self, ids: List[str] = None, where: Dict[str, Any] = None, limit: int = None,
+            offset: int = None, include: List[str] = None) -> Dict[str, List]:
+        include = include or ["documents", "metadatas"]
+        with self._lock:
+            self._refresh()
+            rows = self._select(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            result = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = [np.asarray(self._vectors[row], dtype=np.float32) for row in rows]
+        return result
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None):
+        with self._lock, file_lock(self._lock_path):
+            self._refresh()
+            doomed = set(self._select(ids, where))
+            if not doomed:
+                return
+            keep = [row for row in range(len(self._ids)) if row not in doomed]
+            vectors = np.array(self._vectors[keep]) if keep else None
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._save(vectors)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    def version(self) -> int:
+        """Generation on disk; changes with every write from any process"""
+        with self._lock:
+            self._refresh()
+            return self._generation
+
+
+class NumpyStore:
+    """VectorStore keeping each collection in its own directory under path"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Root directory of the collections
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        return NumpyCollection(name, os.path.join(self.path, name))
+
+    def delete_collection(self, name: str):
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def list_collections(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.path)
+                      if os.path.isdir(os.path.join(self.path, name)))
+
+
+def build_vector_store(backend: str, path: str, embedding_function: Callable = None):
+    """
+    Vector store for a backend name
+
+    Args:
+        backend: One of VECTOR_BACKENDS
+        path: Storage directory (the numpy backend uses <path>/numpy)
+        embedding_function: Embedding function for Chroma collections
+
+    Returns:
+        The store
+    """
+    if backend == "chroma":
+        return ChromaStore(path, embedding_function)
+    if backend == "numpy":
+        return NumpyStore(os.path.join(path, "numpy"))
+    raise ValueError(f"Unknown vector backend {backend!r}, expected one of {VECTOR_BACKENDS}")
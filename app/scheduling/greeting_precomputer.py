@@ -0,0 +1,175 @@
+"""
+Low-priority background worker for chat-page greetings
+One thread, separate from the write-behind workers, that generates each
+user's greeting shortly before it can be shown. Requests are kept per user
+(a newer request replaces the pending one), throttled by their own token
+bucket and held back while the shared LLM rate limit is running low, so
+greeting work never competes with live chat. A job that fails (LLM error or
+open breaker) is tried again later unless a newer one replaced it.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.llm_gateway import TokenBucket, get_llm_gateway
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_MINUTE = float(os.getenv("CARELY_GREETING_PRECOMPUTE_PER_MINUTE", "4"))
+# Fraction of the shared LLM burst that must be free before a greeting runs
+DEFAULT_HEADROOM = float(os.getenv("CARELY_GREETING_PRECOMPUTE_HEADROOM", "0.5"))
+# Seconds between checks while the LLM rate limit is busy
+IDLE_POLL_S = 1.0
+# Runs per job before giving up, and the first retry delay (doubled per retry)
+MAX_ATTEMPTS = 3
+RETRY_DELAY_S = 300.0
+
+
+class GreetingPrecomputer:
+    """Per-user greeting jobs run one at a time at their due time, lowest priority"""
+
+    def __init__(self, per_minute: float = None, headroom: float = None, gateway=None,
+                 autostart: bool = True):
+        """
+        Args:
+            per_minute: Greeting generations allowed per minute
+                (default: CARELY_GREETING_PRECOMPUTE_PER_MINUTE or 4)
+            headroom: Share of the LLM gateway's burst that must be unused
+                before a job runs (default: CARELY_GREETING_PRECOMPUTE_HEADROOM)
+            gateway: LLM gateway to yield to (default: the shared gateway)
+            autostart: Start the worker thread on the first submit (off:
+                call run_due)
+        """
+        rate = DEFAULT_PER_MINUTE if per_minute is None else per_minute
+        self._bucket = TokenBucket(rate / 60.0, 1) if rate > 0 else None
+        self.headroom = DEFAULT_HEADROOM if headroom is None else headroom
+        self._gateway = gateway
+        self.autostart = autostart
+        # user id -> (due time, job, attempts so far); the heap may hold stale entries
+        self._jobs: Dict[int, Tuple[float, Callable[[], object], int]] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def gateway(self):
+        return self._gateway if self._gateway is not None else get_llm_gateway()
+
+    def submit(self, user_id: int, job: Callable[[], object], due: float = None):
+        """
+        Schedule a user's greeting job, replacing any pending one
+
+        Args:
+            user_id: User the greeting is for
+            job: Generates and stores the greeting
+            due: time.time() at which to run (default: now)
+        """
+        with self._condition:
+            self._schedule(user_id, job, time.time() if due is None else due, 0)
+        metrics.increment("greeting.precompute_submitted")
+        if self.autostart:
+            self.start()
+
+    def _schedule(self, user_id: int, job: Callable[[], object], due: float, attempts: int):
+        """Caller holds the condition"""
+        self._jobs[user_id] = (due, job, attempts)
+        heapq.heappush(self._heap, (due, user_id))
+        self._condition.notify()
+
+    def cancel(self, user_id: int):
+        with self._condition:
+            self._jobs.pop(user_id, None)
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._jobs)
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, daemon=True,
+                                                name="carely-greeting-precompute")
+                self._thread.start()
+
+    def _pop_due(self) -> Tuple[Optional[Tuple[int, Callable[[], object], int]], Optional[float]]:
+        """(user id, job, attempts) of the earliest due job, else (None, seconds until the next one)"""
+        while self._heap:
+            due, user_id = self._heap[0]
+            if self._jobs.get(user_id, (None,))[0] != due:
+                heapq.heappop(self._heap)  # Replaced or cancelled
+                continue
+            wait_s = due - time.time()
+            if wait_s > 0:
+                return None, wait_s
+            heapq.heappop(self._heap)
+            _, job, attempts = self._jobs.pop(user_id)
+            return (user_id, job, attempts), None
+        return None, None
+
+    def _wait_for_capacity(self):
+        """Block while live traffic needs the LLM rate limit, then take a greeting token"""
+        while True:
+            has_headroom = getattr(self.gateway, "has_headroom", None)
+            if has_headroom is None or has_headroom(self.headroom):
+                break
+            metrics.increment("greeting.precompute_yielded")
+            time.sleep(IDLE_POLL_S)
+        if self._bucket is not None:
+            self._bucket.acquire(float("inf"))
+
+    def _run(self, user_id: int, job: Callable[[], object], attempts: int):
+        self._wait_for_capacity()
+        try:
+            job()
+            metrics.increment("greeting.precompute_ran")
+        except Exception as e:
+            attempts += 1
+            logger.warning(f"Greeting precompute failed for user {user_id} "
+                           f"(attempt {attempts}): {e}")
+            if attempts >= MAX_ATTEMPTS:
+                return
+            with self._condition:
+                if user_id not in self._jobs:  # Not replaced by a newer request
+                    self._schedule(user_id, job, time.time() + RETRY_DELAY_S * 2 ** (attempts - 1),
+                                   attempts)
+                    metrics.increment("greeting.precompute_retried")
+
+    def run_due(self) -> int:
+        """Run every job that is due now on the calling thread; returns how many ran"""
+        ran = 0
+        while True:
+            with self._condition:
+                item, _ = self._pop_due()
+            if item is None:
+                return ran
+            self._run(*item)
+            ran += 1
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                item, wait_s = self._pop_due()
+                if item is None:
+                    self._condition.wait(wait_s)
+                    continue
+            self._run(*item)
+
+
+# Global instance for easy access
+_precomputer: Optional[GreetingPrecomputer] = None
+_precomputer_lock = threading.Lock()
+
+
+def get_greeting_precomputer() -> GreetingPrecomputer:
+    """Get singleton greeting precomputer (thread-safe)"""
+    global _precomputer
+    if _precomputer is None:
+        with _precomputer_lock:
+            if _precomputer is None:
+                _precomputer = GreetingPrecomputer()
+    return _precomputer
@@ -0,0 +1,315 @@
+"""
+Durable write-behind queue for post-response work
+Jobs are written to the PostProcessingJob table before they are queued, then run
+on background workers (users are sharded across workers so each user's jobs stay
+in order) with retry and backoff. A failed job waits for its retry time without
+holding up other users of the shard; the user's later jobs wait behind it.
+Unfinished jobs are replayed on startup, retries at their saved time.
+"""
+
+import heapq
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text, update
+from sqlmodel import SQLModel, select
+
+from app.database.models import PostProcessingJob, engine, get_session
+from utils.metrics import metrics
+from utils.timezone_utils import now_central, to_central
+
+logger = logging.getLogger(__name__)
+
+# handler(user_id, payload) -> optional result; raising schedules a retry
+Handler = Callable[[int, Dict[str, Any]], Any]
+
+# Jobs left "running" longer than this are assumed to belong to a dead process
+STALE_RUNNING_AFTER = timedelta(minutes=10)
+
+
+class PostProcessingQueue:
+    """In-process worker pool backed by a SQLite job table"""
+
+    def __init__(self, num_workers: int = None, max_attempts: int = None,
+                 retry_backoff_s: float = 0.5, max_backoff_s: float = 30.0):
+        """
+        Initialize the queue (workers start on start())
+
+        Args:
+            num_workers: Worker threads / user shards
+                (default: CARELY_POST_PROCESSING_WORKERS or 2)
+            max_attempts: Attempts before a job is marked failed
+                (default: CARELY_POST_PROCESSING_MAX_ATTEMPTS or 5)
+            retry_backoff_s: First retry delay, doubled per attempt
+            max_backoff_s: Upper bound for the retry delay
+        """
+        self.num_workers = num_workers or int(os.getenv("CARELY_POST_PROCESSING_WORKERS", "2"))
+        self.max_attempts = max_attempts or int(os.getenv("CARELY_POST_PROCESSING_MAX_ATTEMPTS", "5"))
+        self.retry_backoff_s = retry_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.handlers: Dict[str, Handler] = {}
+        # (job id, user id, retry time as time.time() or None) per worker
+        self._queues: List[queue.Queue] = [queue.Queue() for _ in range(self.num_workers)]
+        self._pending: Dict[int, float] = {}  # job id -> enqueue time (perf_counter)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._started = False
+
+    def register(self, job_type: str, handler: Handler):
+        """Register (or replace) the handler for a job type"""
+        self.handlers[job_type] = handler
+
+    def start(self):
+        """Create the job table, replay unfinished jobs and start the workers"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        SQLModel.metadata.create_all(engine, tables=[PostProcessingJob.__table__])
+        self._add_missing_columns()
+        self._recover()
+        for index in range(self.num_workers):
+            worker = threading.Thread(target=self._worker, args=(index,),
+                                      name=f"carely-post-processing-{index}", daemon=True)
+            worker.start()
+
+    def enqueue(self, job_type: str, user_id: int, payload: Dict[str, Any]) -> int:
+        """
+        Persist a job and hand it to the worker that owns this user
+
+        Args:
+            job_type: Registered job type
+            user_id: User the job belongs to (decides ordering shard)
+            payload: JSON-serialisable job arguments
+
+        Returns:
+            Job ID
+        """
+        self.start()
+        with get_session() as session:
+            job = PostProcessingJob(user_id=user_id, job_type=job_type,
+                                    payload=json.dumps(payload, default=str))
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            job_id = job.id
+        self._dispatch(job_id, user_id)
+        metrics.increment(f"post_processing.enqueued.{job_type}")
+        return job_id
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Block until every queued job has been processed (including retries)
+
+        Returns:
+            False if the timeout passed first
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """Current queue depth and age of the oldest unprocessed job"""
+        with self._lock:
+            depth = len(self._pending)
+            oldest = min(self._pending.values()) if self._pending else None
+        lag_ms = (time.perf_counter() - oldest) * 1000.0 if oldest is not None else 0.0
+        return {"depth": depth, "lag_ms": lag_ms}
+
+    def _update_gauges(self):
+        stats = self.stats()
+        metrics.set_gauge("post_processing.queue_depth", stats["depth"])
+        metrics.set_gauge("post_processing.lag_ms", stats["lag_ms"])
+
+    def _dispatch(self, job_id: int, user_id: int, retry_at: float = None):
+        with self._lock:
+            self._pending[job_id] = time.perf_counter()
+        self._queues[user_id % self.num_workers].put((job_id, user_id, retry_at))
+        self._update_gauges()
+
+    def _done(self, job_id: int):
+        with self._idle:
+            self._pending.pop(job_id, None)
+            self._idle.notify_all()
+        self._update_gauges()
+
+    @staticmethod
+    def _add_missing_columns():
+        """Columns added after the job table was first created"""
+        columns = {column["name"] for column in inspect(engine).get_columns(PostProcessingJob.__tablename__)}
+        if "next_attempt_at" not in columns:
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {PostProcessingJob.__tablename__} "
+                                        "ADD COLUMN next_attempt_at DATETIME"))
+
+    def _recover(self):
+        """Queue jobs a previous run did not finish, oldest first"""
+        now = now_central()
+        stale_before = now - STALE_RUNNING_AFTER
+        with get_session() as session:
+            jobs = session.exec(
+                select(PostProcessingJob)
+                .where(PostProcessingJob.status.in_(["pending", "running"]))
+                .order_by(PostProcessingJob.id)
+            ).all()
+            recovered = []
+            for job in jobs:
+                if job.status == "running":
+                    # Only take over jobs whose worker is long gone
+                    claimed_at = to_central(job.claimed_at) if job.claimed_at else None
+                    if claimed_at and claimed_at > stale_before:
+                        continue
+                    job.status = "pending"
+                    session.add(job)
+                retry_at = None
+                if job.next_attempt_at:
+                    # Keep the remaining backoff of a retry the last run had scheduled
+                    retry_at = time.time() + (to_central(job.next_attempt_at) - now).total_seconds()
+                recovered.append((job.id, job.user_id, retry_at))
+            session.commit()
+        for job_id, user_id, retry_at in recovered:
+            self._dispatch(job_id, user_id, retry_at)
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} unfinished post-processing jobs")
+
+    def _worker(self, index: int):
+        jobs = self._queues[index]
+        retries: List[Tuple[float, int, int]] = []  # (retry time, job id, user id)
+        # user id -> later jobs held back while an earlier one waits for its retry
+        waiting: Dict[int, Deque[int]] = {}
+        while True:
+            if retries and retries[0][0] <= time.time():
+                # Due retries first, so a busy shard cannot starve them
+                _, job_id, user_id = heapq.heappop(retries)
+            else:
+                timeout = max(0.0, retries[0][0] - time.time()) if retries else None
+                try:
+                    job_id, user_id, retry_at = jobs.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                if user_id in waiting:
+                    waiting[user_id].append(job_id)
+                    continue
+                if retry_at is not None and retry_at > time.time():
+                    waiting[user_id] = deque()
+                    heapq.heappush(retries, (retry_at, job_id, user_id))
+                    continue
+
+            # Run the job, then whatever of this user's jobs queued up behind it
+            backlog = waiting.pop(user_id, deque())
+            while True:
+                delay_s = self._execute(index, job_id)
+                if delay_s is not None:
+                    waiting[user_id] = backlog
+                    heapq.heappush(retries, (time.time() + delay_s, job_id, user_id))
+                    break
+                if not backlog:
+                    break
+                job_id = backlog.popleft()
+
+    def _execute(self, index: int, job_id: int) -> Optional[float]:
+        """Run a job once; returns the retry delay if it must run again, else None"""
+        try:
+            delay_s = self._run(job_id)
+        except Exception as e:
+            logger.error(f"Post-processing worker {index} failed on job {job_id}: {e}")
+            delay_s = None
+        if delay_s is None:
+            self._done(job_id)
+        return delay_s
+
+    def _claim(self, job_id: int) -> Optional[PostProcessingJob]:
+        """Atomically mark a pending job as running (None if someone else owns it)"""
+        with get_session() as session:
+            claimed = session.execute(
+                update(PostProcessingJob)
+                .where(PostProcessingJob.id == job_id, PostProcessingJob.status == "pending")
+                .values(status="running", attempts=PostProcessingJob.attempts + 1,
+                        claimed_at=now_central())
+            ).rowcount
+            session.commit()
+            if not claimed:
+                return None
+            job = session.get(PostProcessingJob, job_id)
+            session.expunge(job)
+            return job
+
+    def _finish(self, job_id: int, error: str = None, failed: bool = False,
+                retry_in_s: float = None):
+        with get_session() as session:
+            job = session.get(PostProcessingJob, job_id)
+            if job is None:
+                return
+            if error is None:
+                session.delete(job)
+            else:
+                job.status = "failed" if failed else "pending"
+                job.last_error = error[:500]
+                job.next_attempt_at = (now_central() + timedelta(seconds=retry_in_s)
+                                       if retry_in_s is not None else None)
+                session.add(job)
+            session.commit()
+
+    def _run(self, job_id: int) -> Optional[float]:
+        """
+        Claim and run a job once
+
+        Returns:
+            Seconds until the job should be retried, or None when it is done
+            (processed, failed for good, or owned by another worker)
+        """
+        with self._lock:
+            enqueued = self._pending.get(job_id)
+        if enqueued is not None:
+            metrics.observe("post_processing.lag_ms", (time.perf_counter() - enqueued) * 1000.0)
+
+        job = self._claim(job_id)
+        if job is None:
+            return None
+        handler = self.handlers.get(job.job_type)
+        if handler is None:
+            self._finish(job_id, error=f"No handler for {job.job_type}", failed=True)
+            metrics.increment("post_processing.failed")
+            return None
+
+        start = time.perf_counter()
+        try:
+            handler(job.user_id, json.loads(job.payload))
+        except Exception as e:
+            if job.attempts >= self.max_attempts:
+                self._finish(job_id, error=str(e), failed=True)
+                metrics.increment("post_processing.failed")
+                logger.error(f"Post-processing job {job_id} ({job.job_type}) failed "
+                             f"after {job.attempts} attempts: {e}")
+                return None
+            delay_s = min(self.max_backoff_s, self.retry_backoff_s * 2 ** (job.attempts - 1))
+            self._finish(job_id, error=str(e), retry_in_s=delay_s)
+            metrics.increment("post_processing.retries")
+            return delay_s
+
+        self._finish(job_id)
+        metrics.observe(f"post_processing.{job.job_type}_ms", (time.perf_counter() - start) * 1000.0)
+        metrics.increment("post_processing.processed")
+        return None
+
+
+# Global instance for easy access
+_queue: Optional[PostProcessingQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_post_processing_queue() -> PostProcessingQueue:
+    """Get singleton post-processing queue (thread-safe)"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = PostProcessingQueue()
+    return _queue
@@ -11,7 +11,6 @@ from app.database.crud import (
     CaregiverAlertCRUD, UserCRUD, PersonalEventCRUD
 )
 from app.agents.companion_agent import CompanionAgent
-from app.memory.memory_manager import MemoryManager
 from utils.timezone_utils import now_central, CENTRAL_TZ, to_central
 
 # Setup logging
@@ -22,7 +21,7 @@ class ReminderScheduler:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
         self.companion_agent = CompanionAgent()
-        self.memory_manager = MemoryManager()
+        self.memory_manager = self.companion_agent.memory_manager  # Same memory layers
         self.is_running = False
     
     def start(self):
@@ -244,6 +243,7 @@ class ReminderScheduler:
                 )
             
             logger.info(f"Morning check-in completed for {len(users)} users")
+            self.precompute_greetings(users)
             
         except Exception as e:
             logger.error(f"Morning check-in failed: {e}")
@@ -265,6 +265,7 @@ class ReminderScheduler:
                 )
             
             logger.info(f"Afternoon check-in completed for {len(users)} users")
+            self.precompute_greetings(users)
             
         except Exception as e:
             logger.error(f"Afternoon check-in failed: {e}")
@@ -286,10 +287,21 @@ class ReminderScheduler:
                 )
             
             logger.info(f"Evening check-in completed for {len(users)} users")
+            self.precompute_greetings(users)
             
         except Exception as e:
             logger.error(f"Evening check-in failed: {e}")
     
+    def precompute_greetings(self, users):
+        """
+        Queue each user's chat-page greeting for the new time-of-day slot so
+        opening chat never waits on the LLM; the greeting worker runs them
+        rate-limited, behind live chat
+        """
+        for user in users:
+            self.companion_agent.queue_greeting_precompute(user.id)
+        logger.info(f"Queued greeting precompute for {len(users)} users")
+    
     def medication_reminder(self, user_id: int, medication_id: int):
         """Send medication reminder to specific user"""
         try:
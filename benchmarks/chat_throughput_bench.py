@@ -0,0 +1,79 @@
+"""
+Benchmark: end-to-end chat throughput without a network
+Drives concurrent CompanionAgent.generate_response turns through the shared
+LLM gateway with an offline backend (synthetic by default; set
+CARELY_LLM_BACKEND=replay and CARELY_LLM_CASSETTE to replay a recording)
+
+Run from the repository root:
+    python -m benchmarks.chat_throughput_bench
+"""
+
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before the gateway module is imported
+os.environ.setdefault("CARELY_LLM_BACKEND", "synthetic")
+os.environ.setdefault("CARELY_LLM_SYNTHETIC_SEED", "13")
+
+from benchmarks.common import isolated_workdir, percentile, simulate_memory_latency
+
+MESSAGES = [
+    "Good morning, I slept pretty well last night",
+    "My daughter is visiting this weekend, I'm so happy",
+    "I feel a bit lonely this afternoon",
+    "Tell me a story about the old days on the farm",
+    "Did I take my Lisinopril today?",
+    "I just took my metformin with lunch",
+    "The weather is nice, I might go for a walk in the garden",
+    "What should I cook for dinner tonight?",
+]
+
+
+def worker(agent, user_id: int, turns: int, offset: int):
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        agent.generate_response(user_id, MESSAGES[(offset + i) % len(MESSAGES)])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def main(turns_per_user: int = 8, concurrency_levels=(1, 4, 8)):
+    isolated_workdir()
+
+    from app.agents.companion_agent import CompanionAgent
+    from app.database.crud import MedicationCRUD, UserCRUD
+    from utils.llm_gateway import get_llm_gateway
+    from utils.metrics import metrics
+
+    users = []
+    for n in range(max(concurrency_levels)):
+        user = UserCRUD.create_user(name=f"Benchmark User {n}")
+        MedicationCRUD.create_medication(user.id, "Lisinopril", "10mg", "daily", ["09:00"])
+        MedicationCRUD.create_medication(user.id, "Metformin", "500mg", "twice daily", ["08:00", "20:00"])
+        users.append(user.id)
+
+    agent = CompanionAgent()
+    simulate_memory_latency(agent.memory_manager, {"profile": 5, "recent": 10, "similar": 40})
+    backend = get_llm_gateway().client
+    print(f"LLM backend: {os.environ['CARELY_LLM_BACKEND']} ({type(backend).__name__})")
+
+    for concurrency in concurrency_levels:
+        agent.response_cache.clear()
+        metrics.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(worker, agent, users[n], turns_per_user, n)
+                       for n in range(concurrency)]
+            latencies = [ms for future in futures for ms in future.result()]
+        elapsed = time.perf_counter() - start
+        llm_calls = metrics.snapshot()["counters"].get("llm.requests", 0)
+        print(f"  {concurrency:2d} users  {len(latencies) / elapsed:6.2f} turns/s   "
+              f"p50 {percentile(latencies, 50):7.1f} ms   p95 {percentile(latencies, 95):7.1f} ms   "
+              f"mean {statistics.mean(latencies):7.1f} ms   LLM calls/turn {llm_calls / len(latencies):4.2f}")
+
+
+if __name__ == "__main__":
+    main()
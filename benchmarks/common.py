@@ -0,0 +1,145 @@
+"""
+Shared helpers for agent-level benchmarks
+A fake Groq client with injected latency and an isolated working directory so
+benchmark turns never touch the real carely.db or data/vectors
+"""
+
+import os
+import json
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+
+class LatencyLLM:
+    """
+    Stand-in for `Groq().chat.completions` that sleeps for a fixed latency and
+    answers each call type (intent, verbosity, chat) with a canned reply
+    """
+
+    def __init__(self, latency_ms: float = 400.0, intent: str = "general_chat",
+                 reply: str = "That sounds lovely. Tell me more about it.",
+                 latencies_ms: Optional[Dict[str, float]] = None,
+                 medication_id: Optional[int] = None):
+        """
+        Args:
+            latency_ms: Default latency applied to every call
+            intent: Intent label returned by the intent classifier prompt
+            reply: Text returned for the main chat completion
+            latencies_ms: Optional per-call-type latency override
+                (keys: intent, verbosity, medication, medication_turn, chat)
+            medication_id: Medication the extraction prompts match
+        """
+        self.latency_ms = latency_ms
+        self.latencies_ms = latencies_ms or {}
+        self.intent = intent
+        self.reply = reply
+        self.medication_id = medication_id
+        self.first_token_fraction = 0.25
+        self.calls: List[str] = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @staticmethod
+    def classify(messages: List[Dict[str, str]]) -> str:
+        """Infer which agent call a request belongs to from its prompt"""
+        prompt = messages[-1]["content"]
+        if "determine their intent" in prompt and "medication_id" in prompt:
+            return "medication_turn"
+        if "determine their intent" in prompt:
+            return "intent"
+        if "response detail level" in prompt:
+            return "verbosity"
+        if "medication" in messages[0]["content"].lower() and "JSON" in prompt:
+            return "medication"
+        return "chat"
+
+    def _content(self, call_type: str) -> str:
+        if call_type == "intent":
+            return json.dumps({"type": self.intent, "confidence": 0.9, "reasoning": "benchmark"})
+        if call_type == "verbosity":
+            return json.dumps({"verbosity": "SHORT"})
+        if call_type == "medication":
+            return json.dumps({"medication_id": self.medication_id, "medication_name": None,
+                               "notes": "", "confidence": 0.9 if self.medication_id else 0.0})
+        if call_type == "medication_turn":
+            return json.dumps({"type": self.intent, "confidence": 0.9, "reasoning": "benchmark",
+                               "medication_id": self.medication_id, "medication_name": None,
+                               "notes": "", "medication_confidence": 0.9,
+                               "reply": self.reply if self.intent == "ask_medication" else ""})
+        return self.reply
+
+    def create(self, model: str = None, messages: List[Dict[str, str]] = None,
+               stream: bool = False, **kwargs):
+        call_type = self.classify(messages)
+        with self._lock:
+            self.calls.append(call_type)
+        latency_s = self.latencies_ms.get(call_type, self.latency_ms) / 1000.0
+        if stream:
+            return self._stream(self._content(call_type), latency_s)
+        time.sleep(latency_s)
+        message = SimpleNamespace(content=self._content(call_type), role="assistant")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message, finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+        )
+
+    def _stream(self, content: str, latency_s: float):
+        """Word-by-word chunks; first token after a quarter of the latency"""
+        words = content.split(" ")
+        time.sleep(latency_s * self.first_token_fraction)
+        per_word = latency_s * (1 - self.first_token_fraction) / max(1, len(words))
+        for index, word in enumerate(words):
+            if index:
+                time.sleep(per_word)
+            delta = SimpleNamespace(content=word if index == 0 else " " + word)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+def isolated_workdir() -> str:
+    """
+    Switch to a fresh temporary directory and create the database tables there.
+    carely.db and data/vectors are relative paths, so this keeps the benchmark
+    away from real user data. Call before constructing agents.
+    """
+    workdir = tempfile.mkdtemp(prefix="carely-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    from app.database.models import create_tables
+    create_tables()
+    return workdir
+
+
+def with_latency(fetch: Callable, latency_ms: float) -> Callable:
+    """Wrap a memory layer fetch so it takes at least `latency_ms`"""
+    def delayed(user_id: int, current_query: str) -> str:
+        start = time.perf_counter()
+        result = fetch(user_id, current_query) if fetch else ""
+        remaining = latency_ms / 1000.0 - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        return result
+    return delayed
+
+
+def simulate_memory_latency(memory_manager, latencies_ms: Dict[str, float]):
+    """
+    Give each memory layer a realistic retrieval latency. The vector layer is
+    replaced outright (embedding models are not available offline) and the
+    vector write path is disabled.
+    """
+    memory_manager._fetch_profile_layer = with_latency(
+        memory_manager._fetch_profile_layer, latencies_ms.get("profile", 0))
+    memory_manager._fetch_recent_layer = with_latency(
+        memory_manager._fetch_recent_layer, latencies_ms.get("recent", 0))
+    memory_manager._fetch_similar_layer = with_latency(None, latencies_ms.get("similar", 0))
+    memory_manager.add_conversation = lambda *args, **kwargs: None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark: per-message keyword routing cost
+Compares the legacy per-table `any(k in message_lower ...)` scans done on every
+chat turn with the compiled single-pass IntentRouter
+
+Run from the repository root:
+    python -m benchmarks.intent_router_bench
+"""
+
+import timeit
+
+from app.agents.intent_router import KEYWORD_TABLES, IntentRouter
+
+# Realistic senior chat messages (mix of fast-path, medication, mood and chit-chat)
+CORPUS = [
+    "Good morning Carely, I slept pretty well last night",
+    "What time is it?",
+    "When should I take my next blood pressure pill?",
+    "I just took my Lisinopril with breakfast",
+    "Did I take my metformin this morning?",
+    "What did we talk about yesterday?",
+    "When is my doctor appointment with Dr. Patel?",
+    "I'm feeling a little dizzy and lightheaded today",
+    "I have chest pain and I can't breathe, please help",
+    "My daughter Sarah is visiting this weekend, I'm so happy",
+    "I'm bored, there's nothing to do today",
+    "Can you play some calming music for me?",
+    "Do you remember what I had for lunch?",
+    "Tell me a story about the old days on the farm",
+    "I feel lonely since my husband passed away",
+    "What is the date today?",
+    "Can you help me write a letter to my grandson?",
+    "I fell and hit my head on the kitchen counter",
+    "The weather is nice, I might go for a walk in the garden",
+    "Explain step by step how to use the video call on my tablet",
+]
+
+
+def legacy_scan(user_message: str) -> int:
+    """Reproduce the scans one generate_response turn used to perform"""
+    hits = 0
+    message_lower = user_message.lower()
+    # Fast paths in generate_response
+    for name in ("medication_timing", "datetime_query", "time_query", "medication_word",
+                 "date_query", "what_time_is_it", "yesterday", "talk", "event_mention",
+                 "event_question"):
+        hits += any(k in message_lower for k in KEYWORD_TABLES[name])
+    hits += any(k in user_message.lower() for k in KEYWORD_TABLES["memory_query"])
+    # _local_sentiment_analysis
+    text_lower = user_message.lower()
+    for name in ("sentiment_positive", "sentiment_negative", "sentiment_concern"):
+        hits += sum(1 for k in KEYWORD_TABLES[name] if k in text_lower)
+    for name in ("emotion_discomfort", "emotion_loneliness", "emotion_contentment"):
+        hits += any(k in text_lower for k in KEYWORD_TABLES[name])
+    # _local_emergency_detection
+    message_lower = user_message.lower()
+    for name in ("non_emergency_help", "help_request", "critical_symptom", "high_symptom",
+                 "medium_symptom", "emergency_context"):
+        hits += any(k in message_lower for k in KEYWORD_TABLES[name])
+    # should_alert_caregiver
+    hits += any(k in user_message.lower() for k in KEYWORD_TABLES["caregiver_concern"])
+    # determine_quick_actions
+    message_lower = user_message.lower()
+    for name in ("quick_medication", "quick_bored", "quick_music"):
+        hits += any(k in message_lower for k in KEYWORD_TABLES[name])
+    return hits
+
+
+def router_scan(router: IntentRouter, user_message: str) -> int:
+    """Single routing pass plus the same per-category lookups"""
+    route = router.match(user_message)
+    return len(route.categories)
+
+
+def main(repeat: int = 5, number: int = 2000):
+    compile_start = timeit.default_timer()
+    router = IntentRouter(KEYWORD_TABLES)
+    compile_ms = (timeit.default_timer() - compile_start) * 1000
+
+    def run_legacy():
+        for message in CORPUS:
+            legacy_scan(message)
+
+    def run_router():
+        for message in CORPUS:
+            router_scan(router, message)
+
+    legacy = min(timeit.repeat(run_legacy, repeat=repeat, number=number))
+    routed = min(timeit.repeat(run_router, repeat=repeat, number=number))
+    per_message = number * len(CORPUS)
+
+    print(f"Corpus: {len(CORPUS)} messages, {sum(len(v) for v in KEYWORD_TABLES.values())} "
+          f"keywords in {len(KEYWORD_TABLES)} tables")
+    print(f"Router compile time:   {compile_ms:8.2f} ms (once per process)")
+    print(f"Legacy any() scans:    {legacy / per_message * 1e6:8.2f} us/message")
+    print(f"IntentRouter.match():  {routed / per_message * 1e6:8.2f} us/message")
+    print(f"Speedup:               {legacy / routed:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: LLM round trips on medication turns
+Runs medication logging and medication question turns through
+CompanionAgent.generate_response against a fake LLM with injected latency,
+with separate intent / extraction / answer calls and with the single
+structured medication call
+
+Run from the repository root:
+    python -m benchmarks.medication_turn_bench
+"""
+
+import statistics
+import time
+
+from benchmarks.common import LatencyLLM, isolated_workdir, simulate_memory_latency
+
+LOGGING_MESSAGES = [
+    "I just took my Lisinopril",
+    "Had my blood pressure pill with breakfast",
+    "Took the metformin a few minutes ago, tummy feels a bit off",
+    "Done with my morning meds",
+    "Swallowed the water pill just now",
+]
+
+QUESTION_MESSAGES = [
+    "Did I take my Lisinopril today?",
+    "How many medications am I on?",
+    "What is the metformin for again",
+    "Which pills are left for today?",
+    "Should I take my water pill now?",
+]
+
+LLM_LATENCY_MS = {"intent": 350.0, "medication": 300.0, "medication_turn": 400.0,
+                  "chat": 450.0, "verbosity": 150.0}
+
+
+def run(agent, llm, user_id: int, messages, turns: int):
+    latencies, calls = [], []
+    for i in range(turns):
+        # Every turn pays for its LLM calls (no response cache hits)
+        agent.response_cache.clear()
+        before = len(llm.calls)
+        start = time.perf_counter()
+        agent.generate_response(user_id, messages[i % len(messages)])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        calls.append(len(llm.calls) - before)
+    return latencies, calls
+
+
+def main(turns: int = 10):
+    isolated_workdir()
+
+    from app.agents.companion_agent import CompanionAgent
+    from app.agents.intent_classifier import LocalIntentClassifier
+    from app.database.crud import MedicationCRUD, UserCRUD
+
+    user = UserCRUD.create_user(name="Benchmark User")
+    lisinopril = MedicationCRUD.create_medication(user.id, "Lisinopril", "10mg", "daily", ["09:00"])
+    MedicationCRUD.create_medication(user.id, "Metformin", "500mg", "twice daily", ["08:00", "20:00"])
+    MedicationCRUD.create_medication(user.id, "Furosemide", "20mg", "daily", ["09:00"])
+
+    agent = CompanionAgent()
+    simulate_memory_latency(agent.memory_manager, {})
+    default_classifier = agent.intent_classifier
+    # Ambiguous phrasings: every turn escalates past the local classifier
+    escalating_classifier = LocalIntentClassifier(escalation_threshold=1.01)
+
+    print(f"LLM latency (ms): {LLM_LATENCY_MS}")
+    for classifier_label, classifier in (("local classifier", default_classifier),
+                                         ("always escalate", escalating_classifier)):
+        agent.intent_classifier = classifier
+        print(f"\n{classifier_label}:")
+        for kind, intent, messages in (("logging", "log_medication", LOGGING_MESSAGES),
+                                       ("question", "ask_medication", QUESTION_MESSAGES)):
+            llm = LatencyLLM(latencies_ms=LLM_LATENCY_MS, intent=intent,
+                             medication_id=lisinopril.id,
+                             reply="You took your Lisinopril this morning.")
+            agent.client = llm
+            for mode, structured in (("separate", False), ("structured", True)):
+                agent.structured_medication_turns = structured
+                run(agent, llm, user.id, messages, 2)  # warm-up
+                latencies, calls = run(agent, llm, user.id, messages, turns)
+                print(f"  {kind:8s} {mode:10s} LLM calls/turn {statistics.mean(calls):4.2f}   "
+                      f"mean {statistics.mean(latencies):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
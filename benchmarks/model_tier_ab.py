@@ -0,0 +1,123 @@
+"""
+A/B harness: tiered model routing vs. the large model for every call
+Replays the same user messages through CompanionAgent.generate_response once
+per arm and reports turn latency, per-call-type LLM latency, estimated cost,
+calls per model and reply length. Uses an offline backend by default (set
+CARELY_LLM_BACKEND=replay / groq to compare recorded or live completions).
+
+Messages come from a conversation database (read-only) when a path is given,
+otherwise from a built-in corpus. Run from the repository root:
+    python -m benchmarks.model_tier_ab [path/to/carely.db] [max_messages]
+"""
+
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+# Must be set before the gateway module is imported
+os.environ.setdefault("CARELY_LLM_BACKEND", "synthetic")
+os.environ.setdefault("CARELY_LLM_SYNTHETIC_SEED", "17")
+
+from benchmarks.common import isolated_workdir, percentile, simulate_memory_latency
+
+CORPUS = [
+    "Good morning, I slept pretty well last night",
+    "My daughter is visiting this weekend, I'm so happy",
+    "I feel a bit lonely this afternoon",
+    "Tell me a story about the old days on the farm",
+    "Explain step by step how to use the video call on my tablet",
+    "Did I take my Lisinopril today?",
+    "I just took my metformin with lunch",
+    "What should I cook for dinner tonight?",
+    "Why do my knees ache more when it rains? And is there anything I can do about it?",
+    "Thank you, that's very kind",
+]
+
+ARMS = (("large", "large"), ("tiered", None))
+
+
+def load_messages(db_path: str, limit: int):
+    """User messages of saved conversations, oldest first (read-only)"""
+    connection = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT message FROM conversation WHERE message NOT LIKE '[%' "
+            "ORDER BY timestamp LIMIT ?", (limit,)).fetchall()
+    finally:
+        connection.close()
+    return [row[0] for row in rows if row[0] and row[0].strip()]
+
+
+def run_arm(agent, user_id: int, messages):
+    from utils.metrics import metrics
+    from utils.tracing import tracer
+
+    agent.response_cache.clear()
+    metrics.reset()
+    latencies, lengths = [], []
+    for message in messages:
+        start = time.perf_counter()
+        result = agent.generate_response(user_id, message)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        lengths.append(len(result["response"].split()))
+    counters = metrics.snapshot()["counters"]
+    stages = {name: values for name, values in tracer.stage_summary().items()
+              if name.startswith("llm.")}
+    return {
+        "latencies": latencies,
+        "words": lengths,
+        "cost": counters.get("llm.cost_usd", 0.0),
+        "calls": {name[len("llm.calls."):]: count for name, count in counters.items()
+                  if name.startswith("llm.calls.")},
+        "stages": stages,
+    }
+
+
+def main(db_path: str = None, limit: int = 50):
+    messages = load_messages(db_path, limit) if db_path else CORPUS
+    isolated_workdir()
+
+    from app.agents.companion_agent import CompanionAgent
+    from app.agents.model_router import ModelRouter
+    from app.database.crud import MedicationCRUD, UserCRUD
+
+    user = UserCRUD.create_user(name="Benchmark User")
+    MedicationCRUD.create_medication(user.id, "Lisinopril", "10mg", "daily", ["09:00"])
+    MedicationCRUD.create_medication(user.id, "Metformin", "500mg", "twice daily", ["08:00", "20:00"])
+
+    agent = CompanionAgent()
+    simulate_memory_latency(agent.memory_manager, {"profile": 5, "recent": 10, "similar": 40})
+    print(f"LLM backend: {os.environ['CARELY_LLM_BACKEND']}   messages: {len(messages)}")
+
+    results = {}
+    for label, force_tier in ARMS:
+        agent.model_router = ModelRouter(force_tier=force_tier)
+        run_arm(agent, user.id, messages[:2])  # warm-up
+        results[label] = result = run_arm(agent, user.id, messages)
+        turns = len(result["latencies"])
+        print(f"\n{label}:")
+        print(f"  turn latency  p50 {percentile(result['latencies'], 50):7.1f} ms   "
+              f"p95 {percentile(result['latencies'], 95):7.1f} ms   "
+              f"mean {statistics.mean(result['latencies']):7.1f} ms")
+        print(f"  cost          ${result['cost'] / turns * 1000:.4f} per 1000 turns")
+        print(f"  reply length  {statistics.mean(result['words']):5.1f} words (mean)")
+        print(f"  calls/turn    " + "   ".join(f"{model} {count / turns:.2f}"
+                                              for model, count in sorted(result["calls"].items())))
+        for stage, values in sorted(result["stages"].items()):
+            print(f"    {stage:28s} n={values['count']:3d}   p50 {values['p50']:7.1f} ms   "
+                  f"p95 {values['p95']:7.1f} ms")
+
+    base, tiered = results["large"], results["tiered"]
+    print("\ntiered vs large:")
+    print(f"  p50 latency   {percentile(tiered['latencies'], 50) - percentile(base['latencies'], 50):+7.1f} ms")
+    print(f"  p95 latency   {percentile(tiered['latencies'], 95) - percentile(base['latencies'], 95):+7.1f} ms")
+    if base["cost"]:
+        print(f"  cost          {(tiered['cost'] / base['cost'] - 1) * 100:+6.1f} %")
+    print(f"  reply length  {statistics.mean(tiered['words']) - statistics.mean(base['words']):+5.1f} words")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
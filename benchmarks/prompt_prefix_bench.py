@@ -0,0 +1,65 @@
+"""
+Benchmark: prompt bytes per turn and shared prompt prefix
+Runs chat turns a few minutes apart through CompanionAgent.generate_response
+with the legacy system prompt layout (time first) and the static persona
+prefix, and reports the bytes sent per turn and how many leading bytes each
+chat prompt shares with the previous one (what a prefix cache can reuse)
+
+Run from the repository root:
+    python -m benchmarks.prompt_prefix_bench
+"""
+
+from datetime import timedelta
+
+from benchmarks.common import LatencyLLM, isolated_workdir, simulate_memory_latency
+
+MESSAGES = [
+    "Good morning, I slept pretty well last night",
+    "My daughter is visiting this weekend, I'm so happy",
+    "I feel a bit lonely this afternoon",
+    "Tell me a story about the old days on the farm",
+    "The weather is nice, I might go for a walk in the garden",
+    "What should I cook for dinner tonight?",
+]
+
+
+def main(turns: int = 24, minutes_between_turns: int = 3):
+    isolated_workdir()
+
+    from app.agents import companion_agent as agent_module
+    from app.agents.companion_agent import CompanionAgent
+    from app.database.crud import UserCRUD
+    from utils.metrics import metrics
+    from utils.timezone_utils import now_central
+
+    agent = CompanionAgent()
+    agent.client = LatencyLLM(latency_ms=0)
+    simulate_memory_latency(agent.memory_manager, {})
+
+    for label, static_prefix in (("legacy (time first)", False), ("static persona prefix", True)):
+        # Fresh user per layout so both start with the same (empty) history
+        user = UserCRUD.create_user(name="Benchmark User")
+        agent.static_prompt_prefix = static_prefix
+        agent._last_prompts.clear()
+        agent.response_cache.clear()
+        metrics.reset()
+        clock = [now_central().replace(hour=9, minute=0)]
+        agent_module.now_central = lambda: clock[0]
+        try:
+            for i in range(turns):
+                clock[0] += timedelta(minutes=minutes_between_turns)
+                agent.generate_response(user.id, MESSAGES[i % len(MESSAGES)])
+        finally:
+            agent_module.now_central = now_central
+
+        histograms = metrics.snapshot()["histograms"]
+        sent = sum(h["mean"] * h["count"] for name, h in histograms.items()
+                   if name.startswith("prompt_bytes."))
+        chat = histograms["prompt_bytes.chat"]
+        shared = histograms["prompt_prefix_bytes.chat"]
+        print(f"{label:24s} bytes/turn {sent / turns:7.0f}   chat prompt {chat['mean']:6.0f} B   "
+              f"shared prefix {shared['mean']:6.0f} B ({shared['mean'] / chat['mean'] * 100:4.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: recency re-ranking of long-term memory query results
+Times LongTermMemory._rank_candidates on n_results=30 candidates (the most
+retrieve_similar_conversations asks for) against the previous per-candidate
+loop (ISO parsing, math.exp and sentence splitting per item, timestamps parsed
+again for the output), with items written before and after epoch timestamps
+and snippets were stored in metadata
+
+Run from the repository root:
+    python -m benchmarks.rerank_bench
+"""
+
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import percentile
+
+N_RESULTS = 30
+ROUNDS = 5000
+
+
+def legacy_rank(results, top_k: int = 7, exclude_query: str = None):
+    """The per-candidate loop retrieve_similar_conversations used before"""
+    from utils.timezone_utils import now_central
+
+    def recency_score(timestamp_str, half_life_days=30.0):
+        try:
+            timestamp = datetime.fromisoformat(timestamp_str)
+            age_days = (now_central() - timestamp).total_seconds() / 86400.0
+            return math.exp(-math.log(2) / half_life_days * age_days)
+        except Exception:
+            return 0.5
+
+    candidates = []
+    exclude_lower = exclude_query.lower().strip() if exclude_query else ""
+    for idx, doc_id in enumerate(results['ids'][0]):
+        metadata = results['metadatas'][0][idx]
+        document = results['documents'][0][idx]
+        distance = results['distances'][0][idx]
+        if exclude_query and metadata.get('user_message', '').lower().strip() == exclude_lower:
+            continue
+        if distance < 0.05:
+            continue
+        timestamp_str = metadata.get('timestamp_utc') or metadata.get('timestamp', '')
+        recency = recency_score(timestamp_str)
+        semantic = 1.0 - distance
+        sentences = document.split('.')[:2]
+        text = '. '.join(s.strip() for s in sentences if s.strip())
+        if text and not text.endswith('.'):
+            text += '.'
+        candidates.append({"type": metadata.get('type', 'conversation'), "text": text,
+                           "metadata": metadata, "relevance": semantic, "recency": recency,
+                           "combined_score": semantic * 0.7 + recency * 0.3,
+                           "timestamp_str": timestamp_str})
+    candidates.sort(key=lambda x: x['combined_score'], reverse=True)
+    final = ([c for c in candidates if c['type'] == 'summary'][:2]
+             + [c for c in candidates if c['type'] != 'summary'][:5])
+    final.sort(key=lambda x: x['combined_score'], reverse=True)
+    for item in final:
+        try:
+            item['timestamp'] = datetime.fromisoformat(item['timestamp_str'])
+        except Exception:
+            pass
+    return final[:top_k]
+
+
+def make_results(long_term, with_epochs: bool):
+    from utils.timezone_utils import now_central
+
+    rng = random.Random(3)
+    now = now_central()
+    ids, documents, metadatas, distances = [], [], [], []
+    for i in range(N_RESULTS):
+        item_type = "summary" if i % 5 == 0 else "conversation"
+        timestamp = now - timedelta(hours=rng.uniform(1, 24 * 90))
+        document = (f"I went to the garden with my daughter on day {i}. We planted tomatoes. "
+                    f"It was sunny. That sounds wonderful, tell me more about the tomatoes.")
+        metadata = {"user_id": "1", "type": item_type, "timestamp_utc": timestamp.isoformat(),
+                    "user_message": f"I went to the garden on day {i}",
+                    "assistant_response": "That sounds wonderful"}
+        if with_epochs:
+            metadata["timestamp_epoch"] = timestamp.timestamp()
+            metadata["snippet"] = long_term._snippet(document)
+        ids.append(f"user_1_conv_{i}")
+        documents.append(document)
+        metadatas.append(metadata)
+        distances.append(rng.uniform(0.1, 0.9))
+    return {"ids": [ids], "documents": [documents], "metadatas": [metadatas], "distances": [distances]}
+
+
+def time_ranker(rank, results):
+    latencies = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        rank(results)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def main():
+    from app.memory.long_term_memory import LongTermMemory
+
+    # Only the ranking method is used; no store or model is opened
+    long_term = LongTermMemory.__new__(LongTermMemory)
+    long_term.semantic_weight, long_term.recency_weight, long_term.half_life_days = 0.7, 0.3, 30.0
+
+    print(f"n_results={N_RESULTS}, {ROUNDS} rounds")
+    for label, with_epochs in (("ISO-only metadata", False), ("epoch + snippet metadata", True)):
+        results = make_results(long_term, with_epochs)
+        legacy = legacy_rank(results)
+        ranked = long_term._rank_candidates(results, 7)
+        same = [item["metadata"]["timestamp_utc"] for item in legacy] == \
+               [item["metadata"]["timestamp_utc"] for item in ranked]
+        for name, rank in (("loop", lambda r: legacy_rank(r)),
+                           ("numpy", lambda r: long_term._rank_candidates(r, 7))):
+            latencies = time_ranker(rank, results)
+            print(f"{label:26s} {name:6s} p50 {percentile(latencies, 50):7.1f} us   "
+                  f"p99 {percentile(latencies, 99):7.1f} us")
+        print(f"{label:26s} same ranking: {same}")
+
+
+if __name__ == "__main__":
+    main()
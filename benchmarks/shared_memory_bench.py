@@ -0,0 +1,89 @@
+"""
+Benchmark: resident memory of concurrent sessions with per-session vs. shared
+long-term memory
+Starts N sessions in threads (one MemoryManager each, as every CompanionAgent
+builds) and runs one similar-context retrieval per session, in a fresh process
+per mode and vector backend. "per-session" gives every manager its own
+LongTermMemory (embedding model, vector client, store files) as before;
+"shared" uses the process-wide instance. Reports RSS growth over the imported
+baseline and the time until every session finished its first retrieval.
+
+The store is pre-filled with random embeddings. Queries use the real embedding
+model; where it cannot be loaded (offline) retrieval fails soft and the
+numbers cover everything except the model weights.
+
+Run from the repository root:
+    python -m benchmarks.shared_memory_bench [sessions] [users]
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Queries must reach the embedder, not the embedding cache
+os.environ["CARELY_EMBEDDING_CACHE"] = "false"
+
+MODES = ("per-session", "shared")
+BACKENDS = ("chroma", "numpy")
+
+
+def probe(mode: str, sessions: int, users: int):
+    """Runs in a fresh process with CARELY_VECTOR_BACKEND set"""
+    from app.memory.long_term_memory import LongTermMemory
+    from app.memory.memory_manager import MemoryManager
+    from benchmarks.vector_backend_bench import rss_mb
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    managers = []
+    # Built one at a time (sessions arrive one by one); only the first turns overlap
+    for _ in range(sessions):
+        manager = MemoryManager()
+        if mode == "per-session":
+            manager.long_term = LongTermMemory()  # What MemoryManager used to build
+        managers.append(manager)
+    durations = [0.0] * sessions
+
+    def session(index: int):
+        managers[index].long_term.retrieve_similar_conversations(
+            "How are the grandchildren doing?", index % users + 1)
+        durations[index] = (time.perf_counter() - start) * 1000.0
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    instances = len({id(manager.long_term) for manager in managers})
+    print(f"{os.environ['CARELY_VECTOR_BACKEND']:7s} {mode:12s} {instances:3d} LongTermMemory   "
+          f"RSS +{rss_mb() - baseline:6.0f} MB   all first turns done {max(durations):7.0f} ms",
+          flush=True)
+
+
+def main(sessions: int = 20, users: int = 20):
+    from benchmarks.common import isolated_workdir
+    from benchmarks.vector_backend_bench import build
+
+    workdir = isolated_workdir()
+    print(f"{sessions} concurrent sessions, {users} users x 200 conversations in the store")
+    for backend in BACKENDS:
+        # The default store location MemoryManager opens, relative to the workdir
+        path = os.path.join("data", "vectors")
+        build(backend, path, users, 200)
+        for mode in MODES:
+            env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path),
+                   "CARELY_VECTOR_BACKEND": backend, "CARELY_VECTOR_PARTITIONING": "user",
+                   # Only the shared mode has a shared instance to warm up
+                   "CARELY_MEMORY_WARM_UP": "true" if mode == "shared" else "false"}
+            subprocess.run([sys.executable, "-m", "benchmarks.shared_memory_bench", "--probe",
+                            mode, str(sessions), str(users)], check=True, cwd=workdir, env=env)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--probe":
+        probe(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main(*(int(arg) for arg in sys.argv[1:3]))
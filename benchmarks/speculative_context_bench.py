@@ -0,0 +1,69 @@
+"""
+Benchmark: overlapping intent detection with memory retrieval
+Runs general-chat turns through CompanionAgent.generate_response against a
+fake LLM with injected latency, with speculative context retrieval off and on
+
+Run from the repository root:
+    python -m benchmarks.speculative_context_bench
+"""
+
+import statistics
+import time
+
+from benchmarks.common import (LatencyLLM, isolated_workdir, percentile,
+                               simulate_memory_latency)
+
+# Messages the local classifier cannot settle, so intent goes to the LLM
+MESSAGES = [
+    "The weather is nice, I might go for a walk in the garden",
+    "My granddaughter called me this afternoon",
+    "I've been thinking about the old days on the farm",
+    "Do you think I should repaint the kitchen?",
+    "The neighbours brought over an apple pie",
+]
+
+LLM_LATENCY_MS = {"intent": 350.0, "verbosity": 150.0, "chat": 500.0}
+LAYER_LATENCY_MS = {"profile": 20.0, "recent": 40.0, "similar": 250.0}
+
+
+def run(agent, user_id: int, turns: int):
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        agent.generate_response(user_id, MESSAGES[i % len(MESSAGES)])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def main(turns: int = 10):
+    isolated_workdir()
+
+    from app.agents.companion_agent import CompanionAgent
+    from app.agents.intent_classifier import LocalIntentClassifier
+    from app.database.crud import UserCRUD
+
+    user = UserCRUD.create_user(name="Benchmark User")
+    agent = CompanionAgent()
+    agent.client = LatencyLLM(latencies_ms=LLM_LATENCY_MS)
+    # Escalate every turn so each one pays for the LLM intent call
+    agent.intent_classifier = LocalIntentClassifier(escalation_threshold=1.01)
+    simulate_memory_latency(agent.memory_manager, LAYER_LATENCY_MS)
+
+    results = {}
+    for label, speculative in (("sequential", False), ("speculative", True)):
+        agent.speculative_context = speculative
+        run(agent, user.id, 2)  # warm-up
+        results[label] = run(agent, user.id, turns)
+
+    print(f"LLM latency (ms): {LLM_LATENCY_MS}")
+    print(f"Memory layer latency (ms): {LAYER_LATENCY_MS}")
+    for label, latencies in results.items():
+        print(f"{label:12s} mean {statistics.mean(latencies):7.1f} ms   "
+              f"p50 {percentile(latencies, 50):7.1f} ms   p95 {percentile(latencies, 95):7.1f} ms")
+    saved = statistics.mean(results["sequential"]) - statistics.mean(results["speculative"])
+    print(f"Saved per turn: {saved:7.1f} ms "
+          f"({saved / statistics.mean(results['sequential']) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
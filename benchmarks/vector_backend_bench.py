@@ -0,0 +1,99 @@
+"""
+Benchmark: Chroma vs. in-process NumPy vector backend for long-term memory
+Builds the same per-user corpus (conversations capped like
+cleanup_old_conversations, plus summaries and facts; random unit embeddings)
+in each backend, then measures in a fresh process per backend: cold start
+(imports + LongTermMemory + first query), resident memory after the queries,
+and retrieve_similar_conversations latency p50 / p99
+
+Run from the repository root:
+    python -m benchmarks.vector_backend_bench [users] [conversations_per_user]
+"""
+
+import os
+import random
+import subprocess
+import sys
+import time
+
+START = time.perf_counter()
+
+# Queries must reach the embedder every time, not the embedding cache
+os.environ["CARELY_EMBEDDING_CACHE"] = "false"
+
+QUERIES = 1000
+BACKENDS = ("chroma", "numpy")
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def build(backend: str, path: str, users: int, per_user: int):
+    from datetime import datetime, timedelta
+    from types import SimpleNamespace
+
+    from app.memory.long_term_memory import LongTermMemory
+    from benchmarks.vector_partition_bench import random_embedder
+
+    long_term = LongTermMemory(path, embedder=random_embedder, backend=backend, partitioning="user")
+    now = datetime.now()
+    for user_id in range(1, users + 1):
+        long_term.add_conversations(user_id, [
+            SimpleNamespace(id=i, message=f"resident {user_id} message {i}",
+                            response=f"companion reply {i}", timestamp=now - timedelta(hours=i))
+            for i in range(per_user)])
+        for day in range(14):
+            long_term.add_summary(user_id, f"Day {day} for resident {user_id}. Talked about family.",
+                                  now - timedelta(days=day))
+        for fact in range(10):
+            long_term.add_profile_fact(user_id, f"Resident {user_id} fact {fact}")
+
+
+def probe(backend: str, path: str, users: int):
+    """Runs in a fresh process: cold start, RSS and query latency"""
+    from app.memory.long_term_memory import LongTermMemory
+    from benchmarks.common import percentile
+    from benchmarks.vector_partition_bench import random_embedder
+
+    long_term = LongTermMemory(path, embedder=random_embedder, backend=backend, partitioning="user")
+    long_term.retrieve_similar_conversations("first query", 1)
+    cold_start_ms = (time.perf_counter() - START) * 1000.0
+
+    rng = random.Random(11)
+    latencies = []
+    for i in range(QUERIES):
+        user_id = rng.randint(1, users)
+        start = time.perf_counter()
+        long_term.retrieve_similar_conversations(f"query {i} about the grandchildren", user_id)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    print(f"{backend:7s} cold start {cold_start_ms:7.0f} ms   RSS {rss_mb():6.0f} MB   "
+          f"query p50 {percentile(latencies, 50):6.2f} ms   p99 {percentile(latencies, 99):6.2f} ms",
+          flush=True)
+
+
+def main(users: int = 50, per_user: int = 200):
+    from benchmarks.common import isolated_workdir
+
+    workdir = isolated_workdir()
+    print(f"{users} users x ({per_user} conversations + 14 summaries + 10 facts), "
+          f"{QUERIES} queries, dim 384")
+    for backend in BACKENDS:
+        path = os.path.join(workdir, f"vectors_{backend}")
+        build(backend, path, users, per_user)
+        # A fresh interpreter so imports, client start-up and file loads are counted
+        subprocess.run([sys.executable, "-m", "benchmarks.vector_backend_bench", "--probe",
+                        backend, path, str(users)], check=True, cwd=workdir,
+                       env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--probe":
+        probe(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main(*(int(arg) for arg in sys.argv[1:3]))
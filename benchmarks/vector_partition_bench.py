@@ -0,0 +1,89 @@
+"""
+Benchmark: long-term memory query latency vs. corpus size per collection layout
+Grows a synthetic corpus (conversations spread over many users, random unit
+embeddings) in each layout (shared collection filtered by user_id, one
+collection per user, hashed buckets) and times retrieve_similar_conversations
+for random users at each size, plus clear_user_memory at the end
+
+Run from the repository root:
+    python -m benchmarks.vector_partition_bench [sizes...]
+"""
+
+import hashlib
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+# Queries must reach the embedder every time, not the embedding cache
+os.environ["CARELY_EMBEDDING_CACHE"] = "false"
+
+from benchmarks.common import isolated_workdir, percentile
+
+DIM = 384
+USERS = 100
+QUERIES = 200
+LAYOUTS = ("shared", "user", "bucket")
+
+
+def random_embedder(texts):
+    """Deterministic random unit vectors (no model needed)"""
+    vectors = []
+    for text in texts:
+        seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+        vectors.append(vector / np.linalg.norm(vector))
+    return vectors
+
+
+def grow(long_term, start: int, stop: int):
+    """Add conversations start..stop-1, round-robin over users"""
+    now = datetime.now()
+    by_user = {}
+    for i in range(start, stop):
+        by_user.setdefault(i % USERS + 1, []).append(SimpleNamespace(
+            id=i, message=f"resident message {i}", response=f"companion reply {i}",
+            timestamp=now - timedelta(minutes=i)))
+    for user_id, rows in by_user.items():
+        long_term.add_conversations(user_id, rows)
+
+
+def time_queries(long_term, rng: random.Random):
+    latencies = []
+    for i in range(QUERIES):
+        user_id = rng.randint(1, USERS)
+        start = time.perf_counter()
+        long_term.retrieve_similar_conversations(f"query {i} about the garden", user_id)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def main(sizes=(1000, 4000, 16000)):
+    workdir = isolated_workdir()
+
+    from app.memory.long_term_memory import LongTermMemory
+
+    print(f"{USERS} users, {QUERIES} queries per point, dim {DIM}")
+    print(f"{'layout':8s} {'corpus':>7s}   {'p50 ms':>7s}   {'p95 ms':>7s}")
+    for layout in LAYOUTS:
+        long_term = LongTermMemory(os.path.join(workdir, f"vectors_{layout}"),
+                                   embedder=random_embedder, partitioning=layout, buckets=16)
+        rng = random.Random(7)
+        size = 0
+        for target in sizes:
+            grow(long_term, size, target)
+            size = target
+            time_queries(long_term, rng)  # warm-up (index load)
+            latencies = time_queries(long_term, rng)
+            print(f"{layout:8s} {size:7d}   {percentile(latencies, 50):7.2f}   {percentile(latencies, 95):7.2f}")
+        start = time.perf_counter()
+        long_term.clear_user_memory(1)
+        print(f"{layout:8s} clear_user_memory {(time.perf_counter() - start) * 1000.0:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (1000, 4000, 16000))
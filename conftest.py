@@ -0,0 +1,21 @@
+"""
+Shared pytest fixtures
+"""
+
+import zlib
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def embedder():
+    """Embedder seeded by each text's content (no model needed)
+
+    The same text always gets the same vector and different texts get different
+    ones, so a single-item write is not mistaken for a duplicate of another
+    """
+    def embed(texts):
+        return [np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(8).astype(np.float32)
+                for text in texts]
+    return embed
@@ -639,21 +639,24 @@ def run_dashboard():
             </style>
         """, unsafe_allow_html=True)
         
+        # Get user_id from session state
+        selected_user_id = st.session_state.get('user_id', 1)  # Default to 1 if not set
+
         # Navigation options
+        pages = [
+            "🏠 Overview",
+            "💬 Chat with Carely", 
+            "💊 Medications",
+            "📊 Health Insights"
+        ]
+        if is_admin_user(selected_user_id):
+            pages.append("⚙️ Performance")
         page = st.radio(
             "Navigate to:",
-            [
-                "🏠 Overview",
-                "💬 Chat with Carely", 
-                "💊 Medications",
-                "📊 Health Insights"
-            ],
+            pages,
             label_visibility="collapsed",
             key="main_navigation"
         )
-    
-    # Get user_id from session state
-    selected_user_id = st.session_state.get('user_id', 1)  # Default to 1 if not set
 
     # Main content based on selected page
     if page == "🏠 Overview":
@@ -664,11 +667,12 @@ def run_dashboard():
         show_medication_management(selected_user_id)
     elif page == "📊 Health Insights":
         show_health_insights(selected_user_id)
+    elif page == "⚙️ Performance":
+        show_performance_panel()
 
 
 def get_daily_affirmation() -> str:
     """Generate ONE positive affirmation for the day using AI."""
-    # ... (keep existing implementation, it's already compact)
     current_date = now_central().strftime('%Y-%m-%d')
     
     if 'daily_affirmation' not in st.session_state:
@@ -685,37 +689,40 @@ def get_daily_affirmation() -> str:
         "Your wisdom and kindness make a real difference.",
     ]
     
-    try:
-        from groq import Groq
-        groq_api_key = os.getenv("GROQ_API_KEY")
+    def generate_affirmation() -> str:
+        from utils.llm_gateway import get_llm_gateway
+        client = get_llm_gateway()
+        
+        # Offline backends (replay / synthetic) need no API key
+        if not os.getenv("GROQ_API_KEY") and client.backend in ("groq", "record"):
+            raise ValueError("No GROQ_API_KEY")
+        response = client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[{
+                "role": "system",
+                "content": "You are a caring companion for seniors. Generate ONE short, positive affirmation."
+            }, {
+                "role": "user",
+                "content": "Generate ONE positive affirmation for today. Keep it under 20 words, use simple language."
+            }],
+            temperature=0.8,
+            max_tokens=50,
+            call_type="affirmation"
+        )
         
-        if not groq_api_key:
-            import random
-            affirmation = random.choice(fallback_affirmations)
-        else:
-            client = Groq(api_key=groq_api_key)
-            
-            response = client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{
-                    "role": "system",
-                    "content": "You are a caring companion for seniors. Generate ONE short, positive affirmation."
-                }, {
-                    "role": "user",
-                    "content": "Generate ONE positive affirmation for today. Keep it under 20 words, use simple language."
-                }],
-                temperature=0.8,
-                max_tokens=50
-            )
-            
-            affirmation = response.choices[0].message.content.strip()
-            affirmation = affirmation.strip('"').strip("'")
-            
-            if len(affirmation.split()) > 20:
-                import random
-                affirmation = random.choice(fallback_affirmations)
+        affirmation = response.choices[0].message.content.strip()
+        affirmation = affirmation.strip('"').strip("'")
+        
+        if len(affirmation.split()) > 20:
+            raise ValueError("Affirmation too long")
+        return affirmation
     
+    try:
+        # Shared by every session: one LLM call per day, even when many open at once
+        from app.agents.daily_content import get_daily_content_store
+        affirmation = get_daily_content_store().get_or_create("affirmation", generate_affirmation)
     except Exception:
+        # Not stored in the shared store, so a later session can try again
         import random
         affirmation = random.choice(fallback_affirmations)
     
@@ -1662,6 +1669,7 @@ def show_chat_interface(user_id: int):
         
         # Send proactive greeting when chat opens
         # Show greeting if: no recent conversations OR last conversation was >4 hours ago
+        # (CARELY_GREETING_SILENCE_HOURS; greetings are precomputed for that moment)
         should_greet = False
         if len(recent_convs) == 0:
             should_greet = True
@@ -1669,12 +1677,12 @@ def show_chat_interface(user_id: int):
             from utils.timezone_utils import to_central
             last_conv_time = to_central(recent_convs[0].timestamp)
             time_since_last = (now_central() - last_conv_time).total_seconds() / 3600  # hours
-            if time_since_last > 4:  # More than 4 hours since last conversation
+            if time_since_last > st.session_state.companion_agent.greeting_silence_hours:  # 4 h by default
                 should_greet = True
         
         if should_greet and not st.session_state.proactive_greeting_sent:
             try:
-                proactive_message = st.session_state.companion_agent.generate_proactive_greeting(user_id)
+                proactive_message = st.session_state.companion_agent.get_proactive_greeting(user_id)
                 if proactive_message:
                     # Add to chat history
                     st.session_state.chat_history.append({
@@ -2059,13 +2067,11 @@ def show_chat_interface(user_id: int):
             # Normal conversation flow
             # Generate AI response
             with st.chat_message("assistant", avatar="🤖"):
-                with st.spinner("Carely is thinking..."):
-                    response_data = st.session_state.companion_agent.generate_response(
-                        user_id=user_id, user_message=prompt)
-
-                st.write(response_data["response"])
-
-                st.write(response_data["response"])
+                # Stream the reply as it is generated (persisted when the stream ends)
+                response_stream = st.session_state.companion_agent.generate_response_stream(
+                    user_id=user_id, user_message=prompt)
+                st.write_stream(response_stream)
+                response_data = response_stream.result
 
                 # Show sentiment if available
                 if response_data.get("sentiment_score") is not None:
@@ -2735,3 +2741,83 @@ def show_user_management():
                 if alerts:
                     users_with_alerts += 1
             st.metric("Users with Alerts", users_with_alerts)
+
+
+def is_admin_user(user_id: int) -> bool:
+    """Admin pages are shown to admin accounts, or to everyone with CARELY_ADMIN_PANEL=1"""
+    if os.getenv("CARELY_ADMIN_PANEL") == "1":
+        return True
+    user = UserCRUD.get_user(user_id)
+    return bool(user and user.user_type == "admin")
+
+
+def show_performance_panel():
+    """Show per-stage latency of chat turns (admin only)"""
+    from utils.tracing import tracer
+
+    st.header("⚙️ Performance")
+
+    summary = tracer.stage_summary()
+    if not summary:
+        st.info("No chat turns traced yet in this process.")
+        return
+
+    # Whole-turn latency
+    turn = summary.get("chat_turn")
+    if turn:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Chat Turns", turn["count"])
+        with col2:
+            st.metric("p50 Turn", f"{turn['p50']:.0f} ms")
+        with col3:
+            st.metric("p95 Turn", f"{turn['p95']:.0f} ms")
+        with col4:
+            st.metric("p99 Turn", f"{turn['p99']:.0f} ms")
+
+    st.divider()
+
+    # Per-stage histograms
+    st.subheader("Stages")
+    df_stages = pd.DataFrame([{
+        "stage": name,
+        "count": values["count"],
+        "mean_ms": values["mean"],
+        "p50_ms": values["p50"],
+        "p95_ms": values["p95"],
+        "p99_ms": values["p99"],
+        "max_ms": values["max"],
+    } for name, values in summary.items() if name != "chat_turn"])
+    df_stages = df_stages.sort_values("p95_ms", ascending=False)
+    st.dataframe(df_stages.round(1), hide_index=True, use_container_width=True)
+
+    fig = px.bar(df_stages, x="stage", y=["p50_ms", "p95_ms"], barmode="group",
+                 labels={"value": "Latency (ms)", "variable": ""})
+    st.plotly_chart(fig, use_container_width=True)
+
+    # LLM latency breakers (open = call type answered by its local fallback)
+    from utils.llm_gateway import get_llm_gateway
+    breakers = get_llm_gateway().breaker_states()
+    if breakers:
+        st.subheader("LLM Breakers")
+        df_breakers = pd.DataFrame([{"call_type": name, **state} for name, state in breakers.items()])
+        st.dataframe(df_breakers.round(1), hide_index=True, use_container_width=True)
+
+    # Recent turns as waterfalls
+    st.subheader("Recent Turns")
+    for trace in tracer.recent(limit=20):
+        attrs = trace["attrs"]
+        label = (f"{trace['timestamp'][11:19]} · {attrs.get('branch', '?')}"
+                 f"{' · ' + attrs['intent'] if attrs.get('intent') else ''}"
+                 f"{' · streamed' if attrs.get('streamed') else ''} · {trace['total_ms']:.0f} ms")
+        with st.expander(label):
+            if trace["spans"]:
+                df_spans = pd.DataFrame(trace["spans"])
+                fig = px.bar(df_spans, x="ms", y="name", base="start_ms", orientation="h",
+                             labels={"ms": "Time since turn start (ms)", "name": ""})
+                fig.update_yaxes(autorange="reversed")
+                st.plotly_chart(fig, use_container_width=True)
+            st.json(attrs)
+
+    if tracer.path:
+        st.caption(f"Traces are also written to `{tracer.path}`")
@@ -3,6 +3,7 @@ import threading
 from dotenv import load_dotenv
 from app.database.models import create_tables
 from app.scheduling.reminder_scheduler import ReminderScheduler
+from app.memory.long_term_memory import warm_up_long_term_memory
 from app.styles.theme import apply_global_theme
 from frontend.dashboard import run_dashboard
 from frontend.login import show_login_page, check_authentication, show_logout_button
@@ -17,6 +18,8 @@ load_dotenv()
 @st.cache_resource
 def initialize_app():
     """Initialize the application with database and sample data"""
+    # Load the shared embedding model / vector store while the database initializes
+    warm_up_long_term_memory()
     create_tables()
     initialize_sample_data()
     
@@ -0,0 +1,66 @@
+"""
+Test script for the vector memory backfill
+Covers paging, checkpoint resume, ignoring a checkpoint written for another
+embedding model and only indexing what write-time eviction keeps (the conversation table is swapped for a list)
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.memory import backfill
+from app.memory.backfill import Checkpoint, Progress, backfill_user
+
+
+class FakeLongTermMemory:
+    def __init__(self, max_raw_per_user=200):
+        self.pages = []
+        self.max_raw_per_user = max_raw_per_user
+
+    def add_conversations(self, user_id, conversations):
+        self.pages.append([conv.id for conv in conversations])
+        return len(conversations)
+
+
+@pytest.fixture
+def conversations(monkeypatch):
+    rows = [SimpleNamespace(id=i, message=f"m{i}", response=f"r{i}", timestamp=None)
+            for i in range(1, 11)]
+    monkeypatch.setattr(backfill.ConversationCRUD, "get_conversation_page",
+                        lambda user_id, after_id=0, limit=500: [r for r in rows if r.id > after_id][:limit])
+    monkeypatch.setattr(backfill.ConversationCRUD, "get_conversation_window",
+                        lambda user_id, newest=None: (0, len(rows))
+                        if newest is None or newest >= len(rows) else (rows[-newest - 1].id, newest))
+    return rows
+
+
+def test_backfill_pages_and_resumes(conversations, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    long_term = FakeLongTermMemory()
+    indexed = backfill_user(long_term, 1, Checkpoint(path, "model-a"), Progress(1, 10), page_size=4)
+    assert indexed == 10
+    assert long_term.pages == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+    # New conversations after the checkpoint are the only ones indexed on a rerun
+    conversations.append(SimpleNamespace(id=11, message="m11", response="r11", timestamp=None))
+    long_term = FakeLongTermMemory()
+    assert backfill_user(long_term, 1, Checkpoint(path, "model-a"), Progress(1, 1), page_size=4) == 1
+    assert long_term.pages == [[11]]
+
+    # A different embedding model starts over, limited to the newest window
+    long_term = FakeLongTermMemory()
+    backfill_user(long_term, 1, Checkpoint(path, "model-b"), Progress(1, 3), page_size=4, newest=3)
+    assert long_term.pages == [[9, 10, 11]]
+
+
+def test_backfill_skips_what_eviction_would_delete(conversations, tmp_path):
+    # Only the newest max_raw_per_user conversations survive the write
+    long_term = FakeLongTermMemory(max_raw_per_user=4)
+    assert backfill_user(long_term, 1, Checkpoint(str(tmp_path / "a.json"), "model-a"),
+                         Progress(1, 4), page_size=3) == 4
+    assert long_term.pages == [[7, 8, 9], [10]]
+
+    long_term = FakeLongTermMemory(max_raw_per_user=4)
+    backfill_user(long_term, 1, Checkpoint(str(tmp_path / "b.json"), "model-a"),
+                  Progress(1, 4), newest=8)
+    assert long_term.pages == [[7, 8, 9, 10]]
@@ -0,0 +1,93 @@
+"""
+Test script for the token-budgeted prompt packer
+Verifies that the memory context is untouched when it fits and that sections
+are trimmed in priority order (profile, then relevant memory, then recent turns),
+and that the companion's prompt keeps the medication profile with a realistic
+history
+"""
+
+from app.agents.companion_agent import PERSONA_PROMPT, CompanionAgent
+from app.memory.context_packer import ContextPacker, PromptSection
+from app.memory.memory_manager import CONTEXT_HEADERS, MemoryManager
+
+SECTIONS = {
+    "profile": "User Profile:\nName: Dorothy\n\nActive Medications (1):\n  • Lisinopril - 10mg",
+    "recent": "\n".join(f"User: message {i}\nCarely: reply {i}" for i in range(10)),
+    "similar": "[October 01] We talked about the garden\n[Summary 2025-10-02] Quiet day",
+}
+
+
+def pack(budget_tokens):
+    result = ContextPacker(budget_tokens).pack([
+        PromptSection("system", "S" * 1600, priority=0, required=True),
+        PromptSection("question", "Current message: How are you?\nIMPORTANT: emergency",
+                      priority=0, required=True),
+        PromptSection("recent", SECTIONS["recent"], priority=2, header=CONTEXT_HEADERS["recent"],
+                      truncate="tail", unit_prefix="User: "),
+        PromptSection("similar", SECTIONS["similar"], priority=3, header=CONTEXT_HEADERS["similar"],
+                      truncate="head"),
+        PromptSection("profile", SECTIONS["profile"], priority=4, header=CONTEXT_HEADERS["profile"],
+                      truncate="head"),
+    ])
+    memory_context = "\n".join(result["texts"][name] for name in CONTEXT_HEADERS
+                               if name in result["texts"])
+    return result, memory_context
+
+
+def test_context_unchanged_within_budget():
+    """A generous budget reproduces MemoryManager's own context layout"""
+    result, memory_context = pack(5000)
+
+    assert memory_context == MemoryManager.format_context(SECTIONS)
+    assert not result["truncated"] and not result["dropped"]
+
+
+def test_low_priority_sections_trimmed_first():
+    """Required sections stay; recent turns keep the newest whole exchanges"""
+    result, memory_context = pack(480)
+
+    assert "question" in result["texts"] and "system" in result["texts"]
+    assert result["dropped"] == ["similar", "profile"]
+    assert result["truncated"] == ["recent"]
+    assert "User: message 9\nCarely: reply 9" in memory_context
+    assert "message 0" not in memory_context
+    assert memory_context.split("\n")[2].startswith("User: ")
+
+
+def realistic_sections():
+    """Full-length history as the memory layers produce it"""
+    profile = ("User Profile:\nName: Dorothy\nPreferences: {\"hobbies\": [\"gardening\", \"crosswords\"]}\n"
+               "\nActive Medications (4):\n  • Lisinopril - 10mg\n  • Metformin - 500mg\n"
+               "  • Atorvastatin - 20mg\n  • Vitamin D - 1000 IU\n"
+               "\nUpcoming Events and Important Dates:\n  • Ellen's birthday (birthday) - in 3 days\n")
+    recent = "\n".join(f"User: {f'I spent the morning {i} in the garden with the roses and my knees ache. ' * 2}"[:156]
+                       + f"\nCarely: {f'That sounds lovely, Dorothy, remember to rest those knees today {i}. ' * 2}"[:158]
+                       for i in range(10))
+    similar = "\n".join(f"[October 0{i}] We talked about the grandchildren visiting and the pie recipe. "
+                        f"She was looking forward to it." for i in range(1, 4))
+    return {"profile": profile, "recent": recent, "similar": similar}
+
+
+def test_companion_prompt_keeps_medications():
+    agent = CompanionAgent.__new__(CompanionAgent)
+    agent.context_packer = ContextPacker()
+    tail = ("User's name: Dorothy\nConversation type: general\nCurrent message: Did I take my pills?\n\n"
+            + "- Reference their medication schedule and recent conversations\n" * 10)
+
+    result = agent._pack_prompt(PERSONA_PROMPT, tail, realistic_sections())
+    assert not result["dropped"] and not result["truncated"]
+    assert result["total_tokens"] <= agent.context_packer.budget_tokens
+
+    # Under pressure the history gives way, never the medications
+    agent.context_packer = ContextPacker(900)
+    result = agent._pack_prompt(PERSONA_PROMPT, tail, realistic_sections())
+    assert "Metformin - 500mg" in result["texts"]["profile"]
+    assert "profile" not in result["dropped"] + result["truncated"]
+    assert "recent" in result["truncated"]
+
+
+if __name__ == "__main__":
+    test_context_unchanged_within_budget()
+    test_low_priority_sections_trimmed_first()
+    test_companion_prompt_keeps_medications()
+    print("✅ CONTEXT PACKER TESTS PASSED")
@@ -0,0 +1,62 @@
+"""
+Test script for the daily content store
+Covers single-flight generation under a burst of sessions, user scoping and
+not storing failed generations (the SQLite table is swapped for a dict)
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.agents import daily_content
+from app.agents.daily_content import DailyContentStore
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    table = {}
+    monkeypatch.setattr(daily_content.DailyContentCRUD, "get_content",
+                        lambda day, kind, user_id=0: table.get((day, kind, user_id)))
+
+    def save(day, kind, content, user_id=0):
+        return table.setdefault((day, kind, user_id), content)
+    monkeypatch.setattr(daily_content.DailyContentCRUD, "save_content", save)
+    monkeypatch.setattr(daily_content.DailyContentCRUD, "delete_before", lambda day: 0)
+    return table
+
+
+def test_burst_of_sessions_generates_once(rows):
+    store = DailyContentStore()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.1)
+        return "You are doing wonderfully."
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_create("affirmation", generate)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["You are doing wonderfully."] * 16
+    # A fresh process reads the stored row instead of generating again
+    assert DailyContentStore().get_or_create("affirmation", lambda: "other") == "You are doing wonderfully."
+
+
+def test_user_scope_and_failures(rows):
+    store = DailyContentStore()
+    assert store.get_or_create("memory_cue", lambda: "cue 1", user_id=1) == "cue 1"
+    assert store.get_or_create("memory_cue", lambda: "cue 2", user_id=2) == "cue 2"
+    assert store.get_or_create("memory_cue", lambda: "cue 3", user_id=1) == "cue 1"
+
+    def fail():
+        raise RuntimeError("LLM down")
+    with pytest.raises(RuntimeError):
+        store.get_or_create("joke", fail)
+    assert store.get_or_create("joke", lambda: "A gummy bear!") == "A gummy bear!"
@@ -0,0 +1,83 @@
+"""
+Test script for the persistent embedding cache
+Covers hits across the LRU and the memory-mapped file, reopening the cache
+from disk, growing the vector file, model-specific keys and compacting
+past the row cap
+"""
+
+from app.memory import embedding_cache
+from app.memory.embedding_cache import EmbeddingCache
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in texts]
+
+
+def test_cache_hits_survive_reopen(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INITIAL_ROWS", 4)
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(str(tmp_path), lru_size=2)
+    texts = [f"conversation {i}" for i in range(10)]
+
+    first = cache.embed(texts, embedder, "model-a")
+    assert cache.embed(texts + ["conversation 3"], embedder, "model-a")[:10] == first
+    assert embedder.texts == texts  # grew past 4 rows; LRU of 2 fell back to the file
+
+    # Same text under another model is a different entry
+    cache.embed(["conversation 0"], embedder, "model-b")
+    assert embedder.texts[-1] == "conversation 0"
+
+    cache.flush()
+    reopened = EmbeddingCache(str(tmp_path))
+    assert len(reopened) == 11
+    assert reopened.embed(texts, embedder, "model-a") == first
+    assert len(embedder.texts) == 11
+
+
+def test_memory_only_cache():
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(None, lru_size=8)
+    cache.embed(["hello", "hello"], embedder, "m")
+    cache.embed(["hello"], embedder, "m")
+    assert embedder.texts == ["hello"]
+
+
+def test_two_writers_share_a_directory(tmp_path, monkeypatch):
+    """Two caches on one directory (e.g. the app and a backfill) never overwrite each other's rows"""
+    monkeypatch.setattr(embedding_cache, "INITIAL_ROWS", 2)
+    embedder = CountingEmbedder()
+    first, second = EmbeddingCache(str(tmp_path)), EmbeddingCache(str(tmp_path))
+    a = first.embed(["text a"], embedder, "m")
+    b = second.embed(["text b", "text bb", "text bbb"], embedder, "m")
+    c = first.embed(["text c"], embedder, "m")
+    assert second.embed(["text c"], embedder, "m") == c  # Picked up from the other writer
+    assert len(embedder.texts) == 5
+
+    reopened = EmbeddingCache(str(tmp_path))
+    assert reopened.embed(["text a", "text b", "text bb", "text bbb", "text c"], embedder, "m") == a + b + c
+    assert len(embedder.texts) == 5
+
+
+def test_compacts_past_max_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INITIAL_ROWS", 2)
+    embedder = CountingEmbedder()
+    cache, other = EmbeddingCache(str(tmp_path), lru_size=1, max_rows=4), EmbeddingCache(str(tmp_path), lru_size=1)
+    first = cache.embed([f"query {i}" for i in range(4)], embedder, "m")
+    assert other.embed(["query 0"], embedder, "m") == first[:1]  # Read from the old generation
+
+    fifth = cache.embed(["query 4"], embedder, "m")  # Past the cap: keeps the newest two, then appends
+    assert len(cache) == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "index.1.bin", "meta.json", "vectors.1.f32", "write.lock"]
+    assert other.embed(["query 3", "query 4"], embedder, "m") == first[3:] + fifth
+    assert len(embedder.texts) == 5
+
+    reopened = EmbeddingCache(str(tmp_path), max_rows=4)
+    assert reopened.embed(["query 2", "query 3", "query 4"], embedder, "m") == first[2:] + fifth
+    reopened.embed(["query 0"], embedder, "m")
+    assert embedder.texts[-1] == "query 0"  # Dropped by the compaction, embedded again
@@ -0,0 +1,141 @@
+"""
+Test script for precomputed chat-page greetings
+Covers the low-priority greeting worker (per-user replacement, yielding to
+live LLM traffic, retrying failures), greetings being prepared for, and only
+served in, the time-of-day slot of the next greet opportunity, and stored
+greetings being dropped when events change
+"""
+
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.agents import companion_agent
+from app.database import crud
+from app.database.models import PersonalEvent
+from app.agents.companion_agent import CompanionAgent
+from app.scheduling import greeting_precomputer
+from app.scheduling.greeting_precomputer import GreetingPrecomputer
+from utils.timezone_utils import now_central
+
+
+class BusyGateway:
+    """Reports no headroom for the first `busy_checks` checks"""
+
+    def __init__(self, busy_checks: int):
+        self.checks = 0
+        self.busy_checks = busy_checks
+
+    def has_headroom(self, fraction):
+        self.checks += 1
+        return self.checks > self.busy_checks
+
+
+def test_worker_replaces_per_user_and_yields(monkeypatch):
+    monkeypatch.setattr(greeting_precomputer, "IDLE_POLL_S", 0.01)
+    gateway = BusyGateway(busy_checks=3)
+    precomputer = GreetingPrecomputer(per_minute=0, gateway=gateway, autostart=False)
+    ran = []
+    precomputer.submit(1, lambda: ran.append("first"))
+    precomputer.submit(1, lambda: ran.append("replaced"))  # A newer turn replaces the job
+    precomputer.submit(2, lambda: ran.append("later"), due=time.time() + 3600)
+
+    assert precomputer.run_due() == 1
+    assert ran == ["replaced"]
+    assert gateway.checks == 4  # Waited while live traffic used the rate limit
+    assert precomputer.pending() == 1
+
+
+def make_agent(monkeypatch, stored=None):
+    agent = CompanionAgent.__new__(CompanionAgent)
+    agent.precomputed_greetings = True
+    agent.greeting_silence_hours = 4.0
+    agent.greeting_lead_minutes = 15.0
+    agent.greeting_ttl_hours = 6.0
+    agent.greeting_precomputer = GreetingPrecomputer(per_minute=0, gateway=BusyGateway(0),
+                                                     autostart=False)
+    agent._greeting_context = lambda user_id, at=None: dict(
+        CompanionAgent._greeting_slot(at or now_central()), current_time=at or now_central(),
+        user=SimpleNamespace(name="Dorothy"), pending_meds=[], upcoming_events=[])
+    deleted = []
+    monkeypatch.setattr(companion_agent.GreetingCRUD, "get_fresh_greeting",
+                        staticmethod(lambda user_id: stored))
+    monkeypatch.setattr(companion_agent.GreetingCRUD, "delete_greeting",
+                        staticmethod(lambda user_id: deleted.append(user_id)))
+    return agent, deleted
+
+
+def test_turn_prepares_greeting_for_next_opportunity(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    calls = []
+    agent.precompute_greeting = lambda user_id, at=None: calls.append((user_id, at))
+
+    agent._schedule_greeting_precompute(5)
+    agent._schedule_greeting_precompute(5)  # Still one job per user
+    assert agent.greeting_precomputer.pending() == 1
+    assert agent.greeting_precomputer.run_due() == 0  # Not due until 15 min before
+
+    precomputer = agent.greeting_precomputer
+    due, job, _ = precomputer._jobs[5]
+    expected = now_central() + timedelta(hours=4) - timedelta(minutes=15)
+    assert abs(due - expected.timestamp()) < 5
+    with precomputer._condition:
+        precomputer._schedule(5, job, time.time(), 0)  # Fast-forward to the due time
+    assert precomputer.run_due() == 1
+    assert calls[0][0] == 5 and abs((calls[0][1] - now_central()).total_seconds() - 4 * 3600) < 5
+
+
+def test_greeting_served_only_in_its_slot(monkeypatch):
+    current = CompanionAgent._greeting_slot(now_central())["time_of_day"]
+    other = "night" if current != "night" else "morning"
+
+    agent, deleted = make_agent(monkeypatch, SimpleNamespace(message="Precomputed!", time_of_day=current))
+    assert agent.get_proactive_greeting(1) == "Precomputed!"
+    assert deleted == [1]
+
+    agent, deleted = make_agent(monkeypatch, SimpleNamespace(message="Precomputed!", time_of_day=other))
+    assert agent.get_proactive_greeting(1).startswith(CompanionAgent._greeting_slot(now_central())["greeting"])
+    assert deleted == []
+
+
+def test_failed_greeting_not_stored_and_retried(monkeypatch):
+    agent, _ = make_agent(monkeypatch)
+    saved = []
+    monkeypatch.setattr(companion_agent.GreetingCRUD, "save_greeting",
+                        staticmethod(lambda *args: saved.append(args)))
+
+    def breaker_open(user_id, ctx):
+        raise companion_agent.LLMDegradedError("greeting calls degraded")
+    agent._llm_greeting = breaker_open
+
+    with pytest.raises(companion_agent.LLMDegradedError):
+        agent.precompute_greeting(1)
+    assert saved == []  # No template locked in for the slot
+
+    precomputer = agent.greeting_precomputer
+    precomputer.submit(1, lambda: agent.precompute_greeting(1))
+    for attempt in range(greeting_precomputer.MAX_ATTEMPTS):
+        assert precomputer.run_due() == 1
+        if precomputer.pending():
+            due, job, attempts = precomputer._jobs[1]
+            assert attempts == attempt + 1 and due > time.time() + 60
+            with precomputer._condition:
+                precomputer._schedule(1, job, time.time(), attempts)
+    assert precomputer.pending() == 0  # Gave up after MAX_ATTEMPTS
+
+
+def test_event_changes_drop_stored_greeting(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    SQLModel.metadata.create_all(engine, tables=[PersonalEvent.__table__])
+    monkeypatch.setattr(crud, "get_session", lambda: Session(engine))
+    changes = []
+    monkeypatch.setattr(crud, "_change_listeners", [lambda table, user_id: changes.append((table, user_id))])
+
+    event = crud.PersonalEventCRUD.create_event(7, "appointment", "Dentist",
+                                                event_date=now_central() + timedelta(hours=3))
+    assert crud.PersonalEventCRUD.delete_event(event.id)
+    assert not crud.PersonalEventCRUD.delete_event(event.id)
+    assert changes == [("personal_event", 7), ("personal_event", 7)]
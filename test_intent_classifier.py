@@ -0,0 +1,52 @@
+"""
+Test script for the local intent classifier
+Covers medication names from the user's list counting as medication signals,
+the took / swallowed + my / the guard against answering locally as small talk, and
+training off the chat path
+"""
+
+from types import SimpleNamespace
+
+from app.agents.intent_classifier import LocalIntentClassifier
+from app.agents.medication_index import MedicationNameIndex
+
+
+def make_index():
+    index = MedicationNameIndex()
+    index.build(7, [SimpleNamespace(id=1, name="Aspirin"), SimpleNamespace(id=2, name="Lisinopril")])
+    return index
+
+
+def test_named_medication_is_not_small_talk():
+    classifier = LocalIntentClassifier()
+    index = make_index()
+    for message in ("I had my aspirin", "Just took the Zestril", "swallowed my lisinopril"):
+        prediction = classifier.predict(message, names_medication=index.mentions(7, message))
+        assert prediction["type"] != "general_chat", message
+        if prediction["type"] != "log_medication":
+            assert classifier.should_escalate(prediction), message
+
+
+def test_took_my_always_escalates():
+    """Unknown medication names must reach the LLM rather than be logged as chat"""
+    classifier = LocalIntentClassifier()
+    for message in ("took the little white one", "I swallowed my new one"):
+        prediction = classifier.predict(message)
+        assert prediction["type"] != "general_chat" or classifier.should_escalate(prediction), message
+    assert not classifier.should_escalate(classifier.predict("The garden looks lovely today"))
+    assert not classifier.should_escalate(classifier.predict("I had to go to the shop"))
+    # "had" + any object is not forced: the confidence threshold decides
+    for message in ("I had lunch with my daughter", "I had a nice chat with Mary"):
+        prediction = classifier.predict(message)
+        assert prediction["type"] == "general_chat" and "escalate" not in prediction, message
+        assert not classifier.should_escalate(prediction), message
+
+
+def test_training_swaps_weights_and_uses_names():
+    classifier = LocalIntentClassifier()
+    priors = classifier.weights
+    samples = [("I had my aspirin", "log_medication", True)] * 20 + [("Lovely weather today", "general_chat")] * 20
+    assert classifier.fit(samples) == 40
+    assert classifier.weights is not priors  # Swapped in whole, never mutated in place
+    assert classifier.weights["took_medication"] > priors["took_medication"] - 0.5
+    assert classifier.predict("I had my aspirin", names_medication=True)["type"] == "log_medication"
@@ -0,0 +1,61 @@
+"""
+Test script for the compiled keyword router
+Verifies that a single routing pass matches exactly what the per-table
+`any(k in message_lower ...)` checks in CompanionAgent used to match
+"""
+
+from app.agents.intent_router import KEYWORD_TABLES, IntentRouter, get_intent_router
+
+SAMPLE_MESSAGES = [
+    "When should I take my next pill?",
+    "What time is it right now?",
+    "What's the date and time?",
+    "What did we talk about the day before yesterday?",
+    "When is my doctor appointment?",
+    "I have CHEST PAIN and can't breathe, please help me",
+    "Can you help me write a letter?",
+    "I feel lonely, I miss my husband",
+    "Play some calming music please",
+    "",
+]
+
+
+def test_router_matches_substring_semantics():
+    """Every category must match exactly the keywords that occur as substrings"""
+    router = get_intent_router()
+
+    for message in SAMPLE_MESSAGES:
+        route = router.match(message)
+        lowered = message.lower()
+        for category, keywords in KEYWORD_TABLES.items():
+            expected = {k for k in keywords if k in lowered}
+            assert route.matched(category) == expected, (message, category)
+            assert route.has(category) == bool(expected)
+            assert route.count(category) == len(expected)
+
+
+def test_overlapping_keywords_at_same_position():
+    """Shorter keywords that prefix a longer match are still reported"""
+    router = IntentRouter({"short": ["help me"], "long": ["help me with"], "other": ["med"]})
+
+    route = router.match("Could you help me with my medication?")
+
+    assert route.has("short")
+    assert route.has("long")
+    assert route.has("other")
+    assert route.categories == {"short", "long", "other"}
+
+
+def test_no_match():
+    """Messages without keywords produce an empty route"""
+    route = IntentRouter({"music": ["song"]}).match("Good morning")
+
+    assert not route.keywords
+    assert route.categories == set()
+
+
+if __name__ == "__main__":
+    test_router_matches_substring_semantics()
+    test_overlapping_keywords_at_same_position()
+    test_no_match()
+    print("✅ INTENT ROUTER TESTS PASSED")
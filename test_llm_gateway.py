@@ -0,0 +1,155 @@
+"""
+Test script for the shared LLM gateway
+Covers retry-after handling, jittered retries of transient errors, the
+concurrency cap, slot release for streamed completions, and latency hedging
+and breakers
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import groq
+
+from utils.llm_gateway import (HEDGE_MODEL, LLMDegradedError, LLMGateway, LLMRateLimitError,
+                               is_rate_limit_error)
+
+REQUEST = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+
+
+def status_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    return cls(f"Error code: {status}", response=response, body=None)
+
+
+class ScriptedClient:
+    """Fake Groq client that raises the scripted errors, then answers"""
+
+    def __init__(self, errors=(), latency_s=0.0):
+        self.errors = list(errors)
+        self.latency_s = latency_s
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        with self._lock:
+            self.calls.append(time.monotonic())
+            if self.errors:
+                raise self.errors.pop(0)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency_s)
+        with self._lock:
+            self.active -= 1
+        if params.get("stream"):
+            return iter(["Hello", " there"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+
+def test_retry_after_and_transient_errors():
+    """429 waits for retry-after; 5xx retries; 4xx and exhausted retries raise"""
+    client = ScriptedClient(errors=[
+        status_error(groq.RateLimitError, 429, {"retry-after": "0.3"}),
+        status_error(groq.InternalServerError, 503),
+    ])
+    gateway = LLMGateway(client=client, requests_per_minute=6000, burst=5, max_retries=3)
+    assert gateway.chat.completions.create(model="m", messages=[]).choices[0].message.content == "ok"
+    assert len(client.calls) == 3
+    assert client.calls[1] - client.calls[0] >= 0.3
+
+    client = ScriptedClient(errors=[status_error(groq.BadRequestError, 400)])
+    gateway = LLMGateway(client=client, requests_per_minute=6000, max_retries=3)
+    try:
+        gateway.create(model="m", messages=[])
+        assert False, "400 must not be retried"
+    except groq.BadRequestError:
+        assert len(client.calls) == 1
+
+    client = ScriptedClient(errors=[status_error(groq.RateLimitError, 429)] * 2)
+    gateway = LLMGateway(client=client, requests_per_minute=6000, max_retries=1)
+    try:
+        gateway.create(model="m", messages=[])
+        assert False, "retries must be bounded"
+    except groq.RateLimitError as e:
+        assert is_rate_limit_error(e)
+
+
+def test_rate_and_concurrency_limits():
+    """No more than max_concurrency in flight; callers fail fast past max_wait_s"""
+    client = ScriptedClient(latency_s=0.05)
+    gateway = LLMGateway(client=client, max_concurrency=2, requests_per_minute=60000, burst=20)
+    threads = [threading.Thread(target=gateway.create, kwargs={"model": "m", "messages": []})
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.max_active == 2
+
+    # Streams hold their slot until fully read
+    stream = gateway.create(model="m", messages=[], stream=True)
+    stream2 = gateway.create(model="m", messages=[], stream=True)
+    assert "".join(stream) == "Hello there"
+    stream2.close()
+    assert gateway.create(model="m", messages=[]) is not None
+
+    gateway = LLMGateway(client=ScriptedClient(), requests_per_minute=6, burst=1, max_wait_s=0.2)
+    gateway.create(model="m", messages=[])
+    try:
+        gateway.create(model="m", messages=[])
+        assert False, "second call needs a token 10s away"
+    except LLMRateLimitError as e:
+        assert is_rate_limit_error(e)
+
+
+class ModelLatencyClient:
+    """Fake client whose latency depends on the requested model"""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        time.sleep(self.latency_s.get(params["model"], 0.0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=params["model"]))])
+
+
+def test_hedging_and_breaker():
+    """Slow large-model calls are hedged; a run of slow calls opens the breaker"""
+    client = ModelLatencyClient({"big": 0.5, HEDGE_MODEL: 0.02})
+    gateway = LLMGateway(client=client, requests_per_minute=0)
+    gateway.breaker("intent").budget_ms = 100
+    start = time.monotonic()
+    reply = gateway.create(model="big", messages=[], call_type="intent")
+    assert reply.choices[0].message.content == HEDGE_MODEL
+    assert time.monotonic() - start < 0.3
+
+    gateway.hedging = False
+    breaker = gateway.breaker("intent")
+    breaker.cooldown_s = 0.1
+    client.latency_s["big"] = 0.15
+    for _ in range(breaker.min_samples - 1):
+        gateway.create(model="big", messages=[], call_type="intent")
+    assert gateway.is_degraded("intent")
+    try:
+        gateway.create(model="big", messages=[], call_type="intent")
+        assert False, "open breaker must short-circuit"
+    except LLMDegradedError:
+        pass
+
+    # After the cool-down one fast probe closes it again
+    time.sleep(0.15)
+    client.latency_s["big"] = 0.0
+    gateway.create(model="big", messages=[], call_type="intent")
+    assert gateway.breaker_states()["intent"]["state"] == "closed"
+
+
+if __name__ == "__main__":
+    test_retry_after_and_transient_errors()
+    test_rate_and_concurrency_limits()
+    test_hedging_and_breaker()
+    print("✅ LLM GATEWAY TESTS PASSED")
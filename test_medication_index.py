@@ -0,0 +1,69 @@
+"""
+Test script for the local medication-name index
+Covers exact names, brand aliases, misspellings, lay terms, ambiguity and
+per-user rebuilds on medication changes
+"""
+
+from types import SimpleNamespace
+
+from app.agents.medication_index import MedicationNameIndex
+
+MEDICATIONS = [
+    SimpleNamespace(id=1, name="Lisinopril"),
+    SimpleNamespace(id=2, name="Metformin ER"),
+    SimpleNamespace(id=3, name="Furosemide"),
+]
+
+
+def make_index():
+    index = MedicationNameIndex(min_score=0.85, min_margin=0.15)
+    index.build(7, MEDICATIONS)
+    return index
+
+
+def resolved_id(index, text):
+    match = index.resolve(7, text)
+    return match["medication_id"] if match else None
+
+
+def test_names_aliases_and_misspellings():
+    """Exact names, brands, typos and unique lay terms resolve locally"""
+    index = make_index()
+
+    assert resolved_id(index, "I just took my Lisinopril") == 1
+    assert resolved_id(index, "took my metformin") == 2
+    assert resolved_id(index, "Had my Zestril with breakfast") == 1
+    assert resolved_id(index, "took the lisinipril") == 1
+    assert resolved_id(index, "took my metfromin") == 2
+    assert resolved_id(index, "swallowed the Lasix") == 3
+    assert resolved_id(index, "had my water pill just now") == 3
+
+
+def test_ambiguous_and_unknown_go_to_llm():
+    """Two medications, nothing recognisable or a shared lay term stay unresolved"""
+    index = make_index()
+
+    assert resolved_id(index, "took my lisinopril and metformin") is None
+    assert resolved_id(index, "done with my morning meds") is None
+    index.build(7, MEDICATIONS + [SimpleNamespace(id=4, name="Hydrochlorothiazide")])
+    assert resolved_id(index, "had my water pill") is None
+
+
+def test_notes_and_rebuild_on_change():
+    """Extra clauses become notes; a medication change drops the user's entry"""
+    index = make_index()
+    match = index.resolve(7, "Took the metformin a few minutes ago, tummy feels a bit off")
+    assert index.extract_notes("Took the metformin a few minutes ago, tummy feels a bit off",
+                               match["matched"]) == "tummy feels a bit off"
+
+    index.on_data_change("medication_log", 7)
+    assert resolved_id(index, "took my lisinopril") == 1
+    index.on_data_change("medication", 7)
+    assert 7 not in index._users
+
+
+if __name__ == "__main__":
+    test_names_aliases_and_misspellings()
+    test_ambiguous_and_unknown_go_to_llm()
+    test_notes_and_rebuild_on_change()
+    print("✅ MEDICATION INDEX TESTS PASSED")
@@ -0,0 +1,51 @@
+"""
+Test script for the structured medication call's fallback
+When the call is degraded or fails, the local intent and the locally matched
+medication are kept instead of turning the message into small talk
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents import companion_agent
+from app.agents.companion_agent import CompanionAgent
+from app.agents.medication_index import MedicationNameIndex
+from utils.llm_gateway import LLMDegradedError
+
+MEDICATIONS = [SimpleNamespace(id=1, name="Lisinopril", schedule_times="[]"),
+               SimpleNamespace(id=2, name="Metformin", schedule_times="[]")]
+
+
+def make_agent(monkeypatch, error: Exception):
+    monkeypatch.setattr(companion_agent.MedicationCRUD, "get_user_medications",
+                        staticmethod(lambda user_id, active_only=True: MEDICATIONS))
+    agent = CompanionAgent.__new__(CompanionAgent)
+    agent.medication_index = MedicationNameIndex()
+    agent.medication_index.build(7, MEDICATIONS)
+    agent._todays_medication_logs = lambda user_id: []
+
+    def fail(*args, **kwargs):
+        raise error
+    agent._complete = fail
+    return agent
+
+
+@pytest.mark.parametrize("error", [LLMDegradedError("degraded"), TimeoutError("slow")])
+def test_failed_call_keeps_local_log_intent(monkeypatch, error):
+    agent = make_agent(monkeypatch, error)
+    local = {"type": "log_medication", "confidence": 0.9, "reasoning": "local rules", "source": "local"}
+    intent = agent._analyze_medication_turn(7, "I took my Lisinopril, feeling dizzy", local)
+    assert intent["type"] == "log_medication" and intent["confidence"] == 0.9
+    assert intent["source"] == "local_fallback"
+    assert intent["medication"]["medication_id"] == 1
+    assert intent["medication"]["notes"] == "feeling dizzy"
+
+
+def test_failed_call_keeps_local_question(monkeypatch):
+    agent = make_agent(monkeypatch, LLMDegradedError("degraded"))
+    local = {"type": "ask_medication", "confidence": 0.96, "reasoning": "local rules", "source": "local"}
+    intent = agent._analyze_medication_turn(7, "Did I take my metformin?", local)
+    assert intent["type"] == "ask_medication" and "medication" not in intent and "reply" not in intent
+    # Without a local result the safe default stays
+    assert agent._analyze_medication_turn(7, "Did I take my metformin?")["type"] == "general_chat"
@@ -0,0 +1,55 @@
+"""
+Test script for concurrent memory context assembly
+Layers that miss their deadline or fail are dropped instead of stalling the
+turn, and deadlines of a speculative fetch count from when it was started
+"""
+
+import time
+
+from app.memory.memory_manager import MemoryManager
+
+
+def slow(text, delay_s):
+    def fetch(user_id, query):
+        time.sleep(delay_s)
+        return text
+    return fetch
+
+
+def failing(user_id, query):
+    raise RuntimeError("vector store unavailable")
+
+
+def manager(layers, budgets_ms):
+    memory = MemoryManager.__new__(MemoryManager)
+    memory.layer_budgets_ms = budgets_ms
+    memory._context_layers = lambda: layers
+    return memory
+
+
+def test_late_and_failing_layers_dropped():
+    memory = manager([("profile", slow("Name: Dorothy", 0.0)),
+                      ("recent", slow("User: hi\nCarely: hello", 1.0)),
+                      ("similar", failing)],
+                     {"profile": 300, "recent": 100, "similar": 300})
+    start = time.perf_counter()
+    result = memory.build_context(1, "hello")
+
+    assert time.perf_counter() - start < 0.5  # Never waited for the slow layer
+    assert result["status"] == {"profile": "ok", "recent": "timeout", "similar": "error"}
+    assert result["dropped"] == ["recent", "similar"]
+    assert result["context"] == MemoryManager.format_context({"profile": "Name: Dorothy"})
+
+
+def test_speculative_deadline_counts_from_start():
+    memory = manager([("profile", slow("Name: Dorothy", 0.1)),
+                      ("recent", slow("User: hi", 0.05)),
+                      ("similar", slow("[October 01] Garden", 0.6))],
+                     {"profile": 200, "recent": 200, "similar": 300})
+    pending = memory.start_context(1, "hello")
+    time.sleep(0.2)  # Routing and intent work while the layers load
+    result = memory.collect_context(pending)
+
+    assert result["status"] == {"profile": "ok", "recent": "ok", "similar": "timeout"}
+    assert result["wait_ms"] < 200  # Only the rest of the similar layer's budget
+    assert result["total_ms"] >= 200
@@ -0,0 +1,74 @@
+"""
+Test script for write-time memory dedup and capacity eviction
+Covers the oldest-first and LRU orders of UserMemoryIndex and LongTermMemory
+enforcing both on writes, also across instances sharing a store (content-seeded
+embeddings)
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.memory.long_term_memory import LongTermMemory
+from app.memory.memory_index import UserMemoryIndex
+from utils.timezone_utils import now_central
+
+
+def test_index_eviction_orders():
+    oldest = UserMemoryIndex("oldest")
+    lru = UserMemoryIndex("lru")
+    for index in (oldest, lru):
+        index.add("summary", "h-s", 0.0)  # not evictable
+        for i, epoch in enumerate([30.0, 10.0, 20.0]):
+            index.add(f"conv{i}", f"h{i}", epoch, evictable=True)
+    assert oldest.duplicate_of("h1", "conv9") == "conv1"
+    assert oldest.duplicate_of("h1", "conv1") is None
+
+    assert oldest.evict(2) == ["conv1"]  # smallest epoch
+    lru.touch(["conv0"])
+    assert lru.evict(1) == ["conv1", "conv2"]  # least recently added / used
+    assert oldest.duplicate_of("h1", "conv9") is None
+
+
+def test_writes_dedup_and_cap(tmp_path, monkeypatch, embedder):
+    monkeypatch.setenv("CARELY_EMBEDDING_CACHE_DIR", str(tmp_path / "cache"))
+    long_term = LongTermMemory(str(tmp_path), embedder=embedder, backend="numpy")
+    long_term.max_raw_per_user = 5
+    now = now_central()
+    long_term.add_summary(1, "A quiet day. Read a book.", now - timedelta(days=40))
+    for i in range(8):
+        long_term.add_conversation(1, i, f"message {i}", "reply", now - timedelta(days=8 - i))
+    long_term.add_conversation(1, 99, "message 7", "reply", now)  # same content as conversation 7
+    long_term.add_profile_fact(1, "Likes tea", "preference")
+    long_term.add_profile_fact(1, "Likes tea", "preference")
+
+    items = long_term.get_user_memory_items(1)
+    conversations = sorted(item["id"] for item in items if item["type"] == "conversation")
+    assert conversations == [f"user_1_conv_{i}" for i in range(3, 8)]
+    assert [item["type"] for item in items].count("summary") == 1
+    assert [item["type"] for item in items].count("profile_fact") == 1
+
+    # A fresh instance rebuilds the index from the store
+    reopened = LongTermMemory(str(tmp_path), embedder=embedder, backend="numpy")
+    reopened.max_raw_per_user = 5
+    reopened.add_conversation(1, 8, "message 8", "reply", now)
+    assert "user_1_conv_3" not in [item["id"] for item in reopened.get_user_memory_items(1)]
+
+
+@pytest.mark.parametrize("backend", ["numpy", "chroma"])
+def test_writes_see_other_writers(tmp_path, monkeypatch, embedder, backend):
+    # Two instances on one store, as the app and the backfill process would be
+    monkeypatch.setenv("CARELY_EMBEDDING_CACHE_DIR", str(tmp_path / "cache"))
+    app, backfill = (LongTermMemory(str(tmp_path), embedder=embedder, backend=backend)
+                     for _ in range(2))
+    app.max_raw_per_user = backfill.max_raw_per_user = 3
+    now = now_central()
+    for i in range(3):
+        app.add_conversation(1, i, f"message {i}", "reply", now - timedelta(days=9 - i))
+    backfill.add_conversation(1, 3, "message 3", "reply", now - timedelta(days=5))
+
+    app.add_conversation(1, 99, "message 3", "reply", now)  # Duplicate of the other writer's item
+    app.add_conversation(1, 4, "message 4", "reply", now - timedelta(days=4))
+
+    ids = sorted(item["id"] for item in app.get_user_memory_items(1))
+    assert ids == [f"user_1_conv_{i}" for i in (2, 3, 4)]
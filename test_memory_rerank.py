@@ -0,0 +1,52 @@
+"""
+Test script for long-term memory re-ranking
+Covers the summary / snippet mix, recency weighting from epoch metadata and the
+metadata migration for items written without it (NumPy backend, content-seeded embeddings)
+"""
+
+from datetime import timedelta
+
+from app.memory.long_term_memory import LongTermMemory
+from utils.timezone_utils import now_central
+
+
+def results_for(items):
+    """Query results from (type, age in days, distance) tuples"""
+    now = now_central()
+    metadatas = [{"type": item_type, "timestamp_epoch": (now - timedelta(days=age)).timestamp(),
+                  "snippet": f"item {i}."}
+                 for i, (item_type, age, _) in enumerate(items)]
+    return {"ids": [[str(i) for i in range(len(items))]], "documents": [["" for _ in items]],
+            "metadatas": [metadatas], "distances": [[distance for _, _, distance in items]]}
+
+
+def test_rank_mix_and_recency(tmp_path, embedder):
+    long_term = LongTermMemory(str(tmp_path), embedder=embedder, backend="numpy")
+    items = [("summary", 1, 0.2)] * 4 + [("conversation", 1, 0.3)] * 8 + [("conversation", 1, 0.01)]
+    ranked = long_term._rank_candidates(results_for(items), top_k=7)
+    assert [item["type"] for item in ranked].count("summary") == 2
+    assert len(ranked) == 7
+    assert all(item["text"].startswith("item ") for item in ranked)
+    assert "item 12." not in [item["text"] for item in ranked]  # near duplicate
+
+    # Same relevance: the newer conversation wins; no recency weight: a tie keeps query order
+    items = [("conversation", 300, 0.3), ("conversation", 1, 0.3)]
+    assert long_term._rank_candidates(results_for(items), top_k=2)[0]["text"] == "item 1."
+    long_term.recency_weight = 0.0
+    assert long_term._rank_candidates(results_for(items), top_k=2)[0]["text"] == "item 0."
+
+
+def test_migrate_metadata(tmp_path, monkeypatch, embedder):
+    monkeypatch.setenv("CARELY_EMBEDDING_CACHE_DIR", str(tmp_path / "cache"))
+    long_term = LongTermMemory(str(tmp_path), embedder=embedder, backend="numpy")
+    written_at = now_central() - timedelta(days=3)
+    long_term._collection_for(1).upsert(
+        ids=["user_1_conv_1"], embeddings=embedder(["x"]),
+        documents=["We baked bread. It smelled lovely. Then we ate it."],
+        metadatas=[{"user_id": "1", "type": "conversation", "timestamp_utc": written_at.isoformat()}])
+
+    assert long_term.migrate_metadata() == 1
+    metadata = long_term._collection_for(1).get(ids=["user_1_conv_1"])["metadatas"][0]
+    assert metadata["snippet"] == "We baked bread. It smelled lovely."
+    assert abs(metadata["timestamp_epoch"] - written_at.timestamp()) < 1e-3
+    assert long_term.migrate_metadata() == 0
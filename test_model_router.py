@@ -0,0 +1,30 @@
+"""
+Test script for model tiering
+Covers routing by call type and verbosity, the emergency override and pinning
+every call to one tier for A/B runs
+"""
+
+from app.agents.model_router import MODEL_TIERS, ModelRouter, estimate_cost_usd
+
+
+def test_routes_by_call_type_and_verbosity():
+    router = ModelRouter(force_tier=None)
+    assert router.route("intent").model == MODEL_TIERS["small"]
+    assert router.route("chat", "SHORT").params() == {
+        "model": MODEL_TIERS["small"], "max_tokens": 220, "temperature": 0.3}
+    assert router.route("chat", "LONG").model == MODEL_TIERS["large"]
+    assert router.route("chat", "LONG").max_tokens == 1200
+    # Emergencies always get the large model, with the verbosity's limits
+    emergency = router.route("chat", "SHORT", emergency=True)
+    assert (emergency.model, emergency.max_tokens) == (MODEL_TIERS["large"], 220)
+    assert router.route("unknown_call").model == MODEL_TIERS["large"]
+
+
+def test_force_tier_and_cost():
+    router = ModelRouter(force_tier="large")
+    assert router.route("verbosity").params() == {
+        "model": MODEL_TIERS["large"], "max_tokens": 50, "temperature": 0.1}
+    small = estimate_cost_usd("llama-3.1-8b-instant", 1000, 100)
+    large = estimate_cost_usd("llama-3.3-70b-versatile", 1000, 100)
+    assert 0 < small < large
+    assert estimate_cost_usd("unknown-model", 1000, 100) is None
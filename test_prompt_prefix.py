@@ -0,0 +1,69 @@
+"""
+Test script for the static prompt prefix
+The system message of a chat turn is the persona byte for byte whatever the
+user, time or memory, and prefix reuse is measured per user and call type
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from types import SimpleNamespace
+
+from app.agents import companion_agent
+from app.agents.companion_agent import PERSONA_PROMPT, CompanionAgent
+from app.agents.intent_router import get_intent_router
+from app.agents.model_router import get_model_router
+from app.memory.context_packer import ContextPacker
+from utils.metrics import metrics
+from utils.timezone_utils import now_central
+
+
+def make_agent():
+    agent = CompanionAgent.__new__(CompanionAgent)
+    agent.intent_router = get_intent_router()
+    agent.model_router = get_model_router()
+    agent.context_packer = ContextPacker()
+    agent.speculative_context = False
+    agent.static_prompt_prefix = True
+    agent._last_prompts, agent._last_prompts_lock = OrderedDict(), threading.Lock()
+    agent._detect_user_intent = lambda *args: {"type": "general_chat", "confidence": 0.9}
+    agent._decide_verbosity = lambda *args: "SHORT"
+    agent.memory_manager = SimpleNamespace(build_context=lambda user_id, query: {"sections": {
+        "profile": f"User Profile:\nName: User {user_id}",
+        "recent": f"User: earlier message {query}\nCarely: earlier reply",
+    }, "dropped": [], "total_ms": 0.0})
+    return agent
+
+
+def test_system_message_byte_stable(monkeypatch):
+    agent = make_agent()
+    names = {1: "Dorothy", 2: "Walter"}
+    monkeypatch.setattr(companion_agent.UserCRUD, "get_user",
+                        staticmethod(lambda user_id: SimpleNamespace(name=names[user_id])))
+    systems, users = [], []
+    for offset_h, user_id, message in [(0, 1, "How are you?"), (5, 2, "I feel lonely today"),
+                                       (30, 1, "Tell me about my garden")]:
+        at = now_central() + timedelta(hours=offset_h)
+        monkeypatch.setattr(companion_agent, "now_central", lambda: at)
+        messages = agent._prepare_response(user_id, message)["request"]["messages"]
+        systems.append(messages[0]["content"].encode("utf-8"))
+        users.append(messages[1]["content"])
+
+    assert systems == [PERSONA_PROMPT.encode("utf-8")] * 3
+    assert len(set(users)) == 3  # Time, user and memory all live in the user message
+
+
+def test_prefix_measured_per_user():
+    agent = make_agent()
+    metrics.reset()
+    persona = {"role": "system", "content": PERSONA_PROMPT}
+    for turn in range(2):
+        for user_id in (1, 2):  # Interleaved users
+            agent._observe_prompt_tokens("chat", [
+                persona, {"role": "user", "content": f"User {user_id}: " + "hello " * (turn + 1)}],
+                user_id)
+
+    prefix = metrics.snapshot()["histograms"]["prompt_prefix_bytes.chat"]
+    # Each user's second turn shares its own first turn, not the other user's
+    assert prefix["count"] == 2
+    assert prefix["min"] > len(PERSONA_PROMPT.encode("utf-8")) + len("user\nUser 1: hello ")
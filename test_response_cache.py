@@ -0,0 +1,64 @@
+"""
+Test script for the LLM response cache
+Covers normalized-message hits, context-hash misses, TTL expiry, per-user
+invalidation and nearest-neighbour matching
+"""
+
+import time
+
+from app.agents.response_cache import ResponseCache
+
+
+def keyword_embedding(texts):
+    """Tiny deterministic embedder: bag of a few medication words"""
+    vocabulary = ["medications", "medicine", "pills", "take", "what", "today", "how", "many"]
+    return [[float(word in text.split()) for word in vocabulary] for text in texts]
+
+
+def test_normalized_message_and_context_hash():
+    """Case and punctuation do not matter; the prompt's data context does"""
+    cache = ResponseCache(ttl_s=60)
+    context = cache.context_hash(["- Lisinopril (Schedule: 09:00)"], "No medications logged today yet.")
+
+    cache.put("ask_medication", "What medications do I take?", context, "You take Lisinopril.", user_id=1)
+
+    assert cache.get("ask_medication", "what medications do i take ?", context, user_id=1) == "You take Lisinopril."
+    assert cache.get("ask_medication", "What medications do I take", context, user_id=1) is None
+    assert cache.get("ask_medication", "What medications do I take?", context, user_id=2) is None
+    changed = cache.context_hash(["- Lisinopril (Schedule: 09:00)"], "Medications taken today: ...")
+    assert cache.get("ask_medication", "What medications do I take?", changed, user_id=1) is None
+
+
+def test_ttl_and_invalidation():
+    """Entries expire and are dropped when the user's medication data changes"""
+    cache = ResponseCache(ttl_s=0.05)
+    cache.put("ask_medication", "how many pills today?", "ctx", "Two.", user_id=1)
+    cache.put("intent", "how many pills today?", "ctx", "{}")
+    time.sleep(0.1)
+    assert cache.get("ask_medication", "how many pills today?", "ctx", user_id=1) is None
+
+    cache = ResponseCache(ttl_s=60)
+    cache.put("ask_medication", "how many pills today?", "ctx", "Two.", user_id=1)
+    cache.put("intent", "how many pills today?", "ctx", "{}")
+    cache.on_data_change("medication_log", 1)
+    assert cache.get("ask_medication", "how many pills today?", "ctx", user_id=1) is None
+    assert cache.get("intent", "how many pills today?", "ctx") == "{}"
+
+
+def test_semantic_match():
+    """Similar phrasings hit when semantic matching is enabled for the call"""
+    cache = ResponseCache(ttl_s=60, similarity_threshold=0.85, embedding_function=keyword_embedding)
+    cache.put("ask_medication", "what medications do i take today", "ctx", "Lisinopril.",
+              user_id=1, semantic=True)
+
+    assert cache.get("ask_medication", "medications what i take today", "ctx",
+                     user_id=1, semantic=True) == "Lisinopril."
+    assert cache.get("ask_medication", "medications what i take today", "ctx", user_id=1) is None
+    assert cache.get("ask_medication", "how many pills", "ctx", user_id=1, semantic=True) is None
+
+
+if __name__ == "__main__":
+    test_normalized_message_and_context_hash()
+    test_ttl_and_invalidation()
+    test_semantic_match()
+    print("✅ RESPONSE CACHE TESTS PASSED")
@@ -0,0 +1,101 @@
+"""
+Test script for incremental sentence limiting in streamed responses
+Verifies that SentenceLimiter keeps the same sentences as
+CompanionAgent._limit_to_sentences whatever the chunk boundaries are, and that
+streamed replies count towards per-model calls and cost
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from app.agents.companion_agent import CompanionAgent
+from app.agents.response_stream import ResponseStream, SentenceLimiter
+from utils.llm_backends import make_chunk
+from utils.metrics import metrics
+
+SAMPLE_REPLIES = [
+    "Hello there. I am fine! How are you? The weather is lovely. Shall we talk?",
+    "That sounds wonderful... Tell me more about your garden!",
+    "Good morning, Margaret. Did you sleep well?",
+    "Your next dose is at 8:00 PM. Remember to take it with food. I'll remind you.",
+    "One sentence only",
+    "",
+]
+
+
+def stream_through_limiter(text: str, max_sentences: int, chunk_sizes) -> str:
+    limiter = SentenceLimiter(max_sentences)
+    shown, position = [], 0
+    for size in chunk_sizes:
+        if position >= len(text) or limiter.done:
+            break
+        shown.append(limiter.feed(text[position:position + size]))
+        position += size
+    return "".join(shown)
+
+
+def test_limiter_matches_blocking_limit():
+    """Streamed output keeps exactly the sentences the blocking limit keeps"""
+    rng = random.Random(7)
+    for text in SAMPLE_REPLIES:
+        for max_sentences in (1, 2, 3, 4):
+            expected = CompanionAgent._limit_to_sentences(None, text, max_sentences=max_sentences)
+            for _ in range(20):
+                chunk_sizes = [rng.randint(1, 6) for _ in range(len(text) + 1)]
+                streamed = stream_through_limiter(text, max_sentences, chunk_sizes)
+                # Blocking version re-joins sentences with single spaces
+                assert streamed.split() == expected.split(), (text, max_sentences)
+
+
+def test_no_limit_passes_everything():
+    """LONG replies (no sentence limit) stream unchanged"""
+    limiter = SentenceLimiter(None)
+
+    assert limiter.feed("One. Two. ") + limiter.feed("Three.") == "One. Two. Three."
+    assert not limiter.done
+
+
+def stream_turn(chunks, sentence_limit=None):
+    """Run one streamed LLM turn against canned chunks; returns the metric deltas"""
+    agent = CompanionAgent.__new__(CompanionAgent)
+    agent._last_prompts, agent._last_prompts_lock = OrderedDict(), threading.Lock()
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **params: iter(chunks))))
+    agent._finalize_response = lambda turn, reply: {"response": reply}
+    model = "llama-3.3-70b-versatile"
+    turn = {"user_id": 1, "is_emergency": False, "sentence_limit": sentence_limit, "request": {
+        "model": model, "messages": [{"role": "system", "content": "S" * 4000},
+                                     {"role": "user", "content": "How are you?"}]}}
+    before = metrics.snapshot()["counters"]
+    reply = "".join(ResponseStream(agent, 1, "How are you?")._stream_reply(agent, turn, 0.0, None))
+    after = metrics.snapshot()["counters"]
+    delta = {name: after.get(name, 0) - before.get(name, 0)
+             for name in (f"llm.calls.{model}", "llm.cost_usd", "llm.usage_estimated.chat")}
+    return reply, delta
+
+
+def test_stream_records_usage():
+    """Reported usage is priced; a stream cut at the sentence limit is estimated"""
+    final = make_chunk("", finish_reason="stop")
+    final.x_groq = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=10))
+    reply, delta = stream_turn([make_chunk("Hello there. "), make_chunk("All good."), final])
+    assert reply == "Hello there. All good."
+    assert delta["llm.calls.llama-3.3-70b-versatile"] == 1
+    assert abs(delta["llm.cost_usd"] - (1000 * 0.59 + 10 * 0.79) / 1e6) < 1e-12
+    assert delta["llm.usage_estimated.chat"] == 0
+
+    reply, delta = stream_turn([make_chunk("Hello there. "), make_chunk("All good. "),
+                                make_chunk("More."), final], sentence_limit=1)
+    assert reply == "Hello there."
+    assert delta["llm.calls.llama-3.3-70b-versatile"] == 1
+    assert delta["llm.usage_estimated.chat"] == 1
+    assert delta["llm.cost_usd"] > 0
+
+
+if __name__ == "__main__":
+    test_limiter_matches_blocking_limit()
+    test_no_limit_passes_everything()
+    test_stream_records_usage()
+    print("✅ RESPONSE STREAM TESTS PASSED")
@@ -0,0 +1,65 @@
+"""
+Test script for the process-wide long-term memory
+Concurrent first use builds one instance, and memory managers resolve to it
+unless given their own
+"""
+
+import threading
+import time
+
+from app.memory import long_term_memory
+from app.memory.memory_manager import MemoryManager
+
+
+class SlowLongTermMemory:
+    built = 0
+
+    def __init__(self):
+        time.sleep(0.05)  # Model load
+        SlowLongTermMemory.built += 1
+
+
+def test_one_shared_instance(monkeypatch):
+    monkeypatch.setattr(long_term_memory, "LongTermMemory", SlowLongTermMemory)
+    monkeypatch.setattr(long_term_memory, "_shared_memory", None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(long_term_memory.get_long_term_memory()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SlowLongTermMemory.built == 1
+    assert len({id(result) for result in results}) == 1
+
+    # Managers are built without touching the store (tables live in carely.db)
+    managers = [MemoryManager.__new__(MemoryManager) for _ in range(2)]
+    for manager in managers:
+        manager._long_term = None
+    assert managers[0].long_term is managers[1].long_term is results[0]
+    managers[1].long_term = own = object()
+    assert managers[1].long_term is own
+
+
+def test_warm_up_never_waits_for_the_load(monkeypatch):
+    release = threading.Event()
+
+    class BlockedLongTermMemory:
+        def __init__(self):
+            release.wait(5)  # Model load in progress
+            self._embedder = lambda texts: [[0.0] for _ in texts]
+
+    monkeypatch.setattr(long_term_memory, "LongTermMemory", BlockedLongTermMemory)
+    monkeypatch.setattr(long_term_memory, "_shared_memory", None)
+    monkeypatch.setattr(long_term_memory, "_warm_up_thread", None)
+    monkeypatch.setattr(long_term_memory, "WARM_UP_ENABLED", True)
+    try:
+        thread = long_term_memory.warm_up_long_term_memory()
+        time.sleep(0.05)  # The warm-up thread now holds the load lock
+        start = time.perf_counter()
+        assert long_term_memory.warm_up_long_term_memory() is thread
+        assert time.perf_counter() - start < 0.5
+    finally:
+        release.set()
+    thread.join(5)
+    assert isinstance(long_term_memory.get_long_term_memory(), BlockedLongTermMemory)
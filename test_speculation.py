@@ -0,0 +1,64 @@
+"""
+Test script for speculative context retrieval
+The memory fetch started before intent detection is cancelled whenever the
+turn ends without collecting it, including when a step raises first
+"""
+
+from concurrent.futures import Future
+
+from app.agents import companion_agent
+from app.agents.companion_agent import CompanionAgent
+from app.agents.intent_router import get_intent_router
+
+
+class FakeMemory:
+    def __init__(self):
+        self.cancelled = 0
+        self.collected = 0
+
+    def start_context(self, user_id, query):
+        return {"futures": {}}
+
+    def cancel_context(self, pending):
+        self.cancelled += 1
+
+    def collect_context(self, pending):
+        self.collected += 1
+        return {"sections": {}, "dropped": [], "total_ms": 0.0}
+
+
+def make_agent(monkeypatch):
+    agent = CompanionAgent.__new__(CompanionAgent)
+    agent.intent_router = get_intent_router()
+    agent.speculative_context = True
+    agent.memory_manager = FakeMemory()
+    agent._error_response = lambda user_id, message, conversation_type, e: {"error": str(e)}
+    pii = Future()
+    monkeypatch.setattr(companion_agent, "get_context_pool",
+                        lambda: type("Pool", (), {"submit": lambda self, *args: pii})())
+    return agent, pii
+
+
+def test_cancelled_when_turn_fails_before_collecting(monkeypatch):
+    agent, pii = make_agent(monkeypatch)
+
+    def fail(*args):
+        raise TimeoutError("intent call timed out")
+    agent._detect_user_intent = fail
+
+    assert agent._prepare_response(1, "How are you feeling today?") == {"error": "intent call timed out"}
+    assert agent.memory_manager.cancelled == 1
+    assert pii.cancelled()
+
+
+def test_not_cancelled_after_collecting(monkeypatch):
+    agent, pii = make_agent(monkeypatch)
+    agent._detect_user_intent = lambda *args: {"type": "general_chat", "confidence": 0.9}
+
+    def fail(user_id):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(companion_agent.UserCRUD, "get_user", staticmethod(fail))
+
+    assert agent._prepare_response(1, "How are you feeling today?") == {"error": "database is locked"}
+    assert agent.memory_manager.collected == 1
+    assert agent.memory_manager.cancelled == 0
@@ -0,0 +1,67 @@
+"""
+Test script for per-stage tracing
+Verifies that spans attach to the active trace, feed histograms and that
+finished traces are written to the trace file
+"""
+
+import json
+import os
+import tempfile
+
+from utils.metrics import metrics
+from utils.tracing import Tracer
+
+
+def test_spans_attach_to_trace():
+    """Spans inside a trace are recorded with offsets; spans outside only feed histograms"""
+    tracer = Tracer(path="", enabled=True)
+    metrics.reset()
+
+    with tracer.span("db.save_conversation"):
+        pass
+    with tracer.trace("chat_turn", user_id=1):
+        with tracer.span("intent"):
+            pass
+        tracer.record("memory.recent", 12.5, status="ok")
+        tracer.annotate(branch="llm")
+
+    trace = tracer.recent()[0]
+    assert [span["name"] for span in trace["spans"]] == ["intent", "memory.recent"]
+    assert trace["attrs"] == {"user_id": 1, "branch": "llm"}
+    assert trace["spans"][1]["status"] == "ok"
+    assert trace["total_ms"] >= 0
+    assert metrics.get_histogram("span.db.save_conversation_ms")["count"] == 1
+    assert set(tracer.stage_summary()) == {"db.save_conversation", "intent", "memory.recent", "chat_turn"}
+
+
+def test_explicit_trace_and_file():
+    """start/activate/finish is equivalent to trace(); finished traces go to the file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces", "chat_turns.jsonl")
+        tracer = Tracer(path=path, sample_rate=1.0, enabled=True)
+
+        trace = tracer.start("chat_turn", streamed=True)
+        with tracer.activate(trace):
+            with tracer.span("prompt_packing"):
+                pass
+        tracer.record("llm.chat", 40.0, trace=trace)
+        tracer.finish(trace)
+        tracer.finish(trace)  # Idempotent
+        tracer.flush()
+
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 1
+        assert [span["name"] for span in lines[0]["spans"]] == ["prompt_packing", "llm.chat"]
+
+    disabled = Tracer(path="", enabled=False)
+    with disabled.trace("chat_turn"):
+        with disabled.span("intent"):
+            pass
+    assert disabled.recent() == []
+
+
+if __name__ == "__main__":
+    test_spans_attach_to_trace()
+    test_explicit_trace_and_file()
+    print("✅ TRACING TESTS PASSED")
@@ -0,0 +1,37 @@
+"""
+Test script for partitioned long-term memory
+Covers per-user / bucket collection names and migrating the shared collection
+to one collection per user (content-seeded embeddings, no model needed)
+"""
+
+from datetime import datetime
+
+from app.memory.long_term_memory import LongTermMemory
+from app.memory.partition_migration import migrate_partitions
+
+
+def test_partition_names(tmp_path, embedder):
+    per_user = LongTermMemory(str(tmp_path), embedder=embedder, partitioning="user")
+    bucketed = LongTermMemory(str(tmp_path), embedder=embedder, partitioning="bucket", buckets=4)
+    assert per_user.partition_name(7) == "carely_memory_user_7"
+    assert bucketed.partition_name(7) == bucketed.partition_name(7)
+    assert len({bucketed.partition_name(user_id) for user_id in range(100)}) == 4
+    assert per_user._where(7) is None
+    assert bucketed._where(7, type="summary") == {"$and": [{"user_id": "7"}, {"type": "summary"}]}
+
+
+def test_migrate_shared_to_per_user(tmp_path, monkeypatch, embedder):
+    monkeypatch.setenv("CARELY_EMBEDDING_CACHE_DIR", str(tmp_path / "cache"))
+    shared = LongTermMemory(str(tmp_path), embedder=embedder, partitioning="shared")
+    for user_id in (1, 2):
+        for conversation_id in range(3):
+            shared.add_conversation(user_id, conversation_id, f"hello {user_id} {conversation_id}",
+                                    "hi there", datetime.now())
+
+    per_user = LongTermMemory(str(tmp_path), embedder=embedder, partitioning="user")
+    assert migrate_partitions(shared, per_user) == 6
+    assert per_user.partition_names() == ["carely_memory_user_1", "carely_memory_user_2"]
+    assert len(per_user.get_user_memory_items(2)) == 3
+
+    per_user.clear_user_memory(2)
+    assert per_user.partition_names() == ["carely_memory_user_1"]
@@ -0,0 +1,67 @@
+"""
+Test script for the NumPy vector store
+Covers upsert/replace/delete persistence, metadata filters and exact cosine
+top-k results
+"""
+
+import os
+
+import numpy as np
+
+from app.memory.vector_store import NumpyStore, matches_where
+
+
+def test_where_filters():
+    metadata = {"user_id": "3", "type": "summary", "epoch": 10}
+    assert matches_where(metadata, None)
+    assert matches_where(metadata, {"user_id": "3"})
+    assert matches_where(metadata, {"$and": [{"user_id": "3"}, {"type": {"$ne": "conversation"}}]})
+    assert matches_where(metadata, {"$or": [{"type": "fact"}, {"epoch": {"$gte": 10}}]})
+    assert not matches_where(metadata, {"type": {"$in": ["conversation", "fact"]}})
+
+
+def test_numpy_collection_round_trip(tmp_path):
+    rng = np.random.default_rng(5)
+    vectors = rng.standard_normal((20, 16)).astype(np.float32)
+    store = NumpyStore(str(tmp_path))
+    collection = store.get_collection("memory_user_1")
+    collection.upsert(ids=[f"doc{i}" for i in range(20)], embeddings=vectors,
+                      documents=[f"text {i}" for i in range(20)],
+                      metadatas=[{"type": "summary" if i % 2 else "conversation"} for i in range(20)])
+    collection.upsert(ids=["doc0"], embeddings=vectors[:1], documents=["text zero"],
+                      metadatas=[{"type": "conversation"}])
+    collection.delete(ids=["doc19"])
+
+    # Reopened from disk (memory-mapped)
+    collection = store.get_collection("memory_user_1")
+    assert collection.count() == 19
+    assert collection.get(ids=["doc0"])["documents"] == ["text zero"]
+
+    query = vectors[4] + 0.1 * vectors[7]
+    result = collection.query(query_embeddings=[query], n_results=3, where={"type": "conversation"})
+    unit = vectors[:19] / np.linalg.norm(vectors[:19], axis=1, keepdims=True)
+    distances = 1 - unit @ (query / np.linalg.norm(query))
+    expected = [f"doc{i}" for i in np.argsort(distances) if i % 2 == 0][:3]
+    assert result["ids"][0] == expected
+    assert result["ids"][0][0] == "doc4"
+    assert abs(result["distances"][0][0] - distances[4]) < 1e-2
+
+    store.delete_collection("memory_user_1")
+    assert store.list_collections() == []
+
+
+def test_two_writers_keep_each_others_items(tmp_path):
+    """A second handle on the collection (e.g. a backfill process) is never overwritten"""
+    app = NumpyStore(str(tmp_path)).get_collection("user_1")
+    backfill = NumpyStore(str(tmp_path)).get_collection("user_1")
+    app.upsert(ids=["a"], embeddings=[[1.0, 0.0]], documents=["a"], metadatas=[{"n": 1}])
+    backfill.upsert(ids=["b", "c"], embeddings=[[0.0, 1.0], [1.0, 1.0]], documents=["b", "c"],
+                    metadatas=[{"n": 2}, {"n": 3}])
+    app.upsert(ids=["d"], embeddings=[[-1.0, 0.0]], documents=["d"], metadatas=[{"n": 4}])
+    backfill.delete(ids=["a"])
+
+    for collection in (app, backfill, NumpyStore(str(tmp_path)).get_collection("user_1")):
+        assert sorted(collection.get()["ids"]) == ["b", "c", "d"]
+        assert collection.query([[0.0, 1.0]], n_results=1)["ids"] == [["b"]]
+    # Only the current and previous generations stay on disk
+    assert len([name for name in os.listdir(tmp_path / "user_1") if name.startswith("vectors.")]) == 2
@@ -1,12 +1,13 @@
 from utils.timezone_utils import now_central
-import os
-from groq import Groq
 from typing import Dict, Any
 import json
 import re
+import threading
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+from utils.llm_gateway import get_llm_gateway
+
 # Load environment variables
 load_dotenv()
 
@@ -24,7 +25,7 @@ class EmergencyDetector:
     DEBOUNCE_MINUTES = 5
     
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = get_llm_gateway()
         self.model = "llama-3.3-70b-versatile"
     
     def _check_keywords(self, text: str) -> Dict[str, Any]:
@@ -96,7 +97,19 @@ class EmergencyDetector:
         """Mark that an alert was sent for this user (for debounce tracking)"""
         self._last_alert_times[user_id] = now_central()
 
+# Global instance for easy access
+_detector = None
+_detector_lock = threading.Lock()
+
+def get_detector() -> EmergencyDetector:
+    """Get singleton emergency detector instance (thread-safe)"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = EmergencyDetector()
+    return _detector
+
 def detect_emergency(text: str, user_id: int = None) -> Dict[str, Any]:
     """Helper function to detect emergency in text"""
-    detector = EmergencyDetector()
-    return detector.detect_emergency(text, user_id)
+    return get_detector().detect_emergency(text, user_id)
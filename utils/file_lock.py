@@ -0,0 +1,43 @@
+"""
+Advisory inter-process file locks
+Serialises writers in different processes (app, API, backfill, migrations)
+that share files under data/. POSIX only: where fcntl is unavailable the lock
+only excludes threads of this process.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# flock is per open file description, so threads of one process also need
+# a process-local lock per path
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on `path` (created if missing) for the block; not reentrant"""
+    path = os.path.abspath(path)
+    with _thread_lock(path):
+        with open(path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,329 @@
+"""
+Offline LLM backends for load tests and latency regression runs
+Drop-in stand-ins for `Groq().chat.completions`: a recorder that writes real
+completions to a JSONL cassette, a replayer that serves them back
+deterministically, and a synthetic backend with configurable latency and
+token rate. Selected through CARELY_LLM_BACKEND (see build_backend).
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("groq", "record", "replay", "synthetic")
+DEFAULT_CASSETTE = os.getenv("CARELY_LLM_CASSETTE", "data/llm_cassette.jsonl")
+
+# Parameters that identify a request (stream is left out: a recording can be
+# replayed either way)
+_KEY_PARAMS = ("model", "messages", "temperature", "max_tokens", "response_format", "stop")
+_WORD = re.compile(r"\S+\s*")
+
+# Synthetic speed of other models relative to the configured (large-model)
+# numbers: (first-token latency factor, token rate factor)
+SYNTHETIC_MODEL_SPEED = {
+    "llama-3.1-8b-instant": (0.5, 2.7),
+}
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Stable hash of the parts of a request that determine its reply"""
+    blob = json.dumps({name: params.get(name) for name in _KEY_PARAMS},
+                      sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+def shape_key(params: Dict[str, Any]) -> str:
+    """Hash of model + system prompts: identifies the call site, not the message"""
+    system = [m.get("content") for m in params.get("messages") or [] if m.get("role") == "system"]
+    blob = json.dumps([params.get("model"), system], default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+def estimate_completion_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def make_completion(content: str, model: str = None, prompt_tokens: int = 0,
+                    finish_reason: str = "stop") -> SimpleNamespace:
+    """Object shaped like a Groq ChatCompletion"""
+    completion_tokens = estimate_completion_tokens(content)
+    message = SimpleNamespace(content=content, role="assistant", tool_calls=None)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens),
+    )
+
+
+def make_chunk(text: str, finish_reason: str = None) -> SimpleNamespace:
+    """Object shaped like a Groq ChatCompletionChunk"""
+    delta = SimpleNamespace(content=text, role="assistant")
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta,
+                                                    finish_reason=finish_reason)])
+
+
+def paced_chunks(content: str, first_token_s: float, tokens_per_s: float) -> Iterator[SimpleNamespace]:
+    """Stream `content` word by word: first word after first_token_s, then at tokens_per_s"""
+    time.sleep(first_token_s)
+    words = _WORD.findall(content) or [""]
+    per_word = 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+    for index, word in enumerate(words):
+        if index and per_word:
+            time.sleep(per_word)
+        yield make_chunk(word)
+    yield make_chunk("", finish_reason="stop")
+
+
+class _Completions:
+    """Gives a backend the `client.chat.completions.create` shape"""
+
+    def __init__(self, create: Callable):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+class SyntheticBackend(_Completions):
+    """
+    Generates replies locally. JSON requests get the example object from their
+    own prompt (so the agent's parsers succeed); other requests get filler text.
+    Latency is log-normal around a median time-to-first-token plus a token rate,
+    scaled for faster models (SYNTHETIC_MODEL_SPEED).
+    """
+
+    def __init__(self, first_token_ms: float = None, sigma: float = None,
+                 tokens_per_s: float = None, reply_tokens: int = None, seed: int = None):
+        """
+        Args:
+            first_token_ms: Median time to first token
+            sigma: Log-normal spread of the first-token latency (0 = fixed)
+            tokens_per_s: Generation speed after the first token
+            reply_tokens: Length of free-text replies (capped by max_tokens)
+            seed: Seed for reproducible latency samples
+        """
+        super().__init__(self.create)
+        self.first_token_ms = first_token_ms if first_token_ms is not None else float(
+            os.getenv("CARELY_LLM_SYNTHETIC_FIRST_TOKEN_MS", "250"))
+        self.sigma = sigma if sigma is not None else float(
+            os.getenv("CARELY_LLM_SYNTHETIC_SIGMA", "0.35"))
+        self.tokens_per_s = tokens_per_s if tokens_per_s is not None else float(
+            os.getenv("CARELY_LLM_SYNTHETIC_TOKENS_PER_S", "250"))
+        self.reply_tokens = reply_tokens or int(os.getenv("CARELY_LLM_SYNTHETIC_REPLY_TOKENS", "60"))
+        self._random = random.Random(seed if seed is not None else os.getenv("CARELY_LLM_SYNTHETIC_SEED"))
+        self._lock = threading.Lock()
+
+    def sample_first_token_s(self, model: str = None) -> float:
+        with self._lock:
+            factor = self._random.lognormvariate(0.0, self.sigma) if self.sigma > 0 else 1.0
+        return self.first_token_ms * SYNTHETIC_MODEL_SPEED.get(model, (1.0, 1.0))[0] * factor / 1000.0
+
+    def tokens_per_s_for(self, model: str = None) -> float:
+        return self.tokens_per_s * SYNTHETIC_MODEL_SPEED.get(model, (1.0, 1.0))[1]
+
+    @staticmethod
+    def _json_example(params: Dict[str, Any]) -> Optional[str]:
+        """First JSON object literal in the prompts, if the request asks for JSON"""
+        messages = params.get("messages") or []
+        wants_json = params.get("response_format") is not None or any(
+            "JSON" in (m.get("content") or "") for m in messages)
+        if not wants_json:
+            return None
+        decoder = json.JSONDecoder()
+        for message in reversed(messages):
+            text = message.get("content") or ""
+            for match in re.finditer(r"\{", text):
+                try:
+                    value, _ = decoder.raw_decode(text[match.start():])
+                except ValueError:
+                    continue
+                if isinstance(value, dict) and value:
+                    return json.dumps(value)
+        return "{}"
+
+    def reply_for(self, params: Dict[str, Any]) -> str:
+        example = self._json_example(params)
+        if example is not None:
+            return example
+        tokens = min(self.reply_tokens, params.get("max_tokens") or self.reply_tokens)
+        words = ["That", "sounds", "lovely.", "Tell", "me", "more", "about", "your", "day."]
+        return " ".join(itertools.islice(itertools.cycle(words), max(1, tokens * 3 // 4)))
+
+    def create(self, stream: bool = False, **params):
+        content = self.reply_for(params)
+        first_token_s = self.sample_first_token_s(params.get("model"))
+        tokens_per_s = self.tokens_per_s_for(params.get("model"))
+        if stream:
+            return paced_chunks(content, first_token_s, tokens_per_s)
+        generation_s = estimate_completion_tokens(content) / tokens_per_s if tokens_per_s > 0 else 0.0
+        time.sleep(first_token_s + generation_s)
+        prompt_tokens = sum(len(m.get("content") or "") for m in params.get("messages") or []) // 4
+        return make_completion(content, params.get("model"), prompt_tokens)
+
+
+class RecordingBackend(_Completions):
+    """Passes calls to a real client and appends every completion to a cassette"""
+
+    def __init__(self, inner, path: str = None):
+        """
+        Args:
+            inner: Real client exposing chat.completions.create
+            path: Cassette file (JSONL)
+        """
+        super().__init__(self.create)
+        self.inner = inner
+        self.path = path or DEFAULT_CASSETTE
+        self._lock = threading.Lock()
+
+    def _write(self, params: Dict[str, Any], content: str, latency_ms: float,
+               first_token_ms: Optional[float], usage: Any):
+        record = {
+            "key": request_key(params),
+            "shape": shape_key(params),
+            "model": params.get("model"),
+            "content": content,
+            "latency_ms": round(latency_ms, 2),
+            "first_token_ms": None if first_token_ms is None else round(first_token_ms, 2),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+        }
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def create(self, stream: bool = False, **params):
+        start = time.perf_counter()
+        if not stream:
+            response = self.inner.chat.completions.create(**params)
+            self._write(params, response.choices[0].message.content,
+                        (time.perf_counter() - start) * 1000.0, None,
+                        getattr(response, "usage", None))
+            return response
+        return self._record_stream(params, start)
+
+    def _record_stream(self, params: Dict[str, Any], start: float):
+        stream = self.inner.chat.completions.create(stream=True, **params)
+        parts, first_token_ms = [], None
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000.0
+                    parts.append(chunk.choices[0].delta.content)
+                yield chunk
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+            # A stream stopped early (sentence limit) is still a usable recording
+            self._write(params, "".join(parts), (time.perf_counter() - start) * 1000.0,
+                        first_token_ms, None)
+
+
+class ReplayMissError(LookupError):
+    """No recorded completion matches the request"""
+
+
+class ReplayBackend(_Completions):
+    """
+    Serves completions from a cassette. Exact request matches are used first;
+    otherwise recordings from the same call site (model + system prompt) are
+    served in rotation, since user prompts carry times and live context.
+    """
+
+    def __init__(self, path: str = None, on_miss: str = None, pace: bool = None,
+                 fallback: Optional[SyntheticBackend] = None):
+        """
+        Args:
+            path: Cassette file written by RecordingBackend
+            on_miss: "synthetic" (generate a reply) or "error" (raise ReplayMissError)
+            pace: Sleep for the recorded latency (default: CARELY_LLM_REPLAY_PACE)
+            fallback: Synthetic backend for misses
+        """
+        super().__init__(self.create)
+        self.path = path or DEFAULT_CASSETTE
+        self.on_miss = on_miss or os.getenv("CARELY_LLM_REPLAY_ON_MISS", "synthetic")
+        self.pace = (os.getenv("CARELY_LLM_REPLAY_PACE", "true").lower() in ("1", "true", "yes")
+                     if pace is None else pace)
+        self.fallback = fallback or SyntheticBackend()
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_shape: Dict[str, List[Dict[str, Any]]] = {}
+        self._turns: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logger.warning(f"LLM cassette {self.path} not found; every call is a miss")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._by_key.setdefault(record["key"], []).append(record)
+                self._by_shape.setdefault(record["shape"], []).append(record)
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._by_key.values())
+
+    def _next(self, table: Dict[str, List[Dict[str, Any]]], key: str) -> Optional[Dict[str, Any]]:
+        """Next recording for a key, cycling deterministically through repeats"""
+        records = table.get(key)
+        if not records:
+            return None
+        with self._lock:
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+        return records[turn % len(records)]
+
+    def create(self, stream: bool = False, **params):
+        record = self._next(self._by_key, request_key(params)) or self._next(
+            self._by_shape, shape_key(params))
+        if record is None:
+            if self.on_miss == "error":
+                raise ReplayMissError(f"No recording for {params.get('model')} request")
+            return self.fallback.create(stream=stream, **params)
+
+        latency_s = record["latency_ms"] / 1000.0 if self.pace else 0.0
+        if stream:
+            first_token_s = ((record.get("first_token_ms") or record["latency_ms"] * 0.25) / 1000.0
+                             if self.pace else 0.0)
+            tokens = estimate_completion_tokens(record["content"])
+            rate = tokens / max(1e-3, latency_s - first_token_s) if self.pace else 0.0
+            return paced_chunks(record["content"], first_token_s, rate)
+        time.sleep(latency_s)
+        return make_completion(record["content"], record.get("model"),
+                               record.get("prompt_tokens") or 0)
+
+
+def build_backend(name: str, real_client_factory: Callable[[], Any]):
+    """
+    Client for a CARELY_LLM_BACKEND value
+
+    Args:
+        name: "groq" (live), "record" (live + cassette), "replay" or "synthetic"
+        real_client_factory: Builds the live Groq client
+
+    Returns:
+        Object exposing chat.completions.create
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    if name == "synthetic":
+        return SyntheticBackend()
+    if name == "replay":
+        return ReplayBackend()
+    client = real_client_factory()
+    return RecordingBackend(client) if name == "record" else client
@@ -0,0 +1,159 @@
+"""
+Latency-aware circuit breakers for LLM call types
+Each call type (intent, chat, sentiment, ...) has a latency budget and a rolling
+window of outcomes. Calls slower than the budget count as failures; when too
+many recent calls fail the breaker opens and callers use their local fallback
+until a cool-down has passed and a probe call succeeds
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from utils.metrics import Histogram, metrics
+
+DEFAULT_BUDGET_MS = float(os.getenv("CARELY_LLM_BUDGET_MS", "3000"))
+# Budgets for call types with their own latency expectations; override one with
+# CARELY_LLM_BUDGET_MS_<CALL_TYPE> (e.g. CARELY_LLM_BUDGET_MS_CHAT=5000)
+CALL_BUDGETS_MS = {
+    "intent": 1500.0,
+    "verbosity": 1000.0,
+    "medication_extraction": 1500.0,
+    "medication_turn": 2500.0,
+    "sentiment": 1500.0,
+    "chat": 4000.0,
+    "ask_medication": 4000.0,
+    "greeting": 6000.0,
+}
+DEFAULT_WINDOW = int(os.getenv("CARELY_LLM_BREAKER_WINDOW", "20"))
+DEFAULT_FAILURE_RATIO = float(os.getenv("CARELY_LLM_BREAKER_FAILURE_RATIO", "0.5"))
+DEFAULT_MIN_SAMPLES = int(os.getenv("CARELY_LLM_BREAKER_MIN_SAMPLES", "10"))
+DEFAULT_COOLDOWN_S = float(os.getenv("CARELY_LLM_BREAKER_COOLDOWN_S", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# Gauge values for llm.breaker.<call type>
+STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def budget_for(call_type: str) -> float:
+    """Latency budget (ms) of a call type"""
+    override = os.getenv(f"CARELY_LLM_BUDGET_MS_{call_type.upper()}")
+    if override:
+        return float(override)
+    return CALL_BUDGETS_MS.get(call_type, DEFAULT_BUDGET_MS)
+
+
+class LatencyBreaker:
+    """Circuit breaker for one call type, tripped by slow or failed calls"""
+
+    def __init__(self, call_type: str, budget_ms: float = None, window: int = None,
+                 failure_ratio: float = None, min_samples: int = None,
+                 cooldown_s: float = None):
+        """
+        Args:
+            call_type: Call type this breaker guards (metrics label)
+            budget_ms: Latency above which a call counts as failed
+            window: Recent calls considered
+            failure_ratio: Fraction of failed calls in the window that opens the breaker
+            min_samples: Calls needed before the breaker can open
+            cooldown_s: Time the breaker stays open before a probe call is let through
+        """
+        self.call_type = call_type
+        self.budget_ms = budget_for(call_type) if budget_ms is None else budget_ms
+        self.window = window or DEFAULT_WINDOW
+        self.failure_ratio = DEFAULT_FAILURE_RATIO if failure_ratio is None else failure_ratio
+        self.min_samples = min_samples or DEFAULT_MIN_SAMPLES
+        self.cooldown_s = DEFAULT_COOLDOWN_S if cooldown_s is None else cooldown_s
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=self.window)  # True = failed or over budget
+        self._latencies = Histogram(reservoir_size=self.window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the LLM now (False = use the local fallback)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                # One probe at a time decides whether the breaker closes
+                self._probing = True
+                return True
+        metrics.increment(f"llm.degraded.{self.call_type}")
+        return False
+
+    def is_open(self) -> bool:
+        """True while calls are being short-circuited (no side effects)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            return not (self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_s)
+
+    def record(self, latency_ms: float, ok: bool = True):
+        """
+        Record the outcome of a call
+
+        Args:
+            latency_ms: Time the caller waited for the answer
+            ok: False if the call raised
+        """
+        failed = not ok or latency_ms > self.budget_ms
+        with self._lock:
+            self._latencies.observe(latency_ms)
+            self._outcomes.append(failed)
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+                if failed:
+                    self._open()
+                else:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+            elif (self.state == CLOSED and len(self._outcomes) >= self.min_samples
+                  and sum(self._outcomes) >= self.failure_ratio * len(self._outcomes)):
+                self._open()
+            metrics.set_gauge(f"llm.latency_p50_ms.{self.call_type}", self._latencies.percentile(50))
+            metrics.set_gauge(f"llm.latency_p95_ms.{self.call_type}", self._latencies.percentile(95))
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            return self._latencies.percentile(pct)
+
+    def hedge_after_ms(self) -> float:
+        """
+        When to send a hedged request: the budget, or the rolling p95 once
+        there is enough history and it is lower (so about 5% of calls hedge)
+        """
+        with self._lock:
+            p95 = self._latencies.percentile(95)
+            if len(self._latencies.samples) < self.min_samples or p95 is None:
+                return self.budget_ms
+            return min(self.budget_ms, p95)
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+        metrics.increment("llm.breaker_opened")
+
+    def _set_state(self, state: str):
+        self.state = state
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge(f"llm.breaker.{self.call_type}", STATE_GAUGE[self.state])
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "budget_ms": self.budget_ms,
+                "p50_ms": self._latencies.percentile(50),
+                "p95_ms": self._latencies.percentile(95),
+                "recent_failures": sum(self._outcomes),
+                "recent_calls": len(self._outcomes),
+            }
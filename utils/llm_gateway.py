@@ -0,0 +1,433 @@
+"""
+Process-wide gateway for Groq chat completions
+One pooled HTTP client shared by every module, a cap on concurrent requests,
+a token-bucket rate limiter that honours retry-after headers, and jittered
+exponential backoff for rate limits and transient failures. Calls labelled with
+a call_type also get a latency breaker (see utils.llm_breaker) and, for the
+large model, a hedged request to the small model when they run over budget.
+CARELY_LLM_BACKEND swaps Groq for an offline backend (see utils.llm_backends)
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from utils.llm_backends import build_backend
+from utils.llm_breaker import LatencyBreaker
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.getenv("CARELY_LLM_BACKEND", "groq").lower()
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("CARELY_LLM_MAX_CONCURRENCY", "8"))
+# Groq free tier allows 30 requests/minute per model (shared by every call site here);
+# offline backends are unlimited unless a rate is set. 0 disables the limiter.
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv(
+    "CARELY_LLM_REQUESTS_PER_MINUTE", "30" if DEFAULT_BACKEND in ("groq", "record") else "0"))
+DEFAULT_BURST = int(os.getenv("CARELY_LLM_BURST", "10"))
+DEFAULT_MAX_RETRIES = int(os.getenv("CARELY_LLM_MAX_RETRIES", "3"))
+# Longest a call waits for a rate-limit token / slot before giving up
+DEFAULT_MAX_WAIT_S = float(os.getenv("CARELY_LLM_MAX_WAIT_S", "20"))
+DEFAULT_TIMEOUT_S = float(os.getenv("CARELY_LLM_TIMEOUT_S", "30"))
+# Slow large-model calls are raced against this model
+HEDGE_MODEL = os.getenv("CARELY_LLM_HEDGE_MODEL", "llama-3.1-8b-instant")
+HEDGING_ENABLED = os.getenv("CARELY_LLM_HEDGING", "true").lower() in ("1", "true", "yes")
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 8.0
+
+
+class LLMRateLimitError(Exception):
+    """The gateway could not get a request through the rate limit in time"""
+
+
+class LLMDegradedError(Exception):
+    """The call type's latency breaker is open; use the local fallback"""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for gateway and Groq rate-limit errors"""
+    if isinstance(error, LLMRateLimitError):
+        return True
+    return getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """Thread-safe token bucket that can be paused until a retry-after deadline"""
+
+    def __init__(self, rate_per_s: float, capacity: int):
+        """
+        Args:
+            rate_per_s: Tokens added per second
+            capacity: Maximum tokens (burst size)
+        """
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait_s: float) -> float:
+        """
+        Take one token, sleeping until one is available
+
+        Args:
+            max_wait_s: Give up if the token would arrive later than this
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            LLMRateLimitError: If no token is available within max_wait_s
+        """
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate_per_s)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                wait_s = max(self._paused_until - now,
+                             (1 - self._tokens) / self.rate_per_s if self.rate_per_s else max_wait_s)
+            if now + wait_s - start > max_wait_s:
+                raise LLMRateLimitError(f"LLM rate limit: no capacity within {max_wait_s:.0f}s")
+            time.sleep(min(wait_s, 0.5))
+
+    def available(self) -> float:
+        """Tokens available right now (0 while paused); takes none"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return 0.0
+            return min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+
+    def pause(self, seconds: float):
+        """Hold every caller back (e.g. for a server retry-after) and drain the bucket"""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens, self._updated = 0.0, now
+
+
+class _SlotReleasingStream:
+    """Wraps a streamed completion so the concurrency slot is held until it ends"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            close = getattr(self._stream, "close", None)
+            try:
+                if close:
+                    close()
+            finally:
+                release()
+
+
+class _TimedStream:
+    """Wraps a streamed completion to report time to first chunk to a breaker"""
+
+    def __init__(self, stream, breaker: LatencyBreaker, start: float):
+        self._stream = stream
+        self._breaker = breaker
+        self._start = start
+        self._recorded = False
+
+    def _record(self, ok: bool):
+        if not self._recorded:
+            self._recorded = True
+            self._breaker.record((time.monotonic() - self._start) * 1000.0, ok)
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self._record(True)
+                yield chunk
+        except Exception:
+            self._record(False)
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        self._record(True)
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+
+class LLMGateway:
+    """
+    Drop-in for `Groq().chat.completions`: call `gateway.chat.completions.create`
+    exactly like the Groq client, with pooling, limits and retries applied.
+    The extra `call_type` argument opts a call into breakers and hedging
+    """
+
+    def __init__(self, client=None, max_concurrency: int = None,
+                 requests_per_minute: float = None, burst: int = None,
+                 max_retries: int = None, max_wait_s: float = None,
+                 backend: str = None, hedging: bool = None):
+        """
+        Initialize the gateway
+
+        Args:
+            client: Underlying client exposing chat.completions.create
+                (default: a Groq client with a pooled HTTP connection, built
+                on first use)
+            max_concurrency: Maximum requests in flight
+            requests_per_minute: Sustained request rate (0 = unlimited)
+            burst: Requests allowed back to back before the rate applies
+            max_retries: Retries for rate limits and transient errors
+            max_wait_s: Longest a call may queue before LLMRateLimitError
+            backend: groq, record, replay or synthetic (default: CARELY_LLM_BACKEND);
+                ignored when a client is given
+            hedging: Race slow large-model calls against HEDGE_MODEL
+                (default: CARELY_LLM_HEDGING)
+        """
+        self._client = client
+        self.backend = backend or DEFAULT_BACKEND
+        self._client_lock = threading.Lock()
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.max_retries = DEFAULT_MAX_RETRIES if max_retries is None else max_retries
+        self.max_wait_s = DEFAULT_MAX_WAIT_S if max_wait_s is None else max_wait_s
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        rate = DEFAULT_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        self._bucket = TokenBucket(rate / 60.0, burst or DEFAULT_BURST) if rate > 0 else None
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        self.hedging = HEDGING_ENABLED if hedging is None else hedging
+        self._breakers: Dict[str, LatencyBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @property
+    def client(self):
+        """Underlying client, created once with keep-alive connection pooling"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = build_backend(self.backend, self._groq_client)
+                    if self.backend != "groq":
+                        logger.info(f"LLM gateway using the {self.backend} backend")
+        return self._client
+
+    def _groq_client(self):
+        import httpx
+        from groq import Groq
+        http_client = httpx.Client(
+            timeout=DEFAULT_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency))
+        # Retries happen here so they share the limiter
+        return Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+
+    def create(self, call_type: str = None, **params) -> Any:
+        """
+        Chat completion through the limiter (same arguments as Groq)
+
+        Args:
+            call_type: Label of the call site (e.g. "intent", "chat"); enables
+                its latency breaker and hedging. None = plain call
+            **params: Passed on to chat.completions.create
+
+        Returns:
+            The completion, or for stream=True an iterable of chunks that
+            holds a concurrency slot until exhausted or closed
+
+        Raises:
+            LLMDegradedError: If the call type's breaker is open
+        """
+        if call_type is None:
+            return self._create(**params)
+
+        breaker = self.breaker(call_type)
+        if not breaker.allow():
+            raise LLMDegradedError(f"LLM {call_type} calls are degraded to the local fallback")
+        start = time.monotonic()
+        try:
+            if params.get("stream"):
+                return _TimedStream(self._create(**params), breaker, start)
+            if self.hedging and params.get("model") not in (None, HEDGE_MODEL):
+                result = self._hedged_create(breaker, params)
+            else:
+                result = self._create(**params)
+        except Exception:
+            breaker.record((time.monotonic() - start) * 1000.0, ok=False)
+            raise
+        breaker.record((time.monotonic() - start) * 1000.0)
+        return result
+
+    def has_headroom(self, fraction: float) -> bool:
+        """
+        True if at least `fraction` of the rate-limit burst is unused, so
+        background work can run without delaying live calls
+        """
+        if self._bucket is None:
+            return True
+        return self._bucket.available() >= max(1.0, fraction * self._bucket.capacity)
+
+    def breaker(self, call_type: str) -> LatencyBreaker:
+        """Latency breaker of a call type (created on first use)"""
+        breaker = self._breakers.get(call_type)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.setdefault(call_type, LatencyBreaker(call_type))
+        return breaker
+
+    def is_degraded(self, call_type: str) -> bool:
+        """True while a call type is switched to its local fallback"""
+        breaker = self._breakers.get(call_type)
+        return breaker is not None and breaker.is_open()
+
+    def breaker_states(self) -> Dict[str, Dict[str, Any]]:
+        """State, budget and rolling latency of every call type seen so far"""
+        return {call_type: breaker.snapshot() for call_type, breaker in list(self._breakers.items())}
+
+    def _hedged_create(self, breaker: LatencyBreaker, params: Dict[str, Any]) -> Any:
+        """
+        Run the call; if it is still pending after the hedge delay, send the
+        same request to HEDGE_MODEL and return whichever answers first (the
+        loser finishes in the background)
+        """
+        if self._hedge_pool is None:
+            with self._client_lock:
+                if self._hedge_pool is None:
+                    # Threads start lazily; the bound only needs to exceed concurrent callers
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=64,
+                                                          thread_name_prefix="carely-llm-hedge")
+        primary = self._hedge_pool.submit(self._create, **params)
+        try:
+            return primary.result(timeout=breaker.hedge_after_ms() / 1000.0)
+        except FutureTimeoutError:
+            pass
+
+        metrics.increment("llm.hedged")
+        hedge = self._hedge_pool.submit(self._create, **dict(params, model=HEDGE_MODEL))
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.increment("llm.hedge_wins")
+                    return future.result()
+            if not pending:
+                # Both failed: report the original model's error
+                return primary.result()
+
+    def _create(self, **params) -> Any:
+        """One call through the limiter, with retries"""
+        attempt = 0
+        while True:
+            release = self._acquire()
+            try:
+                result = self.client.chat.completions.create(**params)
+            except Exception as e:
+                release()
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                metrics.increment("llm.retries")
+                logger.warning(f"LLM call failed ({e.__class__.__name__}), "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if params.get("stream"):
+                return _SlotReleasingStream(result, release)
+            release()
+            return result
+
+    def _acquire(self):
+        """Wait for a rate-limit token and a concurrency slot; returns the release callback"""
+        start = time.monotonic()
+        if self._bucket is not None:
+            self._bucket.acquire(self.max_wait_s)
+        remaining = self.max_wait_s - (time.monotonic() - start)
+        if not self._slots.acquire(timeout=max(0.0, remaining)):
+            raise LLMRateLimitError(f"LLM concurrency limit: no slot within {self.max_wait_s:.0f}s")
+        metrics.observe("llm.queue_wait_ms", (time.monotonic() - start) * 1000.0)
+        metrics.increment("llm.requests")
+        self._set_inflight(1)
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._set_inflight(-1)
+                self._slots.release()
+        return release
+
+    def _set_inflight(self, delta: int):
+        with self._inflight_lock:
+            self._inflight += delta
+            metrics.set_gauge("llm.inflight", self._inflight)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the error is final"""
+        if attempt >= self.max_retries:
+            return None
+        status = getattr(error, "status_code", None)
+        transient = type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+        if status == 429:
+            metrics.increment("llm.rate_limited")
+            retry_after = self._retry_after(error)
+            if retry_after is not None:
+                if self._bucket is None:
+                    return retry_after
+                # Everyone waits, not just this caller; the bucket enforces it
+                self._bucket.pause(retry_after)
+                return random.uniform(0, BACKOFF_BASE_S)
+        elif not transient and not (status is not None and status >= 500):
+            return None
+        # Full jitter: spread retries so callers do not stampede together
+        return random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Server-requested wait from retry-after(-ms) headers, in seconds"""
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000.0
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+        return None
+
+
+# Global instance for easy access
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get singleton LLM gateway (thread-safe)"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -1,15 +1,15 @@
-import os
 import json
-from groq import Groq
 from typing import Dict, Any
 from dotenv import load_dotenv
 
+from utils.llm_gateway import get_llm_gateway
+
 # Load environment variables
 load_dotenv()
 
 class SentimentAnalyzer:
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = get_llm_gateway()
         self.model = "llama-3.3-70b-versatile"  # Using Groq model
     
     def analyze(self, text: str) -> Dict[str, Any]:
@@ -56,7 +56,8 @@ class SentimentAnalyzer:
                     }
                 ],
                 response_format={"type": "json_object"},
-                max_tokens=200
+                max_tokens=200,
+                call_type="sentiment"  # Open breaker -> rule-based fallback right away
             )
             
             result = json.loads(response.choices[0].message.content)
@@ -0,0 +1,243 @@
+"""
+Lightweight per-stage tracing for chat turns
+Spans time the stages of a turn; every span feeds a `span.<name>_ms` histogram
+in the metrics registry, and each finished turn is kept in memory for the admin
+panel and appended (off the request thread) to a local JSONL trace file
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("CARELY_TRACING", "1") != "0"
+DEFAULT_TRACE_FILE = os.getenv("CARELY_TRACE_FILE", "data/traces/chat_turns.jsonl")
+# Fraction of turns written to the trace file (histograms always see every turn)
+DEFAULT_SAMPLE_RATE = float(os.getenv("CARELY_TRACE_SAMPLE_RATE", "1.0"))
+DEFAULT_MAX_BYTES = int(os.getenv("CARELY_TRACE_MAX_BYTES", str(5 * 1024 * 1024)))
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("carely_trace", default=None)
+
+
+class Trace:
+    """One traced operation (e.g. a chat turn) and the spans recorded inside it"""
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs)
+        self.started = time.perf_counter()
+        self.timestamp = datetime.now()
+        self.total_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp.isoformat(timespec="milliseconds"),
+            "total_ms": self.total_ms,
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+class Tracer:
+    """Span API plus a background JSONL writer for finished traces"""
+
+    def __init__(self, path: str = None, sample_rate: float = None,
+                 max_bytes: int = None, enabled: bool = None, keep_recent: int = 200):
+        """
+        Initialize the tracer
+
+        Args:
+            path: Trace file (JSONL, one finished trace per line); None or ""
+                keeps traces in memory only
+            sample_rate: Fraction of traces written to the file
+            max_bytes: Size at which the file is rotated to `<path>.1`
+            enabled: Master switch (default: CARELY_TRACING)
+            keep_recent: Finished traces kept in memory for the admin panel
+        """
+        self.path = DEFAULT_TRACE_FILE if path is None else path
+        self.sample_rate = DEFAULT_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.enabled = TRACING_ENABLED if enabled is None else enabled
+        self._recent = deque(maxlen=keep_recent)
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def start(self, name: str, **attrs) -> Optional[Trace]:
+        """
+        Begin a trace without activating it (see activate / finish); used where
+        the traced work is interleaved with other code, e.g. a streamed reply
+
+        Returns:
+            The trace, or None when tracing is disabled
+        """
+        return Trace(name, attrs) if self.enabled else None
+
+    @contextmanager
+    def activate(self, current: Optional[Trace]):
+        """Attach spans opened in this block to `current`"""
+        if current is None:
+            yield
+            return
+        token = _current_trace.set(current)
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self, current: Optional[Trace]):
+        """Close a trace: record its total time and hand it to the writer"""
+        if current is None or current.total_ms is not None:
+            return
+        current.total_ms = round((time.perf_counter() - current.started) * 1000.0, 2)
+        metrics.observe(f"trace.{current.name}_ms", current.total_ms)
+        record = current.to_dict()
+        self._recent.append(record)
+        if self.path and random.random() < self.sample_rate:
+            self._ensure_writer()
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                metrics.increment("trace.file_dropped")
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """
+        Trace a whole operation; spans opened inside it are attached to it
+
+        Args:
+            name: Trace name (e.g. "chat_turn")
+            **attrs: Attributes stored with the trace (no message text)
+        """
+        if not self.enabled or _current_trace.get() is not None:
+            # Disabled, or nested inside another trace: spans go to the outer one
+            yield _current_trace.get()
+            return
+
+        current = self.start(name, **attrs)
+        try:
+            with self.activate(current):
+                yield current
+        except BaseException as e:
+            current.attrs.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            self.finish(current)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Time one stage
+
+        Args:
+            name: Stage name (e.g. "llm.intent", "db.save_conversation")
+            **attrs: Extra attributes stored with the span
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000.0, start=start, **attrs)
+
+    def record(self, name: str, duration_ms: float, start: float = None,
+               trace: Trace = None, **attrs):
+        """
+        Record a stage that was timed elsewhere (e.g. on a worker thread)
+
+        Args:
+            name: Stage name
+            duration_ms: Stage duration
+            start: perf_counter() value when the stage started
+            trace: Trace to attach to (default: the active one)
+            **attrs: Extra attributes stored with the span
+        """
+        if not self.enabled:
+            return
+        metrics.observe(f"span.{name}_ms", duration_ms)
+        current = trace or _current_trace.get()
+        if current is not None:
+            offset = ((start if start is not None else time.perf_counter() - duration_ms / 1000.0)
+                      - current.started) * 1000.0
+            span = {"name": name, "start_ms": round(offset, 2), "ms": round(duration_ms, 2)}
+            span.update(attrs)
+            current.spans.append(span)
+
+    def annotate(self, **attrs):
+        """Add attributes to the active trace (no-op outside a trace)"""
+        current = _current_trace.get()
+        if current is not None:
+            current.attrs.update(attrs)
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent finished traces, newest first"""
+        return list(self._recent)[::-1][:limit]
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, daemon=True,
+                                                    name="carely-trace-writer")
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                self._append(record)
+            except Exception as e:
+                logger.warning(f"Could not write trace: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _append(self, record: Dict[str, Any]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def flush(self):
+        """Block until queued traces are written"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Histogram summaries of every span and trace, keyed by name"""
+        histograms = metrics.snapshot()["histograms"]
+        summary = {}
+        for name, values in histograms.items():
+            if name.startswith("span.") or name.startswith("trace."):
+                summary[name.split(".", 1)[1][:-len("_ms")]] = values
+        return summary
+
+
+# Global tracer for easy access
+tracer = Tracer()